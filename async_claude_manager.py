@@ -0,0 +1,117 @@
+import asyncio
+
+from claude_manager import ClaudeProjectManager, REQUIREMENTS_PLACEHOLDER
+from claude_transport import ClaudeTransport, DEFAULT_POOL_SIZE
+
+
+class AsyncClaudeProjectManager:
+    """
+    Versão assíncrona do ClaudeProjectManager.
+    Permite desenvolver vários módulos ao mesmo tempo a partir de um único event loop,
+    limitando o número de prompts simultâneos com um semáforo.
+
+    As chamadas HTTP e a gravação de arquivos rodam em threads usando o transporte com pool
+    do gerenciador síncrono; a configuração e o histórico são protegidos pelo lock dele.
+    """
+
+    def __init__(self, config_file="claude_project_config.json", max_concurrency=3, manager=None):
+        """
+        Args:
+            config_file: Arquivo de configuração do projeto
+            max_concurrency: Número máximo de prompts em andamento ao mesmo tempo
+            manager: ClaudeProjectManager já existente (opcional)
+        """
+        self.manager = manager or ClaudeProjectManager(config_file)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        # O pool precisa ter pelo menos uma conexão por prompt em andamento
+        api_config = dict(self.manager.config["api"])
+        api_config["pool_size"] = max(int(api_config.get("pool_size", DEFAULT_POOL_SIZE)), max_concurrency)
+        self.manager.close()
+        self.manager._transport = ClaudeTransport.from_config(api_config)
+
+    def __getattr__(self, name):
+        # Métodos e atributos síncronos (config, print_project_report...) vêm do gerenciador
+        return getattr(self.manager, name)
+
+    async def send_prompt_to_claude(self, prompt_text, save_history=True, module_name=None, context_text=None):
+        """
+        Envia um prompt para a API do Claude sem bloquear o event loop.
+
+        Args:
+            prompt_text: O texto do prompt para enviar
+            save_history: Se deve salvar o histórico da conversa
+            module_name: Módulo ao qual a sessão pertence (se None, usa o módulo atual)
+            context_text: Contexto estático do projeto, enviado como bloco cacheável
+
+        Returns:
+            A resposta completa da API e o texto da resposta extraído
+        """
+        async with self._semaphore:
+            return await asyncio.to_thread(
+                self.manager.send_prompt_to_claude,
+                prompt_text,
+                save_history,
+                module_name=module_name,
+                context_text=context_text
+            )
+
+    async def extract_and_save_all_code(self, response_text, base_dir="restaurante-sistema", module_name=None):
+        """Extrai e grava os arquivos de uma resposta sem bloquear o event loop."""
+        return await asyncio.to_thread(
+            self.manager.extract_and_save_all_code,
+            response_text,
+            base_dir,
+            module_name
+        )
+
+    async def develop_module(self, module_name, requirements=None, base_dir="restaurante-sistema"):
+        """
+        Gera o prompt de um módulo, envia para o Claude e grava os arquivos da resposta.
+
+        Args:
+            module_name: Nome do módulo
+            requirements: Requisitos específicos desta etapa (substituem o marcador do prompt)
+            base_dir: Diretório base para salvar os arquivos
+
+        Returns:
+            Dicionário com module, files e error
+        """
+        if not self.manager.start_module(module_name):
+            return {"module": module_name, "files": [], "error": f"Módulo '{module_name}' não encontrado"}
+
+        use_cache = self.manager.use_prompt_caching()
+        prompt = await asyncio.to_thread(self.manager.generate_module_prompt, module_name, not use_cache)
+        context_text = await asyncio.to_thread(self.manager._load_project_context) if use_cache else None
+        if requirements:
+            prompt = prompt.replace(REQUIREMENTS_PLACEHOLDER, requirements)
+
+        response_json, response_text = await self.send_prompt_to_claude(
+            prompt, module_name=module_name, context_text=context_text
+        )
+        if not response_json:
+            return {"module": module_name, "files": [], "error": response_text}
+
+        # Salva a resposta em um arquivo temporário para referência
+        await asyncio.to_thread(self.manager.save_temp_response, module_name, response_text)
+
+        created_files = await self.extract_and_save_all_code(response_text, base_dir, module_name)
+        return {"module": module_name, "files": created_files, "error": None}
+
+    async def develop_modules(self, requirements_by_module, base_dir="restaurante-sistema"):
+        """
+        Desenvolve vários módulos ao mesmo tempo, respeitando o limite de concorrência.
+
+        Args:
+            requirements_by_module: Dicionário {nome_do_módulo: requisitos}
+            base_dir: Diretório base para salvar os arquivos
+
+        Returns:
+            Lista de resultados de develop_module, na mesma ordem dos módulos
+        """
+        tasks = [
+            self.develop_module(module_name, requirements, base_dir)
+            for module_name, requirements in requirements_by_module.items()
+        ]
+        return await asyncio.gather(*tasks)
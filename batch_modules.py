@@ -0,0 +1,84 @@
+from claude_manager import ClaudeProjectManager, REQUIREMENTS_PLACEHOLDER
+import argparse
+import os
+import sys
+
+def build_batch_requests(manager, specs, prompt_dir=None):
+    """
+    Gera os prompts dos módulos para um lote.
+
+    Args:
+        manager: ClaudeProjectManager
+        specs: Lista de "módulo" ou "módulo:arquivo_de_requisitos"
+        prompt_dir: Diretório com um arquivo <módulo>.txt de requisitos por módulo
+
+    Returns:
+        Lista de requisições para manager.submit_batch
+    """
+    use_cache = manager.use_prompt_caching()
+    context_text = manager._load_project_context() if use_cache else None
+
+    batch_requests = []
+    for index, spec in enumerate(specs, 1):
+        module_name, _, prompt_file = spec.partition(":")
+        if not prompt_file and prompt_dir:
+            candidate = os.path.join(prompt_dir, f"{module_name}.txt")
+            if os.path.exists(candidate):
+                prompt_file = candidate
+
+        prompt = manager.generate_module_prompt(module_name, include_context=not use_cache)
+        if prompt is None:
+            print(f"Erro: Módulo '{module_name}' não encontrado.")
+            sys.exit(1)
+        if prompt_file:
+            with open(prompt_file, 'r', encoding='utf-8') as f:
+                prompt = prompt.replace(REQUIREMENTS_PLACEHOLDER, f.read())
+
+        batch_requests.append({
+            "custom_id": f"{module_name}-{index}",
+            "module": module_name,
+            "prompt": prompt,
+            "context_text": context_text
+        })
+    return batch_requests
+
+def main():
+    parser = argparse.ArgumentParser(description='Enviar prompts de vários módulos em lote (Message Batches API)')
+    parser.add_argument('specs', nargs='*', help='Módulos no formato "módulo" ou "módulo:arquivo_de_requisitos.txt"')
+    parser.add_argument('--prompt-dir', help='Diretório com um arquivo <módulo>.txt de requisitos por módulo')
+    parser.add_argument('--resume', metavar='BATCH_ID', help='Continuar acompanhando um lote já enviado')
+    parser.add_argument('--poll-interval', type=int, default=10, help='Intervalo inicial entre consultas (segundos)')
+    args = parser.parse_args()
+
+    manager = ClaudeProjectManager()
+
+    if args.resume:
+        batch = manager.wait_for_batch(args.resume, args.poll_interval)
+        results = manager.process_batch_results(batch) if batch else None
+    else:
+        specs = args.specs or [
+            m["name"] for m in manager.config["project"]["modules"] if m["status"] != "completed"
+        ]
+        if not specs:
+            print("Nenhum módulo para enviar.")
+            return
+        for spec in specs:
+            manager.start_module(spec.partition(":")[0])
+        batch_requests = build_batch_requests(manager, specs, args.prompt_dir)
+        print(f"\nEnviando lote com {len(batch_requests)} prompts...")
+        results = manager.run_batch(batch_requests, poll_interval=args.poll_interval)
+
+    if results is None:
+        print("\nErro ao processar o lote. Veja os logs para detalhes.")
+        return
+
+    for result in results:
+        if result["error"]:
+            print(f"\n{result['custom_id']}: erro: {result['error']}")
+        else:
+            print(f"\n{result['custom_id']}: {len(result['files'])} arquivos criados")
+            for file in result["files"]:
+                print(f" - {file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Benchmark dos extratores de arquivos das respostas, com um gerador de corpus.
+
+Os corpus são gerados a partir dos arquivos de temp_response_core.txt, no estilo das respostas
+reais, até o tamanho pedido (1 a 50 MB), e o gerador guarda os arquivos que cada um deve produzir:
+  - realista: arquivos de temp_response_core.txt nas cinco convenções de cabeçalho, com texto
+    explicativo entre eles
+  - pequenos: milhares de arquivos de poucas linhas
+  - adversarial: frases em português que começam como um cabeçalho ("Para isso, veja
+    `core/App.php` e..."), caminhos citados sem bloco, crases dentro do código, blocos sem
+    caminho, linhas muito longas (no código e no texto, com palavras de cabeçalho repetidas e
+    sem a aspa que fecharia o caminho) e um bloco não fechado no fim
+
+Para cada extrator, em um processo separado (com limite de tempo, porque as expressões antigas
+podem levar minutos), mede a vazão (MB/s), o pico de memória (tracemalloc) e, comparando com os
+arquivos esperados: encontrados, divergentes (conteúdo diferente do esperado), duplicados (o
+mesmo arquivo extraído mais de uma vez), perdidos e extras (caminhos que não são arquivos).
+
+Extratores:
+  - legado_manager: os cinco padrões do antigo extract_and_save_all_code
+  - legado_extract_files: os padrões do antigo extract_files.py / extract-script.py
+  - legado_extract_from_json: os padrões do antigo extract_from_json.py / extract-from-json.py
+  - single_pass: code_extractor.extract_all_code_blocks
+  - incremental: IncrementalCodeExtractor alimentado em trechos de 1 KB, como no streaming
+
+Uso:
+    python benchmarks/bench_extractors.py
+    python benchmarks/bench_extractors.py --sizes 1 50 --kinds adversarial --impl single_pass incremental
+    python benchmarks/bench_extractors.py --sizes 5 --keep-corpus /tmp/corpus --timeout 300
+"""
+import argparse
+import gc
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_extractor import IncrementalCodeExtractor, extract_all_code_blocks, extract_code_blocks  # noqa: E402
+
+SEED_RESPONSE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "temp_response_core.txt")
+
+DEFAULT_SIZES = [1, 10, 50]
+KINDS = ["realista", "pequenos", "adversarial"]
+STREAM_CHUNK = 1024
+
+# Padrões do antigo extract_and_save_all_code (um finditer por padrão, na ordem)
+LEGACY_MANAGER_PATTERNS = [
+    r'```(?:\w+)?\s*\n(?://|#)\s*File:\s*([\w\/\.-]+)\s*\n(.*?)```',
+    r'(?:Para|Arquivo|No arquivo|Crie o arquivo|Vamos criar|Código para).*?[`"\']([^`"\']+\.\w+)[`"\'].*?:\s*```(?:\w+)?\s*\n(.*?)```',
+    r'[`"\']([^`"\']+\.\w+)[`"\']\s*:\s*```(?:\w+)?\s*\n(.*?)```',
+    r'## \d+\. .*?\n\n```(?:\w+)?\n// File: ([\w\/\.-]+)\n(.*?)```',
+    r'###\s*`?/?([^`\n]+)`?\s*\n```(?:\w+)?\s*\n(.*?)```',
+]
+
+# Padrões do antigo extract_files.py / extract-script.py
+LEGACY_EXTRACT_FILES_PATTERNS = [
+    r'###\s*`?/?([\w/.-]+)`?\s*\n```(?:\w+)?\s*\n(.*?)```',
+    r'`([\w/.-]+)`\s*:\s*```(?:\w+)?\s*\n(.*?)```',
+]
+
+# Padrões do antigo extract_from_json.py / extract-from-json.py
+LEGACY_FROM_JSON_PATTERNS = [
+    r'## \d+\. .*?\n\n```php\n// File: ([\w/.-]+)\n(.*?)```',
+    r'```(?:\w+)?\s*\n(?://|#)\s*File:\s*([\w/.-]+)\s*\n(.*?)```',
+    r'### `([\w/.-]+)`\s*\n```(?:\w+)?\s*\n(.*?)```',
+]
+
+TITLES = [
+    "Classe de Autenticação", "Middleware de Tenant", "Repositório de Pedidos", "Controlador do Cardápio",
+    "Serviço de Estoque", "Configuração de Sessão", "Validação de Formulários", "Migração do Banco de Dados",
+]
+LEAD_INS = ["Para o arquivo", "Crie o arquivo", "No arquivo", "Vamos criar o arquivo", "Código para", "Arquivo"]
+PROSE = [
+    "Este arquivo implementa a lógica principal do módulo e segue o padrão usado no restante do sistema.",
+    "Para isso, a classe recebe a conexão pelo construtor e valida o tenant antes de cada consulta.",
+    "Observe que os métodos públicos retornam arrays associativos, o que facilita a serialização em JSON.",
+    "Arquivo de configuração e rotas ficam separados, assim cada restaurante pode ter suas próprias regras.",
+]
+# Frases que parecem cabeçalhos, mas não anunciam um bloco de código
+ADVERSARIAL_PROSE = [
+    "Para isso, veja `core/App.php` e \"core/Router.php\", que já tratam o tenant; Para cada rota, o "
+    "arquivo 'config/app.php' define os middlewares. Arquivo a arquivo, Vamos criar o restante depois.",
+    "No arquivo de rotas, use `$router->get('/pedidos', ...)` e, Para o cardápio, `MenuController.php` "
+    "(detalhado mais adiante). Crie o arquivo de testes só depois; Código para migrações vem no fim.",
+    "Use ``` para abrir um bloco e `'` ou `\"` nas strings: \"Para\" 'Arquivo' `No arquivo` são só palavras.",
+]
+SHELL_BLOCK = "Instale as dependências:\n\n```bash\ncomposer install\nphp -S localhost:8000 -t public\n```\n\n"
+
+
+def load_seed_files():
+    """Arquivos de temp_response_core.txt, usados como conteúdo dos corpus."""
+    with open(SEED_RESPONSE, 'r', encoding='utf-8') as f:
+        return extract_code_blocks(f.read())
+
+
+def render_file(convention, index, path, code):
+    """Escreve um arquivo numa das cinco convenções de cabeçalho (ver code_extractor)."""
+    language = os.path.splitext(path)[1].lstrip(".") or "text"
+    title = TITLES[index % len(TITLES)]
+    if convention == 1:
+        return f"### {index}. {title}\n\n```{language}\n// File: {path}\n{code}```\n\n"
+    if convention == 2:
+        return f"{LEAD_INS[index % len(LEAD_INS)]} `{path}`:\n\n```{language}\n{code}```\n\n"
+    if convention == 3:
+        return f"`{path}`:\n```{language}\n{code}```\n\n"
+    if convention == 4:
+        return f"## {index}. {title}\n\n```{language}\n// File: {path}\n{code}```\n\n"
+    return f"### `/{path}`\n```{language}\n{code}```\n\n"
+
+
+def small_code(rng, index):
+    lines = [f"    public function metodo{n}() {{ return {rng.randint(0, 999)}; }}" for n in range(rng.randint(1, 4))]
+    return "<?php\n\nclass Pequena{}\n{{\n{}\n}}\n".format(index, "\n".join(lines))
+
+
+def adversarial_code(rng, index, code):
+    """Conteúdo com crases dentro do código e, às vezes, uma linha muito longa."""
+    extra = [
+        "// Exemplo em markdown: ```php ... ``` dentro de um comentário",
+        "$markdown = \"```\\n\" . $codigo . \"\\n```\";",
+        "$dica = 'use `Para o arquivo` e \"Arquivo\": no texto';",
+    ]
+    if index % 7 == 0:
+        extra.append("$dados = '" + "x" * rng.randint(10000, 30000) + "';")
+    return code + "\n".join(extra) + "\n"
+
+
+def long_lead_in_line(rng):
+    """
+    Linha de texto muito longa com palavras que introduzem um caminho e nenhuma aspa que o
+    feche: uma expressão que procura um caminho depois de cada palavra fica quadrática nela.
+    """
+    lead_in = LEAD_INS[rng.randrange(len(LEAD_INS))]
+    line = f"{lead_in} " * (rng.randint(20000, 60000) // (len(lead_in) + 1))
+    return line + rng.choice(["", "`", "\"", "'core/"])
+
+
+def generate_corpus(kind, size_mb, seed=0):
+    """
+    Gera um corpus do tipo informado com pelo menos size_mb MB.
+
+    Returns:
+        Tupla (texto, dicionário caminho -> conteúdo esperado)
+    """
+    rng = random.Random(seed)
+    seeds = load_seed_files()
+    target = int(size_mb * 1024 * 1024)
+    parts = ["# Desenvolvimento do Módulo\n\nVou continuar o desenvolvimento com os arquivos abaixo.\n\n"]
+    size = len(parts[0].encode("utf-8"))
+    expected = {}
+    index = 0
+    while size < target:
+        index += 1
+        if kind == "pequenos":
+            path = f"modulo{index % 40}/Pequena{index}.php"
+            code = small_code(rng, index)
+            convention = index % 5 + 1
+        else:
+            seed_path, code = seeds[index % len(seeds)]
+            directory, name = os.path.split(seed_path)
+            stem, ext = os.path.splitext(name)
+            path = f"modulo{index % 40}/{directory}/{stem}{index}{ext}"
+            # As respostas reais usam quase sempre o comentário // File: (convenção 1)
+            convention = 1 if rng.random() < 0.5 else rng.randint(2, 5)
+            if kind == "adversarial":
+                code = adversarial_code(rng, index, code)
+        section = render_file(convention, index, path, code)
+        if kind != "pequenos":
+            section += PROSE[index % len(PROSE)] + "\n\n"
+        if kind == "adversarial":
+            section += ADVERSARIAL_PROSE[index % len(ADVERSARIAL_PROSE)] + "\n\n"
+            if index % 5 == 0:
+                section += SHELL_BLOCK
+            if index % 11 == 0:
+                section += long_lead_in_line(rng) + "\n\n"
+        expected[path] = code
+        parts.append(section)
+        size += len(section.encode("utf-8"))
+    if kind == "adversarial":
+        # Resposta truncada: o último bloco não fecha e não deve gerar arquivo
+        parts.append("Para o arquivo `modulo0/core/Truncado.php`:\n\n```php\n<?php\n\nclass Truncado\n{\n")
+    return "".join(parts), expected
+
+
+def _legacy(patterns):
+    compiled = [re.compile(pattern, re.DOTALL) for pattern in patterns]
+
+    def extract(text):
+        return [(match.group(1), match.group(2)) for pattern in compiled for match in pattern.finditer(text)]
+    return extract
+
+
+def _incremental(text):
+    blocks = []
+    extractor = IncrementalCodeExtractor(lambda path, code: blocks.append((path, code)))
+    for start in range(0, len(text), STREAM_CHUNK):
+        extractor.feed(text[start:start + STREAM_CHUNK])
+    extractor.finish()
+    return blocks
+
+
+IMPLEMENTATIONS = {
+    "legado_manager": _legacy(LEGACY_MANAGER_PATTERNS),
+    "legado_extract_files": _legacy(LEGACY_EXTRACT_FILES_PATTERNS),
+    "legado_extract_from_json": _legacy(LEGACY_FROM_JSON_PATTERNS),
+    "single_pass": extract_all_code_blocks,
+    "incremental": _incremental,
+}
+
+
+def _digest(code):
+    return hashlib.sha256(code.strip().encode("utf-8")).hexdigest()
+
+
+def score(blocks, expected_digests):
+    """Compara os blocos extraídos com os arquivos esperados (caminho -> sha256 do conteúdo)."""
+    extracted = {}
+    duplicates = 0
+    for path, code in blocks:
+        path = path.strip().lstrip("/")
+        if path in extracted:
+            duplicates += 1
+        extracted[path] = code
+    found = [path for path in expected_digests if path in extracted]
+    return {
+        "found": len(found),
+        "divergent": sum(1 for path in found if _digest(extracted[path]) != expected_digests[path]),
+        "duplicates": duplicates,
+        "missed": len(expected_digests) - len(found),
+        "extras": sum(1 for path in extracted if path not in expected_digests),
+    }
+
+
+def _measure(name, corpus_path, expected_path, repeat, results):
+    """Executado num processo separado: mede um extrator sobre um corpus e devolve as métricas."""
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    with open(expected_path, 'r', encoding='utf-8') as f:
+        expected_digests = json.load(f)
+    extract = IMPLEMENTATIONS[name]
+
+    best = float("inf")
+    for _ in range(repeat):
+        blocks = None
+        gc.collect()
+        start = time.perf_counter()
+        blocks = extract(text)
+        best = min(best, time.perf_counter() - start)
+    metrics = score(blocks, expected_digests)
+
+    blocks = None
+    gc.collect()
+    tracemalloc.start()
+    extract(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results.put(dict(metrics, seconds=best, peak=peak))
+
+
+def run_isolated(name, corpus_path, expected_path, repeat, timeout):
+    """Mede um extrator num processo separado; retorna None se passar do limite de tempo."""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_measure, args=(name, corpus_path, expected_path, repeat, results))
+    process.start()
+    try:
+        result = results.get(timeout=timeout)
+    except queue.Empty:
+        result = None
+        process.terminate()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vazão, memória e acertos dos extratores de arquivos')
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help='Tamanhos dos corpus (MB)')
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS, help='Tipos de corpus')
+    parser.add_argument('--impl', nargs='+', choices=list(IMPLEMENTATIONS), default=list(IMPLEMENTATIONS),
+                        help='Extratores medidos')
+    parser.add_argument('--repeat', type=int, default=1, help='Repetições por medida (vale a menor)')
+    parser.add_argument('--timeout', type=float, default=60, help='Limite de tempo por extrator e corpus (s)')
+    parser.add_argument('--seed', type=int, default=0, help='Semente do gerador de corpus')
+    parser.add_argument('--keep-corpus', help='Diretório em que os corpus gerados são mantidos')
+    args = parser.parse_args()
+
+    directory = args.keep_corpus or tempfile.mkdtemp(prefix="bench_extractors_")
+    os.makedirs(directory, exist_ok=True)
+    header = (f"{'extrator':<26} {'MB/s':>8} {'tempo (s)':>10} {'pico (MB)':>10} {'encontrados':>12} "
+              f"{'divergentes':>12} {'duplicados':>11} {'perdidos':>9} {'extras':>7}")
+    try:
+        for kind in args.kinds:
+            for size_mb in args.sizes:
+                text, expected = generate_corpus(kind, size_mb, args.seed)
+                corpus_path = os.path.join(directory, f"{kind}_{size_mb:g}mb.txt")
+                expected_path = os.path.join(directory, f"{kind}_{size_mb:g}mb.expected.json")
+                with open(corpus_path, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                with open(expected_path, 'w', encoding='utf-8') as f:
+                    json.dump({path: _digest(code) for path, code in expected.items()}, f)
+                corpus_mb = os.path.getsize(corpus_path) / (1024 * 1024)
+                del text
+
+                print(f"\ncorpus={kind} tamanho={corpus_mb:.2f} MB arquivos esperados={len(expected)}")
+                print(header)
+                print("-" * len(header))
+                for name in args.impl:
+                    result = run_isolated(name, corpus_path, expected_path, args.repeat, args.timeout)
+                    if result is None:
+                        print(f"{name:<26} tempo esgotado (> {args.timeout:g} s)", flush=True)
+                        continue
+                    throughput = corpus_mb / result["seconds"] if result["seconds"] else float("inf")
+                    print(f"{name:<26} {throughput:>8.2f} {result['seconds']:>10.3f} "
+                          f"{result['peak'] / (1024 * 1024):>10.2f} {result['found']:>12} {result['divergent']:>12} "
+                          f"{result['duplicates']:>11} {result['missed']:>9} {result['extras']:>7}", flush=True)
+    finally:
+        if not args.keep_corpus:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark do tempo de inicialização do ClaudeProjectManager em função do tamanho do histórico.
+
+Para cada quantidade de sessões, monta um projeto temporário (configuração + log JSONL, ou
+banco SQLite com --backend sqlite) e mede:
+  - init: ClaudeProjectManager(config_file)
+  - recentes: get_recent_sessions(5), que lê só o fim do histórico
+  - página: get_sessions_page(10), a 11ª página de 20 sessões
+
+Com --legacy, as sessões ficam dentro da configuração (formato antigo), para comparação:
+nesse caso a primeira inicialização migra o histórico e é medida à parte.
+
+Uso:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --sizes 10 1000 100000 --backend sqlite
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claude_manager import ClaudeProjectManager  # noqa: E402
+from history_log import DEFAULT_HISTORY_LOG  # noqa: E402
+from state_store import SQLiteStateStore  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000, 10000, 100000]
+MODULES = ["core", "auth", "menu", "pedidos", "estoque"]
+
+
+def make_session(index, start):
+    return {
+        "id": f"{index:032x}",
+        "timestamp": (start + timedelta(minutes=index)).isoformat(),
+        "module": MODULES[index % len(MODULES)],
+        "prompt_ref": f"{index:064x}",
+        "response_ref": f"{index + 1:064x}",
+        "tokens_used": 1000 + index % 500,
+        "response_time": 12.5,
+        "connect_time": 0.05,
+        "ttfb": 1.2,
+        "connection_reused": True,
+        "retries": 0,
+        "rate_limit_wait": 0
+    }
+
+
+def build_project(directory, sessions_count, backend, legacy):
+    """Cria uma configuração com sessions_count sessões no diretório informado."""
+    start = datetime(2025, 1, 1)
+    config = {
+        "api": {"claude_api_key": "", "api_endpoint": "http://127.0.0.1/v1/messages", "model": "bench"},
+        "storage": {"backend": backend},
+        "project": {
+            "name": "restaurante-sistema",
+            "version": "0.0.1",
+            "progress": 0,
+            "modules": [
+                {"name": name, "description": name, "status": "pending", "priority": 1,
+                 "created_at": start.isoformat(), "completed_at": None, "files": [],
+                 "dependencies": [], "progress": 0}
+                for name in MODULES
+            ]
+        },
+        "context": {"current_module": "", "completed_modules": [], "in_progress_modules": []},
+        "history": {"log_file": DEFAULT_HISTORY_LOG, "total_sessions": sessions_count, "total_tokens_used": 0}
+    }
+    sessions = (make_session(i, start) for i in range(sessions_count))
+
+    config_file = os.path.join(directory, "claude_project_config.json")
+    if legacy:
+        config["history"]["sessions"] = list(sessions)
+    elif backend == "sqlite":
+        store = SQLiteStateStore.from_config(config, config_file)
+        store.save_state(config)
+        store.extend(sessions)
+        store.close()
+    else:
+        with open(os.path.join(directory, DEFAULT_HISTORY_LOG), 'w', encoding='utf-8') as f:
+            for session in sessions:
+                f.write(json.dumps(session) + "\n")
+
+    with open(config_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4)
+    return config_file
+
+
+def timed(function, repeat):
+    """Menor tempo (em ms) de repeat execuções."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de inicialização do gerenciador x tamanho do histórico')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Quantidades de sessões')
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json', help='Armazenamento do estado')
+    parser.add_argument('--legacy', action='store_true', help='Sessões dentro da configuração (formato antigo)')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetições por medida (vale a menor)')
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    original_dir = os.getcwd()
+    print(f"backend={args.backend} legacy={args.legacy} repeat={args.repeat}")
+    header = f"{'sessões':>10} {'migração (ms)':>14} {'init (ms)':>10} {'recentes (ms)':>14} {'página (ms)':>12}"
+    print(header)
+    print("-" * len(header))
+
+    for size in args.sizes:
+        directory = tempfile.mkdtemp(prefix="bench_startup_")
+        try:
+            os.chdir(directory)
+            config_file = build_project(directory, size, args.backend, args.legacy)
+
+            migration = ""
+            if args.legacy:
+                migration_ms, manager = timed(lambda: ClaudeProjectManager(config_file), 1)
+                manager.close()
+                migration = f"{migration_ms:.2f}"
+
+            init_ms, manager = timed(lambda: ClaudeProjectManager(config_file), args.repeat)
+            recent_ms, recent = timed(lambda: manager.get_recent_sessions(5), args.repeat)
+            page_ms, page = timed(lambda: manager.get_sessions_page(10), args.repeat)
+            manager.close()
+            assert len(recent) == min(5, size)
+            assert len(page) == max(0, min(20, size - 200))
+
+            print(f"{size:>10} {migration:>14} {init_ms:>10.2f} {recent_ms:>14.2f} {page_ms:>12.2f}")
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+
+from fs_utils import atomic_write
+
+try:
+    import zstandard
+except ImportError:  # zstd é opcional; sem ele os blocos usam gzip
+    zstandard = None
+
+# Valores padrão usados quando a chave não existe em config["storage"]
+DEFAULT_BLOB_DIR = "blobs"
+DEFAULT_COMPRESSION = "gzip"
+
+# Limites dos blocos (bytes); o corte acontece no fim de uma linha escolhida pelo conteúdo
+MIN_CHUNK_SIZE = 2 * 1024
+MAX_CHUNK_SIZE = 64 * 1024
+# Uma linha encerra um bloco quando crc32(linha) % CHUNK_DIVISOR == 0 (~1 a cada 64 linhas)
+CHUNK_DIVISOR = 64
+
+# Blocos descomprimidos mantidos em memória (o contexto do projeto se repete muito)
+CHUNK_CACHE_SIZE = 256
+
+
+def chunk_text(data):
+    """
+    Divide um texto (bytes) em blocos definidos pelo conteúdo, sempre em fim de linha.
+    Como o corte depende só das linhas, um trecho igual em dois textos (por exemplo, o
+    contexto do projeto) gera os mesmos blocos nos dois, mesmo em posições diferentes.
+    """
+    chunks = []
+    start = 0
+    position = 0
+    length = len(data)
+    while position < length:
+        end = data.find(b"\n", position)
+        end = length if end == -1 else end + 1
+        size = end - start
+        if size >= MAX_CHUNK_SIZE or (size >= MIN_CHUNK_SIZE and zlib.crc32(data[position:end]) % CHUNK_DIVISOR == 0):
+            chunks.append(data[start:end])
+            start = end
+        position = end
+    if start < length:
+        chunks.append(data[start:])
+    return chunks
+
+
+class BlobStore:
+    """
+    Armazenamento de textos endereçado pelo conteúdo, com deduplicação por blocos.
+
+    Cada texto é dividido em blocos (chunk_text); cada bloco é comprimido e gravado uma única
+    vez em chunks/<hash>. O objeto do texto (objects/<sha256 do texto>) lista os hashes dos
+    blocos. A referência de um texto é o sha256 dele, então textos iguais também são
+    guardados uma única vez.
+    """
+
+    def __init__(self, root=DEFAULT_BLOB_DIR, compression=DEFAULT_COMPRESSION):
+        """
+        Args:
+            root: Diretório do armazenamento
+            compression: "gzip" ou "zstd" (zstd exige o pacote zstandard; sem ele usa gzip)
+        """
+        self.root = root
+        self.compression = "zstd" if compression == "zstd" and zstandard is not None else "gzip"
+        self._chunk_cache = {}
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, storage_config):
+        """Cria o armazenamento a partir da seção "storage" da configuração."""
+        return cls(
+            root=storage_config.get("blob_dir", DEFAULT_BLOB_DIR),
+            compression=storage_config.get("blob_compression", DEFAULT_COMPRESSION),
+        )
+
+    @staticmethod
+    def ref_for(text):
+        """Referência (sha256) de um texto, sem gravá-lo."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _object_path(self, ref):
+        return os.path.join(self.root, "objects", ref[:2], ref)
+
+    def _chunk_path(self, chunk_hash, compression):
+        extension = ".zst" if compression == "zstd" else ".gz"
+        return os.path.join(self.root, "chunks", chunk_hash[:2], chunk_hash + extension)
+
+    def _compress(self, data):
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return gzip.compress(data, compresslevel=6, mtime=0)
+
+    def put(self, text):
+        """
+        Guarda um texto e retorna sua referência.
+        Blocos e objetos já existentes não são regravados.
+        """
+        data = text.encode("utf-8")
+        ref = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(ref)
+        if self._touch(object_path):
+            return ref
+
+        chunk_hashes = []
+        for chunk in chunk_text(data):
+            chunk_hash = hashlib.sha256(chunk).hexdigest()
+            chunk_hashes.append(chunk_hash)
+            if not (self._touch(self._chunk_path(chunk_hash, "gzip")) or
+                    self._touch(self._chunk_path(chunk_hash, "zstd"))):
+                atomic_write(self._chunk_path(chunk_hash, self.compression), self._compress(chunk))
+
+        # O objeto é gravado por último: se existe, todos os seus blocos existem
+        atomic_write(object_path, json.dumps({"size": len(data), "chunks": chunk_hashes}))
+        return ref
+
+    @staticmethod
+    def _touch(path):
+        """
+        Atualiza o mtime de um arquivo reaproveitado, para a coleta de lixo não removê-lo
+        logo depois. Retorna False se o arquivo não existe.
+        """
+        try:
+            os.utime(path, None)
+            return True
+        except OSError:
+            return False
+
+    def _read_chunk(self, chunk_hash):
+        with self._cache_lock:
+            cached = self._chunk_cache.get(chunk_hash)
+        if cached is not None:
+            return cached
+
+        gzip_path = self._chunk_path(chunk_hash, "gzip")
+        if os.path.exists(gzip_path):
+            with open(gzip_path, 'rb') as f:
+                data = gzip.decompress(f.read())
+        else:
+            if zstandard is None:
+                raise RuntimeError(f"O bloco '{chunk_hash}' usa zstd, mas o pacote zstandard não está instalado")
+            with open(self._chunk_path(chunk_hash, "zstd"), 'rb') as f:
+                data = zstandard.ZstdDecompressor().decompress(f.read())
+
+        with self._cache_lock:
+            if len(self._chunk_cache) >= CHUNK_CACHE_SIZE:
+                self._chunk_cache.pop(next(iter(self._chunk_cache)))
+            self._chunk_cache[chunk_hash] = data
+        return data
+
+    def get(self, ref):
+        """Reconstrói o texto de uma referência; levanta KeyError se ela não existir."""
+        try:
+            with open(self._object_path(ref), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            raise KeyError(ref)
+        return b"".join(self._read_chunk(chunk_hash) for chunk_hash in manifest["chunks"]).decode("utf-8")
+
+    def exists(self, ref):
+        return os.path.exists(self._object_path(ref))
+
+    def size(self, ref):
+        """Tamanho do texto de uma referência, em bytes (0 se ela não existir)."""
+        try:
+            with open(self._object_path(ref), 'r', encoding='utf-8') as f:
+                return json.load(f)["size"]
+        except (OSError, ValueError, KeyError):
+            return 0
+
+    def _iter_files(self, kind):
+        directory = os.path.join(self.root, kind)
+        if not os.path.isdir(directory):
+            return
+        for bucket in os.scandir(directory):
+            if bucket.is_dir():
+                for entry in os.scandir(bucket.path):
+                    if entry.is_file() and not entry.name.endswith(".tmp"):
+                        yield entry
+
+    def collect_garbage(self, live_refs, grace_seconds=3600):
+        """
+        Remove os textos que não estão em live_refs e os blocos que nenhum texto restante usa.
+        Arquivos gravados ou reaproveitados há menos de grace_seconds são mantidos, para não
+        remover um texto que outro processo acabou de guardar e ainda vai referenciar.
+
+        Returns:
+            Dicionário com "objects", "chunks" (quantidades removidas) e "bytes" liberados
+        """
+        cutoff = time.time() - grace_seconds
+        live_refs = set(live_refs)
+        live_chunks = set()
+        removed = {"objects": 0, "chunks": 0, "bytes": 0}
+
+        for entry in self._iter_files("objects"):
+            stat = entry.stat()
+            if entry.name in live_refs or stat.st_mtime > cutoff:
+                try:
+                    with open(entry.path, 'r', encoding='utf-8') as f:
+                        live_chunks.update(json.load(f)["chunks"])
+                except (OSError, ValueError, KeyError):
+                    pass
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            removed["objects"] += 1
+            removed["bytes"] += stat.st_size
+
+        for entry in self._iter_files("chunks"):
+            chunk_hash = entry.name.split(".", 1)[0]
+            stat = entry.stat()
+            if chunk_hash in live_chunks or stat.st_mtime > cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                continue
+            removed["chunks"] += 1
+            removed["bytes"] += stat.st_size
+            with self._cache_lock:
+                self._chunk_cache.pop(chunk_hash, None)
+        return removed
+
+
+class LazySession(dict):
+    """
+    Sessão cujos textos ficam no BlobStore: session["prompt"], session["response"] e
+    session["context"] só leem os blobs (via *_ref / context_hash) quando acessados.
+    """
+
+    REFS = {"prompt": "prompt_ref", "response": "response_ref", "context": "context_hash"}
+
+    def __init__(self, session, blob_store):
+        super().__init__(session)
+        self.blob_store = blob_store
+
+    def __missing__(self, key):
+        ref_key = self.REFS.get(key)
+        if ref_key is None or ref_key not in self:
+            raise KeyError(key)
+        value = self.blob_store.get(dict.__getitem__(self, ref_key))
+        self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def resolved(self):
+        """Retorna um dicionário comum com os textos já lidos."""
+        session = dict(self)
+        for key, ref_key in self.REFS.items():
+            if ref_key in session and key != "context":
+                session[key] = self[key]
+        return session
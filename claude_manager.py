@@ -1,6 +1,5 @@
 import os
 import json
-import requests
 import time
 import re
 from datetime import datetime
@@ -8,6 +7,74 @@ import hashlib
 import logging
 from pathlib import Path
 import shutil
+import threading
+import atexit
+import copy
+from contextlib import contextmanager
+
+from claude_transport import ClaudeTransport, StreamedMessage, iter_sse_events
+from fs_utils import FileLock, atomic_write_json, write_if_changed, materialize_files, MaterializeError, DEFAULT_WRITE_WORKERS, DEFAULT_STAGING_DIR
+from code_extractor import IncrementalCodeExtractor, ExtractionResult, extract_all_code_blocks, EXTRACTOR_VERSION
+from code_edits import SEARCH_MARKER, DIVIDER_MARKER, REPLACE_MARKER, apply_blocks, apply_edits, is_edit_block, parse_edits
+from history_log import SessionLog, DEFAULT_HISTORY_LOG
+from session_index import SessionIndex, DEFAULT_SESSIONS_DIR
+from retention import RetentionPolicy, UsageRollups, remove_old_files, DEFAULT_ROLLUPS_FILE
+from extraction_ledger import ExtractionLedger, file_fingerprint, DEFAULT_LEDGER_FILE
+from blob_store import BlobStore, LazySession, DEFAULT_BLOB_DIR, DEFAULT_COMPRESSION
+from state_store import SQLiteStateStore, DEFAULT_SQLITE_PATH, STATE_SECTIONS
+from response_cache import ResponseCache
+from state_merge import merge_config
+
+# Tempos registrados para respostas que não vieram de uma requisição própria (cache local, lotes)
+OFFLINE_TIMINGS = {"connect_time": 0, "ttfb": 0, "connection_reused": True}
+
+# Diretório das respostas salvas para referência (temp_response_<módulo>.txt, ver save_temp_response);
+# só os arquivos dele são removidos pela retenção
+TEMP_RESPONSES_DIR = "responses"
+
+# Sessões recentes lembradas pelo hash da resposta, para associar a extração à sessão certa
+RECENT_SESSIONS_BY_RESPONSE = 64
+
+# Trecho do prompt gerado que deve ser substituído pelos requisitos da etapa
+REQUIREMENTS_PLACEHOLDER = "[Descreva aqui os requisitos específicos para esta etapa do desenvolvimento]"
+
+# Ferramenta usada no modo estruturado: cada arquivo chega como um bloco tool_use com esta entrada
+WRITE_FILE_TOOL = {
+    "name": "write_file",
+    "description": "Grava um arquivo do projeto. Chame uma vez para cada arquivo, sempre com o conteúdo completo.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "path": {"type": "string", "description": "Caminho relativo à raiz do projeto, ex.: core/Database.php"},
+            "language": {"type": "string", "description": "Linguagem do arquivo, ex.: php, sql, javascript"},
+            "content": {"type": "string", "description": "Conteúdo completo do arquivo"}
+        },
+        "required": ["path", "language", "content"]
+    }
+}
+
+# Instrução acrescentada ao prompt no modo estruturado
+STRUCTURED_OUTPUT_INSTRUCTION = (
+    "Entregue cada arquivo chamando a ferramenta write_file (um arquivo por chamada, com o conteúdo "
+    "completo) em vez de escrevê-lo em blocos de código no texto. Use o texto apenas para as instruções."
+)
+
+# Instrução acrescentada ao prompt no modo de edição (ver code_edits)
+EDIT_MODE_INSTRUCTION = (
+    "Para alterar um dos arquivos acima, não repita o arquivo inteiro: escreva o caminho dele seguido de \":\" "
+    "(ex.: Para o arquivo `core/Database.php`:) e um bloco de código só com as edições, no formato\n"
+    f"{SEARCH_MARKER}\nlinhas inteiras do trecho atual, copiadas exatamente, em número suficiente para ser único\n"
+    f"{DIVIDER_MARKER}\ntrecho novo\n{REPLACE_MARKER}\n"
+    "Use vários pares SEARCH/REPLACE no mesmo bloco para várias alterações no arquivo. "
+    "Arquivos novos continuam vindo inteiros, com // File: caminho na primeira linha do bloco."
+)
+
+# Pedido enviado quando as edições de algum arquivo não puderam ser aplicadas
+FULL_FILE_FALLBACK_PROMPT = (
+    "As edições abaixo não puderam ser aplicadas aos arquivos atuais:\n{errors}\n\n"
+    "Entregue o conteúdo completo e atualizado de cada um desses arquivos, com todas as alterações "
+    "pedidas, cada um no seu bloco de código com // File: caminho na primeira linha."
+)
 
 class ClaudeProjectManager:
     """
@@ -19,12 +86,138 @@ class ClaudeProjectManager:
         """Inicializa o gerenciador de projeto com a configuração básica."""
         self.config_file = config_file
         self.config = self._load_or_create_config()
+        # Protege a configuração quando prompts rodam em várias threads
+        self._lock = threading.RLock()
+        # Entre processos: lock do arquivo e a versão lida, para detectar gravações concorrentes
+        self._config_file_lock = FileLock(self.config_file + ".lock")
+        self._base = copy.deepcopy(self.config)
+        # Gravações adiadas por transaction() ou pelo modo write-behind
+        self._transaction_depth = 0
+        self._dirty = False
+        self._flush_interval = float(self.config.get("storage", {}).get("flush_interval", 0))
         self.setup_logging()
         self.logger.info("Gerenciador de projeto inicializado")
         
+        # Estado em SQLite (opcional) ou no próprio arquivo; sessões no banco ou num log JSONL
+        self.state_store = None
+        if self.config.get("storage", {}).get("backend", "json") == "sqlite":
+            self._open_state_store()
+        else:
+            self.config["history"].setdefault("log_file", DEFAULT_HISTORY_LOG)
+            self.session_log = SessionLog(self._history_log_path())
+        self._migrate_inline_sessions()
+        
+        # Índice nome -> módulo, reconstruído quando a lista de módulos muda
+        self._module_index = {}
+        self._module_index_source = None
+        
+        # Modo write-behind: as alterações são gravadas a cada flush_interval segundos
+        if self._flush_interval > 0:
+            self._flush_thread = threading.Thread(target=self._write_behind_loop, daemon=True)
+            self._flush_thread.start()
+            atexit.register(self.flush)
+        
         # Caminho base para o projeto
         self.base_path = "/Applications/XAMPP/xamppfiles/htdocs/restaurante_sistema"
         
+        # Transporte HTTP (pool de conexões), criado no primeiro uso
+        self._transport = None
+        
+        # Textos das sessões (prompt, resposta, contexto) deduplicados, criado no primeiro uso
+        self._blob_store = None
+        
+        # Índice das sessões salvas em sessions/, a última sessão salva por cada thread e as
+        # sessões recentes pelo hash da resposta (a extração pode rodar em outra thread)
+        self._session_index = None
+        self._last_session = threading.local()
+        self._sessions_by_response = {}
+        
+        # Cache local de respostas: "use" (lê e grava), "refresh" (só grava) ou "off"
+        self._response_cache = None
+        self.response_cache_mode = "use" if self.config.get("cache", {}).get("enabled") else "off"
+        
+    @property
+    def transport(self):
+        """Transporte HTTP compartilhado por todos os prompts deste processo."""
+        if self._transport is None:
+            self._transport = ClaudeTransport.from_config(self.config["api"])
+        return self._transport
+    
+    @property
+    def response_cache(self):
+        """Cache local de respostas configurado em config["cache"]."""
+        if self._response_cache is None:
+            self._response_cache = ResponseCache.from_config(self.config.get("cache", {}))
+        return self._response_cache
+    
+    @property
+    def blob_store(self):
+        """Armazenamento deduplicado dos textos das sessões (config["storage"])."""
+        if self._blob_store is None:
+            self._blob_store = BlobStore.from_config(self.config.get("storage", {}))
+        return self._blob_store
+    
+    @property
+    def session_index(self):
+        """Índice das sessões salvas no diretório sessions/."""
+        if self._session_index is None:
+            self._session_index = SessionIndex(DEFAULT_SESSIONS_DIR)
+        return self._session_index
+    
+    def use_blob_store(self):
+        """Indica se os textos das novas sessões vão para o armazenamento deduplicado."""
+        return self.config.get("storage", {}).get("blob_store", False)
+    
+    def set_response_cache_mode(self, mode):
+        """
+        Define o uso do cache local de respostas neste processo.
+        
+        Args:
+            mode: "use" (lê e grava), "refresh" (ignora o que está guardado mas grava
+                a resposta nova) ou "off" (não usa o cache)
+        """
+        if mode not in ("use", "refresh", "off"):
+            raise ValueError(f"Modo de cache inválido: {mode}")
+        self.response_cache_mode = mode
+    
+    def _lookup_response_cache(self, data):
+        """
+        Procura no cache local a resposta de uma requisição.
+        
+        Returns:
+            Tupla (chave, resposta) - a chave é None com o cache desligado e a resposta
+            é None quando não há acerto
+        """
+        if self.response_cache_mode == "off":
+            return None, None
+        cache_key = ResponseCache.make_key(data)
+        if self.response_cache_mode == "refresh":
+            return cache_key, None
+        
+        cached = self.response_cache.get(cache_key)
+        counter = "response_cache_hits" if cached is not None else "response_cache_misses"
+        with self._lock:
+            self.config["history"][counter] = self.config["history"].get(counter, 0) + 1
+        if cached is not None:
+            self.logger.info(f"Resposta servida do cache local ({cache_key[:12]})")
+        return cache_key, cached
+    
+    def _store_response_cache(self, cache_key, response_json):
+        """Guarda uma resposta bem-sucedida no cache local."""
+        if cache_key is None:
+            return
+        try:
+            self.response_cache.put(cache_key, response_json)
+        except OSError as e:
+            self.logger.warning(f"Não foi possível gravar a resposta no cache local: {str(e)}")
+    
+    def close(self):
+        """Grava as alterações pendentes e fecha as conexões abertas pelo transporte HTTP."""
+        self.flush()
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+        
     def setup_logging(self):
         """Configura o sistema de logs."""
         log_dir = "logs"
@@ -68,7 +261,42 @@ class ClaudeProjectManager:
                 "api": {
                     "claude_api_key": "",
                     "api_endpoint": "https://api.anthropic.com/v1/messages",
-                    "model": "claude-3-sonnet-20240229"
+                    "model": "claude-3-sonnet-20240229",
+                    "pool_size": 10,
+                    "connect_timeout": 10,
+                    "read_timeout": 600,
+                    "max_retries": 5,
+                    "requests_per_minute": 50,
+                    "tokens_per_minute": 80000,
+                    "prompt_caching": True,
+                    "max_tokens": 10000,
+                    "max_continuations": 3,
+                    "max_total_output_tokens": 40000,
+                    "max_tool_rounds": 10
+                },
+                "cache": {
+                    "enabled": False,
+                    "dir": "cache/responses",
+                    "max_size_mb": 500,
+                    "max_age_days": 30
+                },
+                "storage": {
+                    "backend": "json",
+                    "sqlite_path": DEFAULT_SQLITE_PATH,
+                    "flush_interval": 0,
+                    "blob_store": True,
+                    "blob_dir": DEFAULT_BLOB_DIR,
+                    "blob_compression": DEFAULT_COMPRESSION,
+                    "write_workers": DEFAULT_WRITE_WORKERS,
+                    "staging_dir": DEFAULT_STAGING_DIR,
+                    "extraction_ledger": DEFAULT_LEDGER_FILE
+                },
+                "retention": {
+                    "max_age_days": 0,
+                    "max_sessions_per_module": 0,
+                    "max_size_mb": 0,
+                    "logs_max_age_days": 0,
+                    "rollups_file": DEFAULT_ROLLUPS_FILE
                 },
                 "project": {
                     "name": "restaurante-sistema",
@@ -82,20 +310,181 @@ class ClaudeProjectManager:
                     "in_progress_modules": []
                 },
                 "history": {
-                    "sessions": [],
+                    "log_file": DEFAULT_HISTORY_LOG,
+                    "total_sessions": 0,
                     "total_tokens_used": 0
                 }
             }
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4)
+            atomic_write_json(self.config_file, default_config)
             return default_config
     
+    def _open_state_store(self):
+        """Abre o banco SQLite do estado; na primeira vez, importa o estado do arquivo JSON."""
+        self.state_store = SQLiteStateStore.from_config(self.config, self.config_file)
+        if self.state_store.is_empty():
+            self.config["history"].setdefault("log_file", DEFAULT_HISTORY_LOG)
+            self.state_store.save_state(self.config)
+            self.state_store.extend(SessionLog(self._history_log_path()))
+            self.logger.info(f"Estado do projeto importado para '{self.state_store.path}'")
+            self.save_config()
+        else:
+            self.config.update(self.state_store.load_state())
+            self._base = copy.deepcopy(self.config)
+        self.session_log = self.state_store
+    
+    def switch_storage_backend(self, backend):
+        """
+        Troca o armazenamento do estado entre "json" (arquivo de configuração + log JSONL) e
+        "sqlite", copiando o estado e as sessões para o novo armazenamento.
+        """
+        if backend not in ("json", "sqlite"):
+            raise ValueError(f"Armazenamento inválido: {backend}")
+        with self._lock:
+            self.config.setdefault("storage", {})["backend"] = backend
+            self.config["history"].setdefault("log_file", DEFAULT_HISTORY_LOG)
+            if backend == "sqlite":
+                store = SQLiteStateStore.from_config(self.config, self.config_file)
+                store.save_state(self.config)
+                store.extend(self.session_log)
+                self.state_store = self.session_log = store
+            else:
+                session_log = SessionLog(self._history_log_path())
+                session_log.extend(self.session_log)
+                self.session_log = session_log
+                self.state_store = None
+            self.save_config()
+        self.logger.info(f"Armazenamento do estado alterado para '{backend}'")
+    
+    def _history_log_path(self):
+        """Caminho do log de sessões; relativo ao diretório do arquivo de configuração."""
+        log_file = self.config["history"]["log_file"]
+        if os.path.isabs(log_file):
+            return log_file
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_file)), log_file)
+    
+    @property
+    def usage_rollups(self):
+        """Agregados das sessões removidas pela retenção; relativos ao diretório do arquivo de configuração."""
+        rollups_file = self.config.get("retention", {}).get("rollups_file", DEFAULT_ROLLUPS_FILE)
+        if not os.path.isabs(rollups_file):
+            rollups_file = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), rollups_file)
+        return UsageRollups(rollups_file)
+    
+    @property
+    def staging_dir(self):
+        """Diretório dos temporários da gravação dos arquivos; relativo ao diretório do arquivo de configuração."""
+        staging_dir = self.config.get("storage", {}).get("staging_dir", DEFAULT_STAGING_DIR)
+        if not os.path.isabs(staging_dir):
+            staging_dir = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), staging_dir)
+        return staging_dir
+    
+    @property
+    def extraction_ledger(self):
+        """Registro das extrações aplicadas; relativo ao diretório do arquivo de configuração."""
+        ledger_file = self.config.get("storage", {}).get("extraction_ledger", DEFAULT_LEDGER_FILE)
+        if not os.path.isabs(ledger_file):
+            ledger_file = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), ledger_file)
+        return ExtractionLedger(ledger_file)
+    
+    def _migrate_inline_sessions(self):
+        """
+        Move as sessões guardadas dentro da configuração (formato antigo) para o log de sessões.
+        Sessões que já estão no log não são duplicadas, então a migração pode ser repetida.
+        """
+        history = self.config["history"]
+        if "sessions" not in history:
+            return
+        added = self.session_log.extend(history["sessions"])
+        del history["sessions"]
+        history["total_sessions"] = self.session_log.count()
+        self.save_config()
+        self.logger.info(f"{added} sessões migradas da configuração para '{self.session_log.path}'")
+    
     def save_config(self):
-        """Salva a configuração atual no arquivo."""
-        with open(self.config_file, 'w', encoding='utf-8') as f:
-            json.dump(self.config, f, indent=4)
+        """
+        Salva a configuração atual no arquivo (e o estado no banco, com o backend SQLite).
+        Dentro de transaction() ou no modo write-behind, a gravação é adiada e agrupada.
+        """
+        with self._lock:
+            if self._transaction_depth or self._flush_interval > 0:
+                self._dirty = True
+                return
+            self._write_config()
+    
+    def _write_config(self):
+        """
+        Grava a configuração com o lock do arquivo. Se outro processo gravou desde a última
+        leitura (revisão diferente), as alterações dos dois são mescladas antes da gravação.
+        """
+        with self._lock, self._config_file_lock:
+            stored = self._read_stored_config()
+            if stored is not None and stored.get("revision", 0) != self._base.get("revision", 0):
+                self.logger.info("Configuração alterada por outro processo; mesclando as alterações")
+                merged = merge_config(self._base, self.config, stored)
+                for key in [key for key in self.config if key not in merged]:
+                    del self.config[key]
+                self.config.update(merged)
+            self.config["revision"] = (stored or self.config).get("revision", 0) + 1
+            
+            if self.state_store is not None:
+                self.state_store.save_state(self.config)
+                settings = {key: value for key, value in self.config.items() if key not in STATE_SECTIONS}
+            else:
+                settings = self.config
+            atomic_write_json(self.config_file, settings)
+            self._base = copy.deepcopy(self.config)
+            self._dirty = False
         self.logger.info("Configuração salva")
     
+    def _read_stored_config(self):
+        """Lê a configuração como está gravada agora (arquivo e, com SQLite, o banco)."""
+        try:
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.state_store is not None and not self.state_store.is_empty():
+            stored.update(self.state_store.load_state())
+        return stored
+    
+    def flush(self):
+        """Grava imediatamente as alterações adiadas, se houver."""
+        with self._lock:
+            if self._dirty:
+                self._write_config()
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Agrupa as alterações feitas dentro do bloco numa única gravação atômica ao sair dele.
+        Pode ser aninhado; só o bloco mais externo grava. As alterações em memória não são
+        desfeitas se o bloco levantar uma exceção, e também são gravadas nesse caso.
+        
+        Exemplo:
+            with manager.transaction():
+                manager.set_current_module("core")
+                manager.update_module_progress("core", 100)
+        """
+        with self._lock:
+            self._transaction_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._transaction_depth -= 1
+                if self._transaction_depth == 0 and self._flush_interval <= 0:
+                    self.flush()
+    
+    def _write_behind_loop(self):
+        while True:
+            time.sleep(self._flush_interval)
+            try:
+                with self._lock:
+                    if not self._transaction_depth:
+                        self.flush()
+            except Exception as e:
+                self.logger.error(f"Erro ao gravar a configuração em segundo plano: {str(e)}")
+    
     def set_api_key(self, api_key):
         """Define a chave da API do Claude."""
         self.config["api"]["claude_api_key"] = api_key
@@ -143,6 +532,17 @@ class ClaudeProjectManager:
             self.logger.error(f"Erro ao carregar contexto do projeto: {str(e)}")
             return "Erro ao carregar contexto do projeto."
     
+    def get_module(self, module_name):
+        """Retorna o módulo com o nome informado, ou None; a busca usa um índice por nome."""
+        modules = self.config["project"]["modules"]
+        module = self._module_index.get(module_name)
+        if self._module_index_source is not modules or len(self._module_index) != len(modules) \
+                or module is None or module.get("name") != module_name:
+            self._module_index = {m["name"]: m for m in modules}
+            self._module_index_source = modules
+            module = self._module_index.get(module_name)
+        return module
+    
     def create_module(self, module_name, description, priority=1):
         """Cria um novo módulo para desenvolvimento."""
         module = {
@@ -164,42 +564,59 @@ class ClaudeProjectManager:
     
     def set_current_module(self, module_name):
         """Define o módulo atual de trabalho."""
-        found = False
-        for module in self.config["project"]["modules"]:
-            if module["name"] == module_name:
-                found = True
-                self.config["context"]["current_module"] = module_name
+        module = self.get_module(module_name)
+        if module is None:
+            self.logger.error(f"Módulo '{module_name}' não encontrado")
+            return
+        
+        self.config["context"]["current_module"] = module_name
+        if module_name not in self.config["context"]["in_progress_modules"]:
+            self.config["context"]["in_progress_modules"].append(module_name)
+        module["status"] = "in_progress"
+        self.save_config()
+        self.logger.info(f"Módulo atual definido como '{module_name}'")
+    
+    def start_module(self, module_name):
+        """
+        Marca um módulo como em andamento sem alterar o módulo atual.
+        Usado quando vários módulos são desenvolvidos ao mesmo tempo.
+        """
+        with self._lock:
+            module = self.get_module(module_name)
+            if module is not None:
                 if module_name not in self.config["context"]["in_progress_modules"]:
                     self.config["context"]["in_progress_modules"].append(module_name)
-                module["status"] = "in_progress"
+                if module["status"] != "completed":
+                    module["status"] = "in_progress"
                 self.save_config()
-                self.logger.info(f"Módulo atual definido como '{module_name}'")
-                break
+                return True
         
-        if not found:
-            self.logger.error(f"Módulo '{module_name}' não encontrado")
+        self.logger.error(f"Módulo '{module_name}' não encontrado")
+        return False
     
     def complete_module(self, module_name):
         """Marca um módulo como concluído."""
-        for i, module in enumerate(self.config["project"]["modules"]):
-            if module["name"] == module_name:
-                module["status"] = "completed"
-                module["completed_at"] = datetime.now().isoformat()
-                module["progress"] = 100
-                
-                # Remove from in_progress and add to completed
-                if module_name in self.config["context"]["in_progress_modules"]:
-                    self.config["context"]["in_progress_modules"].remove(module_name)
-                if module_name not in self.config["context"]["completed_modules"]:
-                    self.config["context"]["completed_modules"].append(module_name)
-                
-                self.save_config()
-                self._recalculate_project_progress()
-                self.logger.info(f"Módulo '{module_name}' marcado como concluído")
-                return True
+        module = self.get_module(module_name)
+        if module is None:
+            self.logger.error(f"Módulo '{module_name}' não encontrado")
+            return False
         
-        self.logger.error(f"Módulo '{module_name}' não encontrado")
-        return False
+        # Status e progresso do projeto são gravados juntos
+        with self.transaction():
+            module["status"] = "completed"
+            module["completed_at"] = datetime.now().isoformat()
+            module["progress"] = 100
+            
+            # Remove from in_progress and add to completed
+            if module_name in self.config["context"]["in_progress_modules"]:
+                self.config["context"]["in_progress_modules"].remove(module_name)
+            if module_name not in self.config["context"]["completed_modules"]:
+                self.config["context"]["completed_modules"].append(module_name)
+            
+            self.save_config()
+            self._recalculate_project_progress()
+        self.logger.info(f"Módulo '{module_name}' marcado como concluído")
+        return True
     
     def _recalculate_project_progress(self):
         """Recalcula o progresso do projeto baseado nos módulos."""
@@ -227,30 +644,27 @@ class ClaudeProjectManager:
             self.logger.error(f"Progresso deve estar entre 0 e 100. Recebido: {progress}")
             return False
         
-        for module in self.config["project"]["modules"]:
-            if module["name"] == module_name:
-                module["progress"] = progress
-                if progress == 100:
-                    self.complete_module(module_name)
-                else:
-                    self.save_config()
-                    self._recalculate_project_progress()
-                self.logger.info(f"Progresso do módulo '{module_name}' atualizado para {progress}%")
-                return True
+        module = self.get_module(module_name)
+        if module is None:
+            self.logger.error(f"Módulo '{module_name}' não encontrado")
+            return False
         
-        self.logger.error(f"Módulo '{module_name}' não encontrado")
-        return False
+        with self.transaction():
+            module["progress"] = progress
+            if progress == 100:
+                self.complete_module(module_name)
+            else:
+                self.save_config()
+                self._recalculate_project_progress()
+        self.logger.info(f"Progresso do módulo '{module_name}' atualizado para {progress}%")
+        return True
 
-    def send_prompt_to_claude(self, prompt_text, save_history=True):
+    def _get_api_headers(self):
         """
-        Envia um prompt para a API do Claude e retorna a resposta.
+        Monta os cabeçalhos de autenticação da API.
         
-        Args:
-            prompt_text: O texto do prompt para enviar
-            save_history: Se deve salvar o histórico da conversa
-            
         Returns:
-            A resposta completa da API e o texto da resposta extraído
+            Dicionário de cabeçalhos ou None se não houver API key
         """
         # Verifica se há uma API key configurada
         api_key = self.config["api"]["claude_api_key"]
@@ -258,82 +672,821 @@ class ClaudeProjectManager:
             # Tenta carregar do arquivo api.txt
             if not self._load_api_key_from_file():
                 self.logger.error("API key não configurada")
-                return None, "API key não configurada. Por favor, configure a API key."
+                return None
             api_key = self.config["api"]["claude_api_key"]
             
         # DEBUG: exibe parte da chave para confirmação
         masked_key = f"{api_key[:10]}...{api_key[-5:]}" if len(api_key) > 15 else "muito curta"
         print(f"Usando API key: {masked_key}")
         
-        headers = {
+        return {
             "x-api-key": api_key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json"
         }
+    
+    def _build_message_params(self, prompt_text, context_text=None):
+        """
+        Monta o corpo de uma requisição para a Messages API.
+        
+        Args:
+            prompt_text: O texto do prompt
+            context_text: Contexto estático do projeto; se informado, vai num bloco próprio
+                antes do prompt, marcado com cache_control para reaproveitar o cache de prompt
+        """
+        if context_text:
+            content = [
+                {"type": "text", "text": context_text, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": prompt_text}
+            ]
+        else:
+            content = prompt_text
         
-        data = {
+        return {
             "model": self.config["api"]["model"],
-            "max_tokens": 10000,
-            "messages": [{"role": "user", "content": prompt_text}]
+            "max_tokens": self.config["api"].get("max_tokens", 10000),
+            "messages": [{"role": "user", "content": content}]
         }
+    
+    def _build_request(self, prompt_text, context_text=None):
+        """
+        Monta os cabeçalhos e o corpo de uma requisição para a Messages API.
+        
+        Returns:
+            Tupla (headers, data) ou (None, mensagem de erro) se não houver API key
+        """
+        headers = self._get_api_headers()
+        if headers is None:
+            return None, "API key não configurada. Por favor, configure a API key."
+        return headers, self._build_message_params(prompt_text, context_text)
+    
+    def _record_response(self, prompt_text, response_json, text, response_time, timings,
+                         save_history=True, extra=None, module_name=None, context_text=None,
+                         from_cache=False):
+        """
+        Contabiliza os tokens de uma resposta e, se pedido, registra a sessão no histórico.
+        Respostas servidas pelo cache local (from_cache=True) não consomem tokens.
+        
+        Returns:
+            Número de tokens usados pela resposta
+        """
+        # Registra estatísticas (tokens gravados e lidos do cache de prompt também contam)
+        usage = response_json.get("usage", {})
+        cache_creation_tokens = usage.get("cache_creation_input_tokens") or 0
+        cache_read_tokens = usage.get("cache_read_input_tokens") or 0
+        tokens_used = usage.get("input_tokens", 0) + usage.get("output_tokens", 0) + \
+                      cache_creation_tokens + cache_read_tokens
+        if from_cache:
+            tokens_used = cache_creation_tokens = cache_read_tokens = 0
+        else:
+            self.transport.record_usage(timings, tokens_used)
+        
+        with self._lock:
+            history = self.config["history"]
+            history["total_tokens_used"] += tokens_used
+            history["cache_creation_input_tokens"] = history.get("cache_creation_input_tokens", 0) + cache_creation_tokens
+            history["cache_read_input_tokens"] = history.get("cache_read_input_tokens", 0) + cache_read_tokens
+            
+            # Uma resposta sem sessão não herda a sessão anterior desta thread
+            self._last_session.value = None
+            if save_history:
+                # Cria um ID para essa sessão
+                session_id = hashlib.md5(f"{prompt_text}_{datetime.now().isoformat()}".encode()).hexdigest()
+            
+                # Salva a sessão no histórico
+                session = {
+                    "id": session_id,
+                    "timestamp": datetime.now().isoformat(),
+                    "module": module_name or self.config["context"]["current_module"],
+                    "prompt": prompt_text,
+                    "response": text,
+                    "tokens_used": tokens_used,
+                    "stop_reason": response_json.get("stop_reason"),
+                    "cache_creation_input_tokens": cache_creation_tokens,
+                    "cache_read_input_tokens": cache_read_tokens,
+                    "response_time": round(response_time, 2),
+                    "connect_time": timings["connect_time"],
+                    "ttfb": timings["ttfb"],
+                    "connection_reused": timings["connection_reused"],
+                    "retries": timings.get("retries", 0),
+                    "rate_limit_wait": timings.get("rate_limit_wait", 0)
+                }
+                if from_cache:
+                    session["response_cache"] = "hit"
+                if context_text:
+                    # O contexto é sempre o mesmo arquivo; basta o hash para identificá-lo
+                    session["context_hash"] = hashlib.sha256(context_text.encode()).hexdigest()
+                if extra:
+                    session.update(extra)
+            
+                # Com o armazenamento deduplicado, a sessão guarda só as referências dos textos
+                if self.use_blob_store():
+                    session = self._pack_session(session, context_text)
+            
+                # Acrescenta a sessão ao log; a configuração guarda só os contadores
+                self.session_log.append(session)
+                history["total_sessions"] = history.get("total_sessions", 0) + 1
+                self.save_config()
+            
+                # Salva em arquivo separado para facilitar acesso e atualiza o índice
+                status = "cached" if from_cache else response_json.get("stop_reason")
+                self._save_session_to_file(session, status, BlobStore.ref_for(text) if text else None)
+        
+        self.logger.info(
+            f"Prompt enviado, {tokens_used} tokens usados, resposta em {round(response_time, 2)}s "
+            f"(conexão: {timings['connect_time']}s, reutilizada: {timings['connection_reused']}, TTFB: {timings['ttfb']}s, "
+            f"cache: {cache_read_tokens} lidos / {cache_creation_tokens} gravados)"
+        )
+        return tokens_used
+
+    def send_prompt_to_claude(self, prompt_text, save_history=True, stream=False, on_text=None,
+                              module_name=None, context_text=None):
+        """
+        Envia um prompt para a API do Claude e retorna a resposta.
+        
+        Args:
+            prompt_text: O texto do prompt para enviar
+            save_history: Se deve salvar o histórico da conversa
+            stream: Se True, usa o modo streaming (SSE) da API
+            on_text: Função chamada com cada trecho de texto recebido no modo streaming
+            module_name: Módulo ao qual a sessão pertence (se None, usa o módulo atual)
+            context_text: Contexto estático do projeto, enviado como bloco cacheável
+            
+        Returns:
+            A resposta completa da API e o texto da resposta extraído
+        """
+        if stream:
+            stream_gen = self.stream_prompt_to_claude(prompt_text, save_history, module_name, context_text)
+            try:
+                while True:
+                    delta = next(stream_gen)
+                    if on_text:
+                        on_text(delta)
+            except StopIteration as stop:
+                return stop.value
+        
+        headers, data = self._build_request(prompt_text, context_text)
+        if headers is None:
+            return None, data
+        
+        cache_key, cached = self._lookup_response_cache(data)
+        if cached is not None:
+            text = self._response_text(cached)
+            self._record_response(prompt_text, cached, text, 0, OFFLINE_TIMINGS, save_history,
+                                  module_name=module_name, context_text=context_text, from_cache=True)
+            return cached, text
         
         try:
             start_time = time.time()
-            response = requests.post(
-                self.config["api"]["api_endpoint"],
-                headers=headers,
-                json=data
-            )
+            responses = []
+            round_timings = []
+            rounds = []
+            text = ""
+            params = data
+            error_response = None
+            while True:
+                round_start = time.time()
+                response, timings = self.transport.post(
+                    self.config["api"]["api_endpoint"],
+                    headers,
+                    params
+                )
+                
+                if response.status_code != 200:
+                    error_msg = f"Erro API ({response.status_code}): {response.text}"
+                    self.logger.error(error_msg)
+                    if not responses:
+                        return response, error_msg
+                    # Mantém o que já foi gerado nas rodadas anteriores
+                    error_response = response
+                    break
+                
+                response_json = response.json()
+                responses.append(response_json)
+                round_timings.append(timings)
+                rounds.append(self._round_summary(response_json, time.time() - round_start))
+                text += self._response_text(response_json)
+                
+                if not self._should_continue(responses):
+                    break
+                # A API não aceita prefill terminado em espaço em branco
+                text = text.rstrip()
+                params = self._continuation_params(data, text)
             end_time = time.time()
             
-            if response.status_code == 200:
-                response_json = response.json()
-                content = response_json.get("content", [])
-                text = "".join([block.get("text", "") for block in content if block.get("type") == "text"])
+            response_json = self._merge_rounds(responses, text)
+            if error_response is None and response_json.get("stop_reason") != "max_tokens":
+                self._store_response_cache(cache_key, response_json)
+            
+            self._record_response(prompt_text, response_json, text, end_time - start_time,
+                                  self._merge_round_timings(round_timings), save_history,
+                                  {"rounds": rounds}, module_name, context_text)
+            return response_json, text
+        
+        except Exception as e:
+            error_msg = f"Erro ao enviar prompt: {str(e)}"
+            self.logger.error(error_msg)
+            return None, error_msg
+    
+    def _should_continue(self, responses):
+        """Indica se uma resposta cortada por max_tokens deve ganhar mais uma rodada."""
+        if responses[-1].get("stop_reason") != "max_tokens":
+            return False
+        
+        max_continuations = self.config["api"].get("max_continuations", 3)
+        max_output_tokens = self.config["api"].get("max_total_output_tokens", 40000)
+        output_tokens = sum(r.get("usage", {}).get("output_tokens", 0) for r in responses)
+        if len(responses) - 1 >= max_continuations:
+            self.logger.warning(f"Resposta cortada por max_tokens após {max_continuations} continuações")
+            return False
+        if output_tokens >= max_output_tokens:
+            self.logger.warning(f"Resposta cortada por max_tokens após {output_tokens} tokens de saída")
+            return False
+        
+        self.logger.info(f"Resposta cortada por max_tokens; pedindo continuação ({len(responses)})")
+        return True
+    
+    def _continuation_params(self, data, partial_text):
+        """Monta a requisição que continua uma resposta usando o texto parcial como prefill."""
+        params = dict(data)
+        params["messages"] = data["messages"][:1] + [{"role": "assistant", "content": partial_text}]
+        return params
+    
+    def _round_summary(self, response_json, response_time):
+        """Resumo de uma rodada (resposta original ou continuação) para o registro da sessão."""
+        return {
+            "stop_reason": response_json.get("stop_reason"),
+            "usage": response_json.get("usage", {}),
+            "response_time": round(response_time, 2)
+        }
+    
+    def _merge_rounds(self, responses, text):
+        """Junta as rodadas de uma resposta continuada numa única mensagem."""
+        if len(responses) == 1:
+            return responses[0]
+        
+        merged = dict(responses[-1])
+        merged["content"] = [{"type": "text", "text": text}]
+        merged["usage"] = self._merge_usage(responses)
+        merged["continuations"] = len(responses) - 1
+        return merged
+    
+    def _merge_usage(self, responses):
+        """Soma os contadores de uso de várias respostas."""
+        usage = {}
+        for response_json in responses:
+            for key, value in response_json.get("usage", {}).items():
+                if isinstance(value, (int, float)):
+                    usage[key] = usage.get(key, 0) + value
+        return usage
+    
+    def _merge_round_timings(self, round_timings):
+        """Soma os tempos das rodadas; conexão e TTFB de referência são os da primeira."""
+        merged = dict(round_timings[0])
+        for key in ("retries", "rate_limit_wait", "estimated_tokens"):
+            if key in merged:
+                merged[key] = sum(timings.get(key, 0) for timings in round_timings)
+        merged["connect_time"] = round(sum(timings["connect_time"] for timings in round_timings), 4)
+        return merged
+    
+    def _response_text(self, response_json):
+        """Junta o texto de todos os blocos de texto de uma resposta."""
+        content = response_json.get("content", [])
+        return "".join([block.get("text", "") for block in content if block.get("type") == "text"])
+    
+    def stream_prompt_to_claude(self, prompt_text, save_history=True, module_name=None, context_text=None):
+        """
+        Envia um prompt no modo streaming (SSE) e gera os trechos de texto à medida que chegam.
+        
+        Args:
+            prompt_text: O texto do prompt para enviar
+            save_history: Se deve salvar o histórico da conversa
+            module_name: Módulo ao qual a sessão pertence (se None, usa o módulo atual)
+            context_text: Contexto estático do projeto, enviado como bloco cacheável
+            
+        Yields:
+            Trechos de texto da resposta
+            
+        Returns:
+            Ao terminar, a mensagem completa e o texto da resposta (valor do StopIteration),
+            ou (None, mensagem de erro) em caso de falha
+        """
+        headers, data = self._build_request(prompt_text, context_text)
+        if headers is None:
+            return None, data
+        
+        cache_key, cached = self._lookup_response_cache(data)
+        if cached is not None:
+            text = self._response_text(cached)
+            if text:
+                yield text
+            self._record_response(prompt_text, cached, text, 0, OFFLINE_TIMINGS, save_history,
+                                  {"stream": True}, module_name, context_text, from_cache=True)
+            return cached, text
+        
+        data["stream"] = True
+        
+        try:
+            start_time = time.time()
+            first_token_time = None
+            responses = []
+            round_timings = []
+            rounds = []
+            text = ""
+            params = data
+            # Espaço em branco no fim de uma rodada só é entregue quando se sabe que a resposta
+            # continua com o mesmo texto (o prefill da continuação não pode terminar em espaço)
+            pending_whitespace = ""
+            error_msg = None
+            while True:
+                round_start = time.time()
+                response, timings = self.transport.post(
+                    self.config["api"]["api_endpoint"],
+                    headers,
+                    params,
+                    stream=True
+                )
                 
-                # Registra estatísticas
-                tokens_used = response_json.get("usage", {}).get("input_tokens", 0) + \
-                              response_json.get("usage", {}).get("output_tokens", 0)
+                if response.status_code != 200:
+                    error_msg = f"Erro API ({response.status_code}): {response.text}"
+                    self.logger.error(error_msg)
+                    if not responses:
+                        return response, error_msg
+                    break
                 
-                self.config["history"]["total_tokens_used"] += tokens_used
+                streamed = StreamedMessage()
+                with response:
+                    for _, event in iter_sse_events(response):
+                        delta = streamed.apply(event)
+                        if streamed.error:
+                            error_msg = f"Erro API durante o streaming: {streamed.error}"
+                            self.logger.error(error_msg)
+                            break
+                        if delta:
+                            if first_token_time is None:
+                                first_token_time = time.time()
+                            text += delta
+                            delta = pending_whitespace + delta
+                            stripped = delta.rstrip()
+                            pending_whitespace = delta[len(stripped):]
+                            if stripped:
+                                yield stripped
                 
-                if save_history:
-                    # Cria um ID para essa sessão
-                    session_id = hashlib.md5(f"{prompt_text}_{datetime.now().isoformat()}".encode()).hexdigest()
-                    
-                    # Salva a sessão no histórico
-                    session = {
-                        "id": session_id,
-                        "timestamp": datetime.now().isoformat(),
-                        "module": self.config["context"]["current_module"],
-                        "prompt": prompt_text,
-                        "response": text,
-                        "tokens_used": tokens_used,
-                        "response_time": round(end_time - start_time, 2)
-                    }
-                    
-                    # Salva a sessão no histórico e no arquivo
-                    self.config["history"]["sessions"].append(session)
-                    self.save_config()
-                    
-                    # Salva em arquivo separado para facilitar acesso
-                    self._save_session_to_file(session)
+                if error_msg or streamed.message is None:
+                    if not responses:
+                        return None, error_msg or "Erro API: streaming encerrado sem mensagem"
+                    break
                 
-                self.logger.info(f"Prompt enviado, {tokens_used} tokens usados, resposta em {round(end_time - start_time, 2)}s")
-                return response_json, text
-            else:
-                error_msg = f"Erro API ({response.status_code}): {response.text}"
-                self.logger.error(error_msg)
-                return response, error_msg
+                responses.append(streamed.message)
+                round_timings.append(timings)
+                rounds.append(self._round_summary(streamed.message, time.time() - round_start))
+                
+                if not self._should_continue(responses):
+                    break
+                text = text.rstrip()
+                pending_whitespace = ""
+                params = self._continuation_params(data, text)
+            end_time = time.time()
+            
+            if pending_whitespace:
+                yield pending_whitespace
+            
+            response_json = self._merge_rounds(responses, text)
+            if error_msg is None and response_json.get("stop_reason") != "max_tokens":
+                self._store_response_cache(cache_key, response_json)
+            
+            extra = {
+                "stream": True,
+                "time_to_first_token": round(first_token_time - start_time, 4) if first_token_time else None,
+                "rounds": rounds
+            }
+            self._record_response(prompt_text, response_json, text, end_time - start_time,
+                                  self._merge_round_timings(round_timings), save_history, extra,
+                                  module_name, context_text)
+            return response_json, text
         
         except Exception as e:
             error_msg = f"Erro ao enviar prompt: {str(e)}"
             self.logger.error(error_msg)
             return None, error_msg
     
-    def _save_session_to_file(self, session):
-        """Salva uma sessão em um arquivo separado para facilitar acesso."""
-        sessions_dir = Path("sessions")
+    def send_structured_prompt(self, prompt_text, base_dir="restaurante-sistema", save_history=True,
+                               module_name=None, context_text=None):
+        """
+        Envia um prompt pedindo os arquivos pela ferramenta write_file e grava cada arquivo
+        a partir dos blocos tool_use da resposta, sem procurar blocos de código no texto.
+        Enquanto a resposta parar em tool_use (ou max_tokens), devolve os tool_result e pede
+        o restante, até config["api"]["max_tool_rounds"] rodadas.
+        
+        Args:
+            prompt_text: O texto do prompt para enviar
+            base_dir: Diretório base para salvar os arquivos
+            save_history: Se deve salvar o histórico da conversa
+            module_name: Módulo ao qual a sessão pertence (se None, usa o módulo atual)
+            context_text: Contexto estático do projeto, enviado como bloco cacheável
+        
+        Returns:
+            Tupla (resposta da API, texto da resposta, lista de arquivos criados); em caso de
+            erro, a resposta é None (ou a resposta HTTP) e o texto é a mensagem de erro
+        """
+        headers, data = self._build_request(f"{prompt_text}\n\n{STRUCTURED_OUTPUT_INSTRUCTION}", context_text)
+        if headers is None:
+            return None, data, []
+        data["tools"] = [WRITE_FILE_TOOL]
+        
+        cache_key, cached = self._lookup_response_cache(data)
+        if cached is not None:
+            text = self._structured_text(cached.get("content", []))
+            created_files, tool_files, _ = self._save_tool_files(cached.get("content", []), base_dir)
+            self._record_response(prompt_text, cached, text, 0, OFFLINE_TIMINGS, save_history,
+                                  {"structured": True, "files": tool_files}, module_name, context_text,
+                                  from_cache=True)
+            self._register_module_files(created_files, module_name)
+            return cached, text, created_files
+        
+        try:
+            start_time = time.time()
+            responses = []
+            round_timings = []
+            rounds = []
+            content = []
+            created_files = ExtractionResult()
+            tool_files = []
+            messages = data["messages"]
+            error_response = None
+            max_rounds = self.config["api"].get("max_tool_rounds", 10)
+            while True:
+                round_start = time.time()
+                response, timings = self.transport.post(
+                    self.config["api"]["api_endpoint"],
+                    headers,
+                    dict(data, messages=messages)
+                )
+                
+                if response.status_code != 200:
+                    error_msg = f"Erro API ({response.status_code}): {response.text}"
+                    self.logger.error(error_msg)
+                    if not responses:
+                        return response, error_msg, []
+                    error_response = response
+                    break
+                
+                response_json = response.json()
+                responses.append(response_json)
+                round_timings.append(timings)
+                rounds.append(self._round_summary(response_json, time.time() - round_start))
+                content.extend(response_json.get("content", []))
+                
+                round_files, round_tool_files, tool_results = self._save_tool_files(
+                    response_json.get("content", []), base_dir
+                )
+                created_files.merge(round_files)
+                tool_files.extend(round_tool_files)
+                
+                if response_json.get("stop_reason") not in ("tool_use", "max_tokens"):
+                    break
+                if len(responses) >= max_rounds:
+                    self.logger.warning(f"Modo estruturado interrompido após {max_rounds} rodadas")
+                    break
+                messages = messages + [
+                    {"role": "assistant", "content": response_json["content"]},
+                    {"role": "user", "content": tool_results or [{"type": "text", "text": "Continue."}]}
+                ]
+            end_time = time.time()
+            
+            text = self._structured_text(content)
+            response_json = dict(responses[-1])
+            response_json["content"] = content
+            response_json["usage"] = self._merge_usage(responses)
+            if error_response is None and response_json.get("stop_reason") != "max_tokens":
+                self._store_response_cache(cache_key, response_json)
+            
+            self._record_response(prompt_text, response_json, text, end_time - start_time,
+                                  self._merge_round_timings(round_timings), save_history,
+                                  {"structured": True, "rounds": rounds, "files": tool_files},
+                                  module_name, context_text)
+            
+            if not tool_files and "```" in text:
+                # O modelo ignorou a ferramenta; recorre à extração pelos blocos de código
+                self.logger.warning("Resposta sem chamadas a write_file; extraindo os blocos de código do texto")
+                return response_json, text, self.extract_and_save_all_code(text, base_dir, module_name)
+            
+            self._register_module_files(created_files, module_name)
+            return response_json, text, created_files
+        
+        except Exception as e:
+            error_msg = f"Erro ao enviar prompt: {str(e)}"
+            self.logger.error(error_msg)
+            return None, error_msg, []
+    
+    def _structured_text(self, content):
+        """Junta o texto das rodadas do modo estruturado, um bloco por parágrafo."""
+        return "\n\n".join(block["text"] for block in content if block.get("type") == "text" and block.get("text"))
+    
+    def _save_tool_files(self, content, base_dir):
+        """
+        Grava os arquivos das chamadas a write_file de uma lista de blocos de conteúdo.
+        
+        Returns:
+            Tupla (ExtractionResult com os caminhos gravados, entradas das chamadas válidas,
+            blocos tool_result para devolver à API)
+        """
+        created_files = ExtractionResult()
+        tool_files = []
+        tool_results = []
+        for block in content:
+            if block.get("type") != "tool_use":
+                continue
+            tool_input = block.get("input") or {}
+            if block.get("name") != WRITE_FILE_TOOL["name"] or not tool_input.get("path") \
+                    or not isinstance(tool_input.get("content"), str):
+                self.logger.warning(f"Chamada de ferramenta inválida ignorada: {block.get('name')}")
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block["id"],
+                    "content": "Chamada inválida: use write_file com path, language e content completos.",
+                    "is_error": True
+                })
+                continue
+            
+            full_path = self._normalize_file_path(tool_input["path"], base_dir)
+            saved = self._save_code_to_file(full_path, tool_input["content"], created_files)
+            if saved:
+                tool_files.append(tool_input)
+            tool_results.append({
+                "type": "tool_result",
+                "tool_use_id": block["id"],
+                "content": f"Arquivo '{tool_input['path']}' gravado." if saved else
+                           f"Erro ao gravar '{tool_input['path']}'.",
+                "is_error": not saved
+            })
+        return created_files, tool_files, tool_results
+    
+    def send_edit_prompt(self, prompt_text, base_dir="restaurante-sistema", save_history=True,
+                         module_name=None, context_text=None):
+        """
+        Envia um prompt no modo de edição: o conteúdo atual dos arquivos do módulo vai no
+        prompt e a resposta altera esses arquivos com blocos SEARCH/REPLACE (ver code_edits),
+        em vez de repeti-los inteiros. As edições são validadas contra o conteúdo em disco e
+        gravadas de uma vez; para os arquivos cujas edições não puderem ser aplicadas, um
+        segundo pedido traz o arquivo completo.
+        
+        Args:
+            prompt_text: O texto do prompt para enviar
+            base_dir: Diretório base para salvar os arquivos
+            save_history: Se deve salvar o histórico da conversa
+            module_name: Módulo cujos arquivos são enviados (se None, usa o módulo atual)
+            context_text: Contexto estático do projeto, enviado como bloco cacheável
+        
+        Returns:
+            Tupla (resposta da API, texto da resposta, ExtractionResult com os arquivos gravados);
+            em caso de erro, a resposta é None (ou a resposta HTTP) e o texto é a mensagem de erro
+        """
+        module = self.get_module(module_name or self.config["context"]["current_module"])
+        files_text = self._module_files_text(module["files"] if module else [])
+        edit_prompt = prompt_text
+        if files_text:
+            edit_prompt = f"{prompt_text}\n\n## Conteúdo atual dos arquivos\n{files_text}\n{EDIT_MODE_INSTRUCTION}"
+        
+        response_json, text = self.send_prompt_to_claude(edit_prompt, save_history, module_name=module_name,
+                                                         context_text=context_text)
+        if not response_json:
+            return response_json, text, ExtractionResult()
+        created_files = self.extract_and_save_all_code(text, base_dir, module_name)
+        if not created_files.edit_errors:
+            return response_json, text, created_files
+        
+        # Recorre aos arquivos completos só para os arquivos cujas edições falharam
+        self.logger.warning(f"Pedindo o conteúdo completo de {len(created_files.edit_errors)} arquivo(s)")
+        errors = "\n".join(f"- {path}: {error}" for path, error in created_files.edit_errors.items())
+        fallback_prompt = (f"{prompt_text}\n\n## Conteúdo atual dos arquivos\n"
+                           f"{self._module_files_text(list(created_files.edit_errors))}\n"
+                           f"{FULL_FILE_FALLBACK_PROMPT.format(errors=errors)}")
+        fallback_json, fallback_text = self.send_prompt_to_claude(fallback_prompt, save_history,
+                                                                  module_name=module_name, context_text=context_text)
+        if not fallback_json:
+            self.logger.error(f"Erro ao pedir os arquivos completos: {fallback_text}")
+            return response_json, text, created_files
+        fallback_files = self.extract_and_save_all_code(fallback_text, base_dir, module_name)
+        for path in fallback_files:
+            if created_files.edit_errors.pop(path, None) is not None:
+                created_files.failed -= 1
+        created_files.merge(fallback_files)
+        return response_json, text, created_files
+    
+    def _module_files_text(self, file_paths):
+        """Conteúdo atual dos arquivos informados, cada um num bloco de código com o caminho."""
+        sections = []
+        for file_path in file_paths:
+            content = self._read_code_file(file_path)
+            if content is None:
+                continue
+            language = os.path.splitext(file_path)[1].lstrip(".")
+            sections.append(f"Arquivo `{file_path}`:\n```{language}\n{content.rstrip()}\n```\n")
+        return "\n".join(sections)
+    
+    def _batches_endpoint(self):
+        """Endpoint da Message Batches API (derivado do endpoint de mensagens)."""
+        return self.config["api"].get("batches_endpoint") or \
+            self.config["api"]["api_endpoint"].rstrip("/") + "/batches"
+    
+    def _batch_manifest_path(self, batch_id):
+        return Path("batches") / f"{batch_id}.json"
+    
+    def _save_batch_manifest(self, manifest):
+        path = self._batch_manifest_path(manifest["id"])
+        path.parent.mkdir(exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=4)
+    
+    def _load_batch_manifest(self, batch_id):
+        path = self._batch_manifest_path(batch_id)
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def submit_batch(self, batch_requests):
+        """
+        Envia vários prompts de uma vez pela Message Batches API.
+        
+        Args:
+            batch_requests: Lista de dicionários com custom_id, module, prompt e,
+                opcionalmente, context_text
+            
+        Returns:
+            O lote criado pela API ou None em caso de erro
+        """
+        headers = self._get_api_headers()
+        if headers is None:
+            return None
+        
+        payload = {
+            "requests": [
+                {
+                    "custom_id": request["custom_id"],
+                    "params": self._build_message_params(request["prompt"], request.get("context_text"))
+                }
+                for request in batch_requests
+            ]
+        }
+        
+        try:
+            response, _ = self.transport.post(self._batches_endpoint(), headers, payload, rate_limited=False)
+        except Exception as e:
+            self.logger.error(f"Erro ao enviar lote: {str(e)}")
+            return None
+        if response.status_code != 200:
+            self.logger.error(f"Erro API ao criar lote ({response.status_code}): {response.text}")
+            return None
+        
+        batch = response.json()
+        
+        # Guarda o que é preciso para registrar as sessões quando os resultados chegarem
+        manifest = {
+            "id": batch["id"],
+            "created_at": datetime.now().isoformat(),
+            "requests": {
+                request["custom_id"]: {
+                    "module": request["module"],
+                    "prompt": request["prompt"],
+                    "context_hash": hashlib.sha256(request["context_text"].encode()).hexdigest()
+                        if request.get("context_text") else None
+                }
+                for request in batch_requests
+            },
+            "processed": []
+        }
+        self._save_batch_manifest(manifest)
+        self.logger.info(f"Lote '{batch['id']}' criado com {len(batch_requests)} prompts")
+        return batch
+    
+    def wait_for_batch(self, batch_id, poll_interval=10, max_poll_interval=300):
+        """
+        Consulta o lote com intervalos crescentes até o processamento terminar.
+        
+        Returns:
+            O lote encerrado ou None em caso de erro
+        """
+        headers = self._get_api_headers()
+        if headers is None:
+            return None
+        
+        interval = poll_interval
+        while True:
+            try:
+                response, _ = self.transport.get(f"{self._batches_endpoint()}/{batch_id}", headers)
+            except Exception as e:
+                self.logger.error(f"Erro ao consultar lote '{batch_id}': {str(e)}")
+                return None
+            if response.status_code != 200:
+                self.logger.error(f"Erro API ao consultar lote ({response.status_code}): {response.text}")
+                return None
+            
+            batch = response.json()
+            if batch.get("processing_status") == "ended":
+                return batch
+            
+            counts = batch.get("request_counts", {})
+            self.logger.info(
+                f"Lote '{batch_id}': {counts.get('processing', 0)} em processamento, "
+                f"{counts.get('succeeded', 0)} concluídos; nova consulta em {interval}s"
+            )
+            time.sleep(interval)
+            interval = min(max_poll_interval, interval * 2)
+    
+    def iter_batch_results(self, batch):
+        """Lê os resultados (JSONL) de um lote encerrado à medida que chegam."""
+        headers = self._get_api_headers()
+        response, _ = self.transport.get(batch["results_url"], headers, stream=True)
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro API ao ler resultados ({response.status_code}): {response.text}")
+        with response:
+            for line in response.iter_lines(chunk_size=None):
+                if line:
+                    yield json.loads(line)
+    
+    def process_batch_results(self, batch, base_dir="restaurante-sistema"):
+        """
+        Registra no histórico e extrai os arquivos de cada resultado de um lote encerrado.
+        Resultados já processados (numa execução anterior) são ignorados.
+        
+        Returns:
+            Lista de dicionários com custom_id, module, files e error
+        """
+        manifest = self._load_batch_manifest(batch["id"])
+        if manifest is None:
+            self.logger.error(f"Manifesto do lote '{batch['id']}' não encontrado")
+            return []
+        
+        results = []
+        for result in self.iter_batch_results(batch):
+            custom_id = result["custom_id"]
+            entry = manifest["requests"].get(custom_id)
+            if entry is None or custom_id in manifest["processed"]:
+                continue
+            
+            outcome = result["result"]
+            if outcome["type"] == "succeeded":
+                message = outcome["message"]
+                text = self._response_text(message)
+                extra = {"batch_id": batch["id"], "custom_id": custom_id}
+                if entry.get("context_hash"):
+                    extra["context_hash"] = entry["context_hash"]
+                self._record_response(entry["prompt"], message, text, 0, OFFLINE_TIMINGS, True,
+                                      extra, entry["module"])
+                files = self.extract_and_save_all_code(text, base_dir, entry["module"])
+                results.append({"custom_id": custom_id, "module": entry["module"], "files": files, "error": None})
+            else:
+                error = outcome.get("error", outcome["type"])
+                self.logger.error(f"Prompt '{custom_id}' do lote falhou: {error}")
+                results.append({"custom_id": custom_id, "module": entry["module"], "files": [], "error": str(error)})
+            
+            manifest["processed"].append(custom_id)
+            self._save_batch_manifest(manifest)
+        
+        return results
+    
+    def run_batch(self, batch_requests, base_dir="restaurante-sistema", poll_interval=10):
+        """
+        Envia um lote, espera o processamento e processa os resultados.
+        
+        Returns:
+            Lista de resultados de process_batch_results, ou None em caso de erro
+        """
+        batch = self.submit_batch(batch_requests)
+        if batch is None:
+            return None
+        batch = self.wait_for_batch(batch["id"], poll_interval)
+        if batch is None:
+            return None
+        return self.process_batch_results(batch, base_dir)
+    
+    def _pack_session(self, session, context_text=None):
+        """Troca o prompt e a resposta de uma sessão por referências no BlobStore."""
+        packed = dict(session)
+        packed["prompt_ref"] = self.blob_store.put(packed.pop("prompt"))
+        packed["response_ref"] = self.blob_store.put(packed.pop("response"))
+        if context_text:
+            # A referência do contexto é o próprio context_hash
+            self.blob_store.put(context_text)
+        return packed
+    
+    def _unpack_session(self, session):
+        """Sessão com os textos lidos do BlobStore só quando acessados."""
+        if session is None or "prompt_ref" not in session:
+            return session
+        return LazySession(session, self.blob_store)
+    
+    def _save_session_to_file(self, session, status=None, response_hash=None):
+        """
+        Salva uma sessão em um arquivo separado para facilitar acesso e a acrescenta ao índice.
+        Com response_hash, a sessão pode ser achada depois pela resposta (_session_for_response).
+        
+        Returns:
+            Caminho do arquivo da sessão
+        """
+        sessions_dir = Path(self.session_index.sessions_dir)
         sessions_dir.mkdir(exist_ok=True)
         
         # Cria subdiretórios por módulo se existir um módulo atual
@@ -347,13 +1500,226 @@ class ClaudeProjectManager:
         
         with open(file_path, 'w', encoding='utf-8') as f:
             json.dump(session, f, indent=4)
+        
+        try:
+            self.session_index.add(SessionIndex.entry_for(session, os.path.relpath(file_path, sessions_dir), status))
+        except OSError as e:
+            self.logger.warning(f"Não foi possível atualizar o índice de sessões: {str(e)}")
+        saved = (session["id"], session.get("module"), file_path, session.get("timestamp"))
+        self._last_session.value = saved
+        if response_hash:
+            with self._lock:
+                self._sessions_by_response.pop(response_hash, None)
+                self._sessions_by_response[response_hash] = saved
+                while len(self._sessions_by_response) > RECENT_SESSIONS_BY_RESPONSE:
+                    del self._sessions_by_response[next(iter(self._sessions_by_response))]
+        return file_path
+    
+    def _session_for_response(self, response_text):
+        """Sessão salva recentemente com esta resposta, ou None."""
+        if not response_text:
+            return None
+        with self._lock:
+            return self._sessions_by_response.get(BlobStore.ref_for(response_text))
+    
+    def _link_session_files(self, created_files, module_name, session=None):
+        """
+        Associa os arquivos gerados à sessão informada ou, se None, à última sessão salva por
+        esta thread (se for do mesmo módulo), no arquivo da sessão e no índice.
+        """
+        last = session or getattr(self._last_session, "value", None)
+        if last is None or not created_files:
+            return
+        session_id, session_module, file_path, _ = last
+        if session_module != module_name:
+            return
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+            files = session.setdefault("files", [])
+            files.extend(path for path in created_files if path not in files)
+            atomic_write_json(file_path, session)
+            self.session_index.add_files(session_id, created_files)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Não foi possível associar os arquivos à sessão '{session_id}': {str(e)}")
+    
+    def use_prompt_caching(self):
+        """Indica se o contexto do projeto deve ser enviado como bloco cacheável."""
+        return self.config["api"].get("prompt_caching", True)
     
     def get_session_by_id(self, session_id):
         """Recupera uma sessão pelo ID."""
-        for session in self.config["history"]["sessions"]:
-            if session["id"] == session_id:
-                return session
-        return None
+        return self._unpack_session(self.session_log.find(session_id))
+    
+    def get_recent_sessions(self, count=5):
+        """Retorna as últimas sessões do histórico, da mais antiga para a mais recente."""
+        return [self._unpack_session(session) for session in self.session_log.tail(count)]
+    
+    def get_sessions_page(self, page=0, page_size=20):
+        """
+        Retorna uma página do histórico, da sessão mais recente para a mais antiga.
+        Só as sessões da página são lidas do disco.
+        """
+        return [self._unpack_session(session) for session in self.session_log.page(page, page_size)]
+    
+    def get_latest_module_session(self, module_name=None):
+        """
+        Retorna a entrada do índice da sessão mais recente de um módulo (ou do módulo atual).
+        A sessão completa pode ser lida com load_indexed_session(entrada).
+        """
+        return self.session_index.latest_for_module(module_name or self.config["context"]["current_module"])
+    
+    def find_sessions(self, start=None, end=None, module_name=None):
+        """
+        Retorna as entradas do índice das sessões de um período, da mais antiga para a mais recente.
+        
+        Args:
+            start: Início do período, inclusivo (datetime, date ou texto ISO)
+            end: Fim do período, exclusivo; uma date inclui o dia inteiro
+            module_name: Se informado, só as sessões desse módulo
+        """
+        return self.session_index.in_range(start, end, module_name)
+    
+    def get_session_for_file(self, file_path):
+        """Retorna a entrada do índice da sessão que gerou o arquivo, ou None."""
+        return self.session_index.for_file(file_path)
+    
+    def load_indexed_session(self, entry):
+        """Lê a sessão completa de uma entrada do índice (textos do BlobStore lidos sob demanda)."""
+        if entry is None:
+            return None
+        return self._unpack_session(self.session_index.load(entry))
+    
+    def rebuild_session_index(self):
+        """Reconstrói o índice a partir dos arquivos em sessions/ e retorna o número de sessões."""
+        count = self.session_index.rebuild()
+        self.logger.info(f"Índice de sessões reconstruído: {count} sessões")
+        return count
+    
+    def compact_history(self, policy=None, dry_run=False):
+        """
+        Aplica a política de retenção: remove as sessões antigas do histórico (log ou banco),
+        seus arquivos em sessions/, as entradas do índice e do registro de extrações e os
+        textos que nenhuma sessão restante usa, além dos logs e das respostas temporárias
+        antigas. As sessões removidas são somadas aos agregados por módulo e por dia.
+        
+        Args:
+            policy: RetentionPolicy a aplicar (padrão: a de config["retention"])
+            dry_run: Se True, só conta o que seria removido
+            
+        Returns:
+            Dicionário com as quantidades removidas ("sessions", "session_files", "blobs",
+            "logs", "temp_files") e os "bytes" liberados
+        """
+        policy = policy or RetentionPolicy.from_config(self.config.get("retention", {}))
+        result = {"sessions": 0, "session_files": 0, "blobs": 0, "logs": 0, "temp_files": 0, "bytes": 0}
+        
+        if policy.is_active():
+            select = lambda sessions: policy.select(sessions, self._session_size)
+            if dry_run:
+                sessions = list(self.session_log)
+                evicted_ids = select(sessions)
+                evicted = [session for session in sessions if session.get("id") in evicted_ids]
+                result["sessions"] = result["session_files"] = len(evicted)
+                result["bytes"] = sum(self._session_size(session) for session in evicted)
+            else:
+                evicted = self.session_log.evict(select, self.usage_rollups.archive)
+                result["sessions"] = len(evicted)
+                result["session_files"], result["bytes"] = self._remove_session_files(evicted)
+                self._forget_extractions(evicted)
+                if evicted and os.path.isdir(self.blob_store.root):
+                    removed = self.blob_store.collect_garbage(self._live_blob_refs())
+                    result["blobs"] = removed["objects"] + removed["chunks"]
+                    result["bytes"] += removed["bytes"]
+        
+        for key, (directory, prefix, suffix, max_age_days) in {
+            "logs": ("logs", "project_", ".log", policy.logs_max_age_days),
+            "temp_files": (TEMP_RESPONSES_DIR, "temp_response_", ".txt", policy.max_age_days)
+        }.items():
+            removed, freed = remove_old_files(directory, prefix, suffix, max_age_days, dry_run=dry_run)
+            result[key] = removed
+            result["bytes"] += freed
+        
+        if not dry_run:
+            self.logger.info(
+                f"Histórico compactado: {result['sessions']} sessões, {result['blobs']} textos/blocos, "
+                f"{result['logs']} logs e {result['temp_files']} respostas temporárias removidos "
+                f"({result['bytes']} bytes)"
+            )
+        return result
+    
+    def save_temp_response(self, module_name, response_text):
+        """
+        Salva o texto de uma resposta para referência em responses/temp_response_<módulo>.txt.
+        
+        Returns:
+            Caminho do arquivo salvo
+        """
+        os.makedirs(TEMP_RESPONSES_DIR, exist_ok=True)
+        file_path = os.path.join(TEMP_RESPONSES_DIR, f"temp_response_{module_name}.txt")
+        with open(file_path, "w", encoding="utf-8") as f:
+            f.write(response_text)
+        return file_path
+    
+    def _session_size(self, session):
+        """Tamanho de uma sessão em bytes: o registro mais os textos guardados no BlobStore."""
+        size = len(json.dumps(session, ensure_ascii=False).encode("utf-8"))
+        for ref_key in ("prompt_ref", "response_ref"):
+            if ref_key in session:
+                size += self.blob_store.size(session[ref_key])
+        return size
+    
+    def _remove_session_files(self, sessions):
+        """
+        Remove os arquivos das sessões em sessions/ e as suas entradas do índice.
+        
+        Returns:
+            Tupla (arquivos removidos, bytes liberados)
+        """
+        removed = freed = 0
+        for session in sessions:
+            entry = self.session_index.get(session["id"])
+            if entry is not None:
+                file_path = os.path.join(self.session_index.sessions_dir, entry["path"])
+            else:
+                module_name = session.get("module", "general")
+                file_path = os.path.join(self.session_index.sessions_dir, module_name or "", f"{session['id']}.json")
+            try:
+                size = os.path.getsize(file_path)
+                os.remove(file_path)
+            except OSError:
+                continue
+            removed += 1
+            freed += size
+        self.session_index.remove(session["id"] for session in sessions)
+        return removed, freed
+    
+    def _forget_extractions(self, sessions):
+        """Remove do registro de extrações as sessões que saíram do histórico."""
+        try:
+            self.extraction_ledger.forget(session["id"] for session in sessions)
+        except OSError as e:
+            self.logger.warning(f"Não foi possível atualizar o registro de extrações: {str(e)}")
+    
+    def _live_blob_refs(self):
+        """Referências de textos usadas pelas sessões que continuam no histórico."""
+        refs = set()
+        for session in self.session_log:
+            for ref_key in LazySession.REFS.values():
+                if session.get(ref_key):
+                    refs.add(session[ref_key])
+        return refs
+    
+    def get_usage_statistics(self, module_name=None):
+        """
+        Estatísticas de uso por módulo (sessões, tokens, tempo de resposta), somando as sessões
+        do histórico aos agregados das já removidas pela retenção.
+        
+        Returns:
+            Dicionário módulo -> totais (ver UsageRollups.summarize)
+        """
+        rollups = UsageRollups.add_sessions(self.usage_rollups.load(), self.session_log)
+        return UsageRollups.summarize(rollups, module_name)
     
     def extract_code_from_response(self, response_text, file_path=None):
         """
@@ -378,122 +1744,144 @@ class ClaudeProjectManager:
             self.logger.info(f"Código extraído e salvo em '{file_path}'")
             
             # Registra o arquivo no módulo atual
-            current_module = self.config["context"]["current_module"]
-            if current_module:
-                for module in self.config["project"]["modules"]:
-                    if module["name"] == current_module:
-                        if file_path not in module["files"]:
-                            module["files"].append(file_path)
-                            self.save_config()
+            module = self.get_module(self.config["context"]["current_module"])
+            if module is not None and file_path not in module["files"]:
+                module["files"].append(file_path)
+                self.save_config()
         
         return code_blocks
     
-    def extract_and_save_all_code(self, response_text, base_dir="restaurante-sistema"):
+    def extract_and_save_all_code(self, response_text, base_dir="restaurante-sistema", module_name=None):
         """
         Extrai todos os blocos de código de uma resposta com seus caminhos e os salva.
-        Procura por padrões como "```php\n// File: path/to/file.php" ou "Para o arquivo `path/to/file.php`:"
+        Reconhece, num único percurso pelo texto, as convenções de cabeçalho como
+        "```php\n// File: path/to/file.php" ou "Para o arquivo `path/to/file.php`:"
+        (ver code_extractor); cada arquivo é gravado uma única vez, e o conjunto é
+        aplicado de uma vez só depois de todos os arquivos escritos.
         
         Args:
             response_text: Texto da resposta contendo blocos de código
             base_dir: Diretório base para salvar os arquivos
+            module_name: Módulo em que os arquivos são registrados (se None, usa o módulo atual)
             
         Returns:
-            Lista de caminhos de arquivos criados
+            ExtractionResult: lista de caminhos de arquivos criados, com os contadores de
+            arquivos gravados, inalterados e bytes gravados
         """
-        import re
-        created_files = []
-        
-        # Padrão 1: ```language\n// File: path/to/file.php
-        code_blocks_pattern1 = re.finditer(
-            r'```(?:\w+)?\s*\n(?://|#)\s*File:\s*([\w\/\.-]+)\s*\n(.*?)```',
-            response_text, 
-            re.DOTALL
-        )
-        
-        # Padrão 2: Para o arquivo `path/to/file.php`:
-        # ```language
-        # código...
-        # ```
-        code_blocks_pattern2 = re.finditer(
-            r'(?:Para|Arquivo|No arquivo|Crie o arquivo|Vamos criar|Código para).*?[`"\']([^`"\']+\.\w+)[`"\'].*?:\s*```(?:\w+)?\s*\n(.*?)```',
-            response_text,
-            re.DOTALL
-        )
-        
-        # Padrão 3: `path/to/file.php`
-        # ```language
-        # código...
-        # ```
-        code_blocks_pattern3 = re.finditer(
-            r'[`"\']([^`"\']+\.\w+)[`"\']\s*:\s*```(?:\w+)?\s*\n(.*?)```',
-            response_text,
-            re.DOTALL
-        )
-        
-        # Padrão 4: Formato usado pela última resposta (## titulo + arquivo)
-        code_blocks_pattern4 = re.finditer(
-            r'## \d+\. .*?\n\n```(?:\w+)?\n// File: ([\w\/\.-]+)\n(.*?)```',
-            response_text,
-            re.DOTALL
-        )
-        
-        # Padrão 5: Para blocos que começam com ### `/caminho/do/arquivo.php`
-        code_blocks_pattern5 = re.finditer(
-            r'###\s*`?/?([^`\n]+)`?\s*\n```(?:\w+)?\s*\n(.*?)```',
-            response_text,
-            re.DOTALL
-        )
-        
-        # Processa padrão 1
-        for match in code_blocks_pattern1:
-            file_path = match.group(1)
-            code = match.group(2)
-            full_path = self._normalize_file_path(file_path, base_dir)
-            self._save_code_to_file(full_path, code)
-            created_files.append(full_path)
-        
-        # Processa padrão 2
-        for match in code_blocks_pattern2:
-            file_path = match.group(1)
-            code = match.group(2)
-            full_path = self._normalize_file_path(file_path, base_dir)
-            self._save_code_to_file(full_path, code)
-            created_files.append(full_path)
+        # Caminhos escritos de formas diferentes podem apontar para o mesmo arquivo; os blocos
+        # de edição (modo de edição) são aplicados sobre o conteúdo atual, na ordem da resposta
+        blocks = [(self._normalize_file_path(file_path, base_dir), code)
+                  for file_path, code in extract_all_code_blocks(response_text)]
+        files, edit_errors = apply_blocks(blocks, self._read_code_file)
         
-        # Processa padrão 3
-        for match in code_blocks_pattern3:
-            file_path = match.group(1)
-            code = match.group(2)
-            full_path = self._normalize_file_path(file_path, base_dir)
-            self._save_code_to_file(full_path, code)
-            created_files.append(full_path)
+        created_files = ExtractionResult()
+        for file_path, error in edit_errors.items():
+            self.logger.warning(f"Edições não aplicadas em '{file_path}': {error}")
+            created_files.record(file_path, "failed")
+        created_files.edit_errors.update(edit_errors)
+        self._save_code_files(files, created_files)
         
-        # Processa padrão 4
-        for match in code_blocks_pattern4:
-            file_path = match.group(1)
-            code = match.group(2)
-            full_path = self._normalize_file_path(file_path, base_dir)
-            self._save_code_to_file(full_path, code)
-            created_files.append(full_path)
-            
-        # Processa padrão 5
-        for match in code_blocks_pattern5:
-            file_path = match.group(1)
-            code = match.group(2)
-            full_path = self._normalize_file_path(file_path, base_dir)
-            self._save_code_to_file(full_path, code)
-            created_files.append(full_path)
+        # A sessão é achada pela resposta, não pela thread: a extração pode rodar em outra
+        # thread ou sem sessão salva (save_history=False)
+        session = self._session_for_response(response_text)
+        self._register_module_files(created_files, module_name, session or False)
+        self._record_extraction(response_text, files, created_files, module_name, session)
+        self.logger.info(f"Extração concluída: {created_files.summary()}")
         
-        # Registra os arquivos no módulo atual
-        current_module = self.config["context"]["current_module"]
+        return created_files
+    
+    def _record_extraction(self, response_text, files, result, module_name=None, session=None):
+        """
+        Registra no registro de extrações os arquivos gerados pela sessão da resposta (ver
+        _session_for_response), para que extract_sessions.py não a extraia de novo.
+        """
+        if session is None or session[1] != (module_name or self.config["context"]["current_module"]) \
+                or result.failed:
+            return
+        session_id, _, _, timestamp = session
+        fingerprints = {}
+        for file_path, code in files.items():
+            target = self._resolve_code_path(file_path)
+            if os.path.exists(target):
+                fingerprints[target] = file_fingerprint(target, code.encode("utf-8"))
+        try:
+            self.extraction_ledger.record(self.base_path, {session_id: {
+                "response_hash": BlobStore.ref_for(response_text),
+                "extractor_version": EXTRACTOR_VERSION,
+                "timestamp": timestamp,
+                "files": fingerprints
+            }})
+        except OSError as e:
+            self.logger.warning(f"Não foi possível atualizar o registro de extrações: {str(e)}")
+    
+    def _register_module_files(self, created_files, module_name=None, session=None):
+        """
+        Registra os arquivos criados no módulo informado (ou no módulo atual) e os associa à
+        sessão informada (None: a última sessão desta thread; False: nenhuma).
+        """
+        current_module = module_name or self.config["context"]["current_module"]
         if current_module:
-            for module in self.config["project"]["modules"]:
-                if module["name"] == current_module:
+            with self._lock:
+                module = self.get_module(current_module)
+                if module is not None:
                     for file_path in created_files:
                         if file_path not in module["files"]:
                             module["files"].append(file_path)
                     self.save_config()
+            if session is not False:
+                self._link_session_files(created_files, current_module, session)
+    
+    def create_incremental_extractor(self, base_dir="restaurante-sistema"):
+        """
+        Cria um extrator que grava cada arquivo assim que o bloco de código correspondente é fechado.
+        Usado com o modo streaming: alimente-o com extractor.feed(trecho) e, ao final, chame
+        finish_incremental_extraction(extractor) para registrar os arquivos no módulo atual.
+        
+        Args:
+            base_dir: Diretório base para salvar os arquivos
+            
+        Returns:
+            Instância de IncrementalCodeExtractor
+        """
+        result = ExtractionResult()
+        
+        def on_file(file_path, code):
+            full_path = self._normalize_file_path(file_path, base_dir)
+            if is_edit_block(code):
+                try:
+                    current = self._read_code_file(full_path)
+                    if current is None:
+                        raise ValueError("o arquivo não existe")
+                    code = apply_edits(current, parse_edits(code))
+                except ValueError as e:
+                    self.logger.warning(f"Edições não aplicadas em '{full_path}': {str(e)}")
+                    result.record(full_path, "failed")
+                    result.edit_errors[full_path] = str(e)
+                    return None
+            self._save_code_to_file(full_path, code, result)
+            return full_path
         
+        extractor = IncrementalCodeExtractor(on_file)
+        extractor.result = result
+        return extractor
+    
+    def finish_incremental_extraction(self, extractor, module_name=None):
+        """
+        Encerra um extrator incremental e registra os arquivos gravados no módulo
+        informado (ou no módulo atual).
+        
+        Returns:
+            ExtractionResult com os caminhos de arquivos criados e os contadores da gravação
+        """
+        files = extractor.finish()
+        # Extratores criados fora de create_incremental_extractor não têm os contadores
+        created_files = getattr(extractor, "result", None)
+        if created_files is None:
+            created_files = ExtractionResult(files)
+        if extractor.truncated:
+            self.logger.warning("Resposta terminou dentro de um bloco de código; o último arquivo não foi gravado")
+        self._register_module_files(created_files, module_name)
+        self.logger.info(f"Extração concluída: {created_files.summary()}")
         return created_files
     
     def _normalize_file_path(self, file_path, base_dir):
@@ -517,32 +1905,102 @@ class ClaudeProjectManager:
             
         return file_path
     
-    def _save_code_to_file(self, file_path, code):
-        """Salva o código em um arquivo, criando os diretórios necessários."""
+    def _resolve_code_path(self, file_path):
+        """Caminho absoluto em que um arquivo extraído é gravado."""
+        # Normaliza o caminho (importante não usar os.path.normpath pois remove barras iniciais)
+        # Remove caracteres estranhos no nome do arquivo
+        file_path = re.sub(r'[^\w\-./\\]', '', file_path)
+        
+        # Convertendo para caminho absoluto dentro do projeto
+        if not os.path.isabs(file_path):
+            file_path = os.path.join(self.base_path, file_path)
+        return file_path
+    
+    def _read_code_file(self, file_path):
+        """Conteúdo atual de um arquivo extraído, ou None se ele não existe."""
         try:
-            # Normaliza o caminho (importante não usar os.path.normpath pois remove barras iniciais)
-            # Remove caracteres estranhos no nome do arquivo
-            file_path = re.sub(r'[^\w\-./\\]', '', file_path)
+            with open(self._resolve_code_path(file_path), 'r', encoding='utf-8', newline='') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def _save_code_to_file(self, file_path, code, result=None):
+        """
+        Salva o código em um arquivo, criando os diretórios necessários. Um arquivo com o
+        mesmo conteúdo não é regravado; os demais são gravados num temporário e renomeados,
+        então quem lê o arquivo (o servidor web) nunca vê um arquivo pela metade.
+        
+        Args:
+            file_path: Caminho do arquivo
+            code: Conteúdo do arquivo
+            result: ExtractionResult em que o resultado da gravação é registrado (opcional)
             
-            # Convertendo para caminho absoluto dentro do projeto
-            if not os.path.isabs(file_path):
-                file_path = os.path.join(self.base_path, file_path)
-                
+        Returns:
+            True se o arquivo está gravado com o conteúdo (gravado agora ou já igual), False em caso de erro
+        """
+        original_path = file_path
+        try:
+            file_path = self._resolve_code_path(file_path)
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(code)
-            self.logger.info(f"Código salvo em '{file_path}'")
+            data = code.encode("utf-8")
+            if write_if_changed(file_path, data):
+                self.logger.info(f"Código salvo em '{file_path}'")
+                status = "written"
+            else:
+                self.logger.debug(f"Código inalterado em '{file_path}'")
+                status = "skipped"
+            if result is not None:
+                result.record(original_path, status, len(data))
             return True
         except Exception as e:
             self.logger.error(f"Erro ao salvar código em '{file_path}': {str(e)}")
+            if result is not None:
+                result.record(original_path, "failed")
             return False
     
-    def generate_module_prompt(self, module_name=None):
+    def _save_code_files(self, files, result):
+        """
+        Salva vários arquivos de uma vez com materialize_files: escrita em paralelo num
+        diretório temporário e, no fim, todos os arquivos alterados renomeados para o destino.
+        Se a escrita falhar, nenhum arquivo é alterado e todos são registrados como erro; se
+        uma renomeação falhar, os arquivos já renomeados são registrados como gravados e os
+        demais como erro.
+        
+        Args:
+            files: Dicionário caminho (como registrado no módulo) -> código
+            result: ExtractionResult em que os resultados são registrados
+        """
+        targets = {self._resolve_code_path(file_path): file_path for file_path in files}
+        workers = int(self.config.get("storage", {}).get("write_workers", DEFAULT_WRITE_WORKERS))
+        try:
+            # O temporário fica junto da configuração, fora da árvore servida (base_path e vizinhos)
+            statuses = materialize_files(
+                {target: files[file_path] for target, file_path in targets.items()}, workers, self.staging_dir
+            )
+        except MaterializeError as e:
+            statuses = e.statuses
+            written = sum(1 for status in statuses.values() if status == "written")
+            self.logger.error(f"Erro ao salvar os arquivos da resposta ({written} de {len(files)} já "
+                              f"gravados, {len(files) - len(statuses)} não alterados): {str(e)}")
+        except Exception as e:
+            self.logger.error(f"Erro ao salvar os arquivos da resposta; nenhum arquivo foi alterado: {str(e)}")
+            statuses = {}
+        
+        for target, file_path in targets.items():
+            status = statuses.get(os.path.abspath(target), "failed")
+            result.record(file_path, status, len(files[file_path].encode("utf-8")) if status == "written" else 0)
+            if status != "failed":
+                self.logger.debug(f"Código {'salvo' if status == 'written' else 'inalterado'} em '{target}'")
+    
+    def generate_module_prompt(self, module_name=None, include_context=True):
         """
         Gera um prompt para um módulo específico baseado no contexto do projeto.
         
         Args:
             module_name: Nome do módulo (se None, usa o módulo atual)
+            include_context: Se False, o contexto do projeto não é embutido no prompt; ele deve
+                ser enviado à parte com send_prompt_to_claude(..., context_text=...) para usar o
+                cache de prompt
             
         Returns:
             Texto do prompt gerado
@@ -554,12 +2012,7 @@ class ClaudeProjectManager:
                 return None
         
         # Encontra o módulo
-        target_module = None
-        for module in self.config["project"]["modules"]:
-            if module["name"] == module_name:
-                target_module = module
-                break
-        
+        target_module = self.get_module(module_name)
         if not target_module:
             self.logger.error(f"Módulo '{module_name}' não encontrado")
             return None
@@ -587,7 +2040,10 @@ class ClaudeProjectManager:
             module_files = "Nenhum arquivo criado ainda para este módulo."
         
         # Carrega o contexto do projeto
-        project_context = self._load_project_context()
+        if include_context:
+            project_context = self._load_project_context()
+        else:
+            project_context = "O contexto completo do projeto foi enviado no bloco anterior desta mensagem."
         
         # Gera o prompt
         prompt = f"""
@@ -613,7 +2069,7 @@ Módulo atual: {module_name}
 {module_files}
 
 ## Requisitos para o Próximo Passo
-[Descreva aqui os requisitos específicos para esta etapa do desenvolvimento]
+{REQUIREMENTS_PLACEHOLDER}
 
 Por favor, forneça:
 1. Código para os próximos arquivos necessários para este módulo
@@ -628,8 +2084,12 @@ Por favor, forneça:
         backup_dir = f"backups/backup_{timestamp}"
         os.makedirs(backup_dir, exist_ok=True)
         
-        # Copia o arquivo de configuração
+        # Copia o arquivo de configuração e o log de sessões
         shutil.copy2(self.config_file, f"{backup_dir}/")
+        if self.state_store is not None:
+            self.state_store.backup(os.path.join(backup_dir, os.path.basename(self.state_store.path)))
+        elif os.path.exists(self.session_log.path):
+            shutil.copy2(self.session_log.path, f"{backup_dir}/")
         
         # Copia os arquivos do projeto
         project_dir = os.path.join(self.base_path, self.config["project"]["name"])
@@ -639,11 +2099,13 @@ Por favor, forneça:
                 f"{backup_dir}/{self.config['project']['name']}"
             )
         
-        # Copia os logs e sessões
+        # Copia os logs, sessões e textos das sessões
         if os.path.exists("logs"):
             shutil.copytree("logs", f"{backup_dir}/logs")
         if os.path.exists("sessions"):
             shutil.copytree("sessions", f"{backup_dir}/sessions")
+        if os.path.exists(self.blob_store.root):
+            shutil.copytree(self.blob_store.root, f"{backup_dir}/{os.path.basename(self.blob_store.root)}")
         
         self.logger.info(f"Backup criado em '{backup_dir}'")
         return backup_dir
@@ -675,7 +2137,14 @@ Por favor, forneça:
             },
             "files_count": len(all_files),
             "tokens_used": self.config["history"]["total_tokens_used"],
-            "sessions_count": len(self.config["history"]["sessions"]),
+            "cache_read_input_tokens": self.config["history"].get("cache_read_input_tokens", 0),
+            "cache_creation_input_tokens": self.config["history"].get("cache_creation_input_tokens", 0),
+            "response_cache": {
+                "hits": self.config["history"].get("response_cache_hits", 0),
+                "misses": self.config["history"].get("response_cache_misses", 0)
+            },
+            "sessions_count": self.config["history"].get("total_sessions", 0),
+            "archived_sessions": self.usage_rollups.load()["sessions"],
             "last_updated": datetime.now().isoformat()
         }
         
@@ -699,7 +2168,13 @@ Por favor, forneça:
         print("-"*50)
         print(f"Total de Arquivos: {report['files_count']}")
         print(f"Total de Tokens Usados: {report['tokens_used']}")
+        print(f"  Lidos do cache de prompt: {report['cache_read_input_tokens']}")
+        print(f"  Gravados no cache de prompt: {report['cache_creation_input_tokens']}")
         print(f"Total de Sessões com Claude: {report['sessions_count']}")
+        if report['archived_sessions']:
+            print(f"  Compactadas (só agregados): {report['archived_sessions']}")
+        print(f"Cache local de respostas: {report['response_cache']['hits']} acertos, "
+              f"{report['response_cache']['misses']} falhas")
         print("-"*50)
         print(f"Última Atualização: {datetime.fromisoformat(report['last_updated']).strftime('%d/%m/%Y %H:%M:%S')}")
         print("="*50)
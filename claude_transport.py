@@ -0,0 +1,313 @@
+import json
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from rate_limiter import SharedRateLimiter, retry_delay_from_headers
+
+# Valores padrão usados quando a chave não existe em config["api"]
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 600.0
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+
+# 429 (rate limit), 529 (sobrecarga) e erros 5xx transitórios
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504, 529}
+
+# Tempo gasto abrindo conexões (TCP + TLS) na requisição atual desta thread
+_connect_timing = threading.local()
+
+
+class _TimedConnectionMixin:
+    """Mede o tempo de connect() de cada conexão nova aberta pelo pool."""
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        elapsed = time.perf_counter() - start
+        _connect_timing.seconds = getattr(_connect_timing, "seconds", 0.0) + elapsed
+        _connect_timing.count = getattr(_connect_timing, "count", 0) + 1
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter cujo pool usa conexões instrumentadas."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # Atribuição na instância para não alterar o mapeamento global do urllib3
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class ClaudeTransport:
+    """
+    Camada de transporte HTTP para a API do Claude.
+    Mantém um pool de conexões keep-alive reutilizado por todos os prompts do processo,
+    aplica timeouts de conexão e leitura e repete requisições recusadas por limite de uso
+    ou falhas transitórias, com backoff exponencial e jitter.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout=DEFAULT_READ_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 rate_limiter=None):
+        """Cria a sessão HTTP com o pool de conexões configurado."""
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = rate_limiter
+        self.logger = logging.getLogger("claude_project")
+
+        self.session = requests.Session()
+        adapter = _TimedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_config(cls, api_config):
+        """Cria o transporte a partir da seção "api" da configuração."""
+        rate_limiter = SharedRateLimiter.from_config(api_config)
+        if not any(rate_limiter.limits.values()):
+            rate_limiter = None
+        return cls(
+            pool_size=int(api_config.get("pool_size", DEFAULT_POOL_SIZE)),
+            connect_timeout=float(api_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout=float(api_config.get("read_timeout", DEFAULT_READ_TIMEOUT)),
+            max_retries=int(api_config.get("max_retries", DEFAULT_MAX_RETRIES)),
+            backoff_base=float(api_config.get("backoff_base", DEFAULT_BACKOFF_BASE)),
+            backoff_max=float(api_config.get("backoff_max", DEFAULT_BACKOFF_MAX)),
+            rate_limiter=rate_limiter,
+        )
+
+    def post(self, url, headers, payload, stream=False, rate_limited=True):
+        """
+        Envia um POST JSON usando o pool de conexões, repetindo a requisição quando a API
+        responde 429/529/5xx ou a conexão falha.
+
+        Args:
+            url: Endpoint da API
+            headers: Cabeçalhos HTTP
+            payload: Corpo da requisição (será serializado como JSON)
+            stream: Se True, o corpo não é lido antes de retornar
+            rate_limited: Se a requisição consome a cota do limitador compartilhado
+
+        Returns:
+            A resposta HTTP e um dicionário com os tempos da requisição
+            (connect_time, ttfb, connection_reused, retries, rate_limit_wait e estimated_tokens,
+            a reserva no limitador, devolvida e zerada se a resposta final é um erro)
+        """
+        return self.request("POST", url, headers, payload, stream, rate_limited)
+
+    def get(self, url, headers, stream=False):
+        """Envia um GET (com as mesmas repetições do POST), sem consumir a cota de mensagens."""
+        return self.request("GET", url, headers, None, stream, rate_limited=False)
+
+    def request(self, method, url, headers, payload=None, stream=False, rate_limited=True):
+        """Envia uma requisição HTTP com repetições; veja post() para os argumentos."""
+        limiter = self.rate_limiter if rate_limited else None
+        # Estimativa grosseira (~4 caracteres por token), corrigida depois por record_usage
+        estimated_tokens = len(json.dumps(payload)) // 4 if limiter else 0
+        rate_limit_wait = 0.0
+        attempt = 0
+
+        while True:
+            if limiter:
+                rate_limit_wait += limiter.acquire(estimated_tokens)
+
+            try:
+                response, timings = self._send(method, url, headers, payload, stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if limiter:
+                    limiter.adjust(-estimated_tokens)
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                self.logger.warning(f"Falha de conexão ({e}); nova tentativa em {delay:.1f}s")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if limiter:
+                limiter.update_from_headers(response.headers)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = retry_delay_from_headers(response.headers)
+                if delay is None:
+                    delay = self._backoff_delay(attempt)
+                else:
+                    # Jitter evita que processos parados juntos voltem todos no mesmo instante
+                    delay += random.uniform(0, self.backoff_base)
+                if response.status_code == 429 and limiter:
+                    # Os outros processos também devem esperar
+                    limiter.block_for(delay)
+                self.logger.warning(
+                    f"API respondeu {response.status_code}; tentativa {attempt + 1} de {self.max_retries}, "
+                    f"nova tentativa em {delay:.1f}s"
+                )
+                response.close()
+                if limiter:
+                    limiter.adjust(-estimated_tokens)
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if limiter and not response.ok:
+                # Resposta de erro final: nenhum token foi consumido, a reserva volta ao bucket
+                limiter.adjust(-estimated_tokens)
+                estimated_tokens = 0
+
+            timings["retries"] = attempt
+            timings["rate_limit_wait"] = round(rate_limit_wait, 4)
+            timings["estimated_tokens"] = estimated_tokens
+            return response, timings
+
+    def _send(self, method, url, headers, payload, stream):
+        _connect_timing.seconds = 0.0
+        _connect_timing.count = 0
+
+        start_time = time.perf_counter()
+        # stream=True faz o requests retornar assim que os cabeçalhos chegam,
+        # o que permite medir o tempo até o primeiro byte
+        response = self.session.request(
+            method,
+            url,
+            headers=headers,
+            json=payload,
+            timeout=self.timeout,
+            stream=True
+        )
+        ttfb = time.perf_counter() - start_time
+
+        if not stream:
+            # Lê o corpo inteiro e devolve a conexão ao pool
+            response.content
+
+        timings = {
+            "connect_time": round(_connect_timing.seconds, 4),
+            "ttfb": round(ttfb, 4),
+            "connection_reused": _connect_timing.count == 0
+        }
+        return response, timings
+
+    def _backoff_delay(self, attempt):
+        """Backoff exponencial com jitter: entre metade e o valor cheio de base * 2^tentativa."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def record_usage(self, timings, tokens_used):
+        """Ajusta o bucket de tokens com o uso real de uma requisição feita por request()."""
+        if self.rate_limiter and "estimated_tokens" in timings:
+            self.rate_limiter.adjust(tokens_used - timings.get("estimated_tokens", 0))
+
+    def close(self):
+        """Fecha todas as conexões do pool."""
+        self.session.close()
+
+
+def iter_sse_events(response):
+    """
+    Lê um corpo text/event-stream à medida que chega.
+
+    Yields:
+        Tuplas (tipo_do_evento, dados) com os dados já decodificados do JSON
+    """
+    event_type = None
+    data_lines = []
+    # chunk_size=None entrega os dados assim que chegam, sem esperar encher um buffer
+    for raw_line in response.iter_lines(chunk_size=None):
+        line = raw_line.decode("utf-8") if isinstance(raw_line, bytes) else raw_line
+        if not line:
+            if data_lines:
+                yield event_type, json.loads("\n".join(data_lines))
+            event_type = None
+            data_lines = []
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            event_type = value
+        elif field == "data":
+            data_lines.append(value)
+
+    if data_lines:
+        yield event_type, json.loads("\n".join(data_lines))
+
+
+class StreamedMessage:
+    """Reconstrói a mensagem completa da Messages API a partir dos eventos do streaming."""
+
+    def __init__(self):
+        self.message = None
+        self.error = None
+        self._partial_json = {}
+
+    def apply(self, data):
+        """
+        Aplica um evento à mensagem.
+
+        Returns:
+            O trecho de texto novo trazido pelo evento ("" se não houver)
+        """
+        event_type = data.get("type")
+
+        if event_type == "message_start":
+            self.message = data["message"]
+            self.message.setdefault("content", [])
+            self.message.setdefault("usage", {})
+        elif event_type == "content_block_start":
+            block = dict(data["content_block"])
+            if block.get("type") == "text":
+                block["text"] = block.get("text", "")
+            self.message["content"].append(block)
+        elif event_type == "content_block_delta":
+            index = data["index"]
+            block = self.message["content"][index]
+            delta = data["delta"]
+            if delta.get("type") == "text_delta":
+                block["text"] += delta["text"]
+                return delta["text"]
+            if delta.get("type") == "input_json_delta":
+                self._partial_json[index] = self._partial_json.get(index, "") + delta["partial_json"]
+        elif event_type == "content_block_stop":
+            index = data["index"]
+            if index in self._partial_json:
+                raw_json = self._partial_json.pop(index)
+                self.message["content"][index]["input"] = json.loads(raw_json) if raw_json else {}
+        elif event_type == "message_delta":
+            self.message.update(data.get("delta", {}))
+            self.message["usage"].update(data.get("usage", {}))
+        elif event_type == "error":
+            self.error = data.get("error", data)
+
+        return ""
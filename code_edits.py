@@ -0,0 +1,172 @@
+"""
+Modo de edição: em vez de repetir um arquivo inteiro, a resposta traz, no bloco de código que
+traria o arquivo, trechos de busca e substituição contra o conteúdo atual dele:
+
+    Para o arquivo `core/Database.php`:
+    ```php
+    <<<<<<< SEARCH
+    trecho atual, copiado exatamente
+    =======
+    trecho novo
+    >>>>>>> REPLACE
+    ```
+
+Um bloco pode ter várias edições, aplicadas em ordem. Os trechos são linhas inteiras, e cada
+trecho buscado deve aparecer uma única vez no arquivo (diferenças de espaços no fim das linhas
+são toleradas). Uma edição cujo trecho não está mais no arquivo conta como já aplicada se o
+substituto aparece nele exatamente uma vez (ou se o substituto é vazio, uma remoção), então a
+mesma resposta pode ser extraída de novo sem duplicar as alterações.
+"""
+
+SEARCH_MARKER = "<<<<<<< SEARCH"
+DIVIDER_MARKER = "======="
+REPLACE_MARKER = ">>>>>>> REPLACE"
+
+
+def is_edit_block(code):
+    """Indica se o conteúdo de um bloco de código é uma lista de edições, e não um arquivo inteiro."""
+    return code.lstrip().startswith(SEARCH_MARKER)
+
+
+def parse_edits(code):
+    """
+    Lê as edições de um bloco de código.
+
+    Returns:
+        Lista de tuplas (trecho buscado, substituto), cada linha terminada por "\n"; um
+        substituto vazio remove o trecho
+
+    Raises:
+        ValueError: Se os marcadores estiverem incompletos ou houver texto fora deles
+    """
+    edits = []
+    section = None
+    search = replace = None
+    for line in code.split("\n"):
+        marker = line.strip()
+        if section is None:
+            if marker == SEARCH_MARKER:
+                section, search = "search", []
+            elif marker:
+                raise ValueError(f"texto fora de um bloco SEARCH/REPLACE: {line.strip()[:60]!r}")
+        elif section == "search":
+            if marker == DIVIDER_MARKER:
+                section, replace = "replace", []
+            else:
+                search.append(line)
+        elif marker == REPLACE_MARKER:
+            edits.append(("".join(line + "\n" for line in search), "".join(line + "\n" for line in replace)))
+            section = None
+        else:
+            replace.append(line)
+    if section is not None:
+        raise ValueError(f"bloco SEARCH/REPLACE sem o marcador '{REPLACE_MARKER}'")
+    return edits
+
+
+def _split_lines(text):
+    """Divide o texto em linhas, cada uma com a sua quebra (a última pode não ter)."""
+    lines = [line + "\n" for line in text.split("\n")]
+    lines[-1] = lines[-1][:-1]
+    if not lines[-1]:
+        lines.pop()
+    return lines
+
+
+def _without_terminator(line):
+    return line.rstrip("\n").rstrip("\r")
+
+
+def _locate(lines, wanted):
+    """
+    Índices em que a sequência de linhas wanted começa em lines, comparando linhas inteiras
+    sem a quebra; se não houver nenhum, tenta de novo ignorando os espaços no fim das linhas.
+    """
+    if not wanted:
+        return []
+    for normalize in (_without_terminator, str.rstrip):
+        keys = [normalize(line) for line in lines]
+        target = [normalize(line) for line in wanted]
+        matches = [i for i in range(len(keys) - len(target) + 1)
+                   if keys[i] == target[0] and keys[i:i + len(target)] == target]
+        if matches:
+            return matches
+    return []
+
+
+def apply_edits(content, edits):
+    """
+    Aplica as edições, em ordem, ao conteúdo de um arquivo. Os trechos são comparados por
+    linhas inteiras, então remover um trecho remove também as quebras das suas linhas.
+
+    Args:
+        content: Conteúdo atual do arquivo
+        edits: Lista de tuplas (trecho buscado, substituto), como em parse_edits
+
+    Returns:
+        Conteúdo com as edições aplicadas
+
+    Raises:
+        ValueError: Se um trecho buscado não for encontrado ou aparecer mais de uma vez
+    """
+    for search, replace in edits:
+        search_lines = [_without_terminator(line) for line in _split_lines(search)]
+        replace_lines = [_without_terminator(line) for line in _split_lines(replace)]
+        if not "".join(search_lines).strip():
+            raise ValueError("trecho buscado vazio")
+        lines = _split_lines(content)
+        matches = _locate(lines, search_lines)
+        applied = _locate(lines, replace_lines)
+        if len(matches) > 1:
+            raise ValueError(f"trecho buscado aparece {len(matches)} vezes: {search.strip().splitlines()[0][:60]!r}")
+        if not matches:
+            # Já aplicada: o trecho saiu do arquivo e o substituto está nele uma única vez
+            if not replace_lines or len(applied) == 1:
+                continue
+            raise ValueError(f"trecho buscado não encontrado: {search.strip().splitlines()[0][:60]!r}")
+
+        start = matches[0]
+        end = start + len(search_lines)
+        if len(applied) == 1 and applied[0] <= start and end <= applied[0] + len(replace_lines):
+            # Acréscimo em volta do trecho buscado que já foi feito: o trecho está dentro do substituto
+            continue
+        newline = lines[start][len(_without_terminator(lines[start])):] or "\n"
+        replacement = [line + newline for line in replace_lines]
+        if replacement:
+            # A última linha mantém a quebra original (o arquivo pode não terminar com uma)
+            replacement[-1] = replace_lines[-1] + lines[end - 1][len(_without_terminator(lines[end - 1])):]
+        content = "".join(lines[:start] + replacement + lines[end:])
+    return content
+
+
+def apply_blocks(blocks, read_current):
+    """
+    Aplica em ordem os blocos de uma resposta: um arquivo inteiro substitui o conteúdo e um
+    bloco de edições é aplicado sobre o conteúdo anterior (do próprio texto ou do disco). As
+    edições de um arquivo valem juntas: se uma falha, o arquivo fica como está no disco.
+
+    Args:
+        blocks: Lista de tuplas (caminho, código), como em extract_all_code_blocks
+        read_current: Função caminho -> conteúdo atual do arquivo (None se não existe)
+
+    Returns:
+        Tupla (dicionário caminho -> conteúdo final, dicionário caminho -> motivo da falha)
+    """
+    files = {}
+    errors = {}
+    for path, code in blocks:
+        if not is_edit_block(code):
+            files[path] = code
+            errors.pop(path, None)
+            continue
+        if path in errors:
+            continue
+        try:
+            current = files[path] if path in files else read_current(path)
+            if current is None:
+                raise ValueError("o arquivo não existe")
+            files[path] = apply_edits(current, parse_edits(code))
+        except ValueError as e:
+            errors[path] = str(e)
+            files.pop(path, None)
+    return files, errors
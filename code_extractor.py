@@ -0,0 +1,294 @@
+"""
+Extração dos arquivos de uma resposta: um único percurso pelas linhas do texto reconhece os
+blocos de código e as cinco convenções de cabeçalho usadas pelas respostas:
+
+1. comentário na primeira linha do bloco: ```php / // File: caminho/arquivo.php
+2. frase antes do bloco: Para o arquivo `caminho/arquivo.php`: (também Arquivo, No arquivo,
+   Crie o arquivo, Vamos criar, Código para), mesmo com linhas entre a frase e o bloco (blocos
+   de comandos, como ```bash, no meio não recebem o caminho)
+3. caminho entre crases ou aspas seguido de ":": `caminho/arquivo.php`:
+4. título numerado seguido de bloco com comentário: ## 1. Título / ```php / // File: ...
+5. título markdown com o caminho: ### `/caminho/do/arquivo.php`
+
+Cada linha é examinada uma vez, por expressões sem quantificadores ambíguos e por uma única
+divisão nas aspas (announced_path), então o custo é linear no tamanho do texto, mesmo em
+linhas muito longas.
+"""
+import os
+import re
+
+# Versão das regras de extração; mude sempre que elas mudarem, para que as extrações registradas
+# em extraction_ledger sejam refeitas
+EXTRACTOR_VERSION = 4
+
+# Linha que abre ou fecha um bloco de código: ``` ou ```php
+FENCE_RE = re.compile(r'^\s*```([\w+#.-]*)\s*$')
+
+# Linha de texto que termina abrindo um bloco: Para o arquivo `caminho/arquivo.php`: ```php
+INLINE_FENCE_RE = re.compile(r'^(.*:)\s*```([\w+#.-]*)\s*$')
+
+# Cabeçalho dentro do bloco: // File: caminho/arquivo.php ou # File: caminho/arquivo.py
+FILE_COMMENT_RE = re.compile(r'^\s*(?://|#)\s*File:\s*([\w/.-]+)\s*$')
+
+# Título markdown com o caminho: ### `/caminho/do/arquivo.php`
+HEADING_PATH_RE = re.compile(r'^#{1,6}\s*`?/?([^`\s]+\.\w+)`?\s*$')
+
+# Caminho entre aspas ou crases numa linha que termina com ":"
+# (Para o arquivo `caminho/arquivo.php`: ou `caminho/arquivo.php`:)
+QUOTED_PATH_RE = re.compile(r'[`"\']([^`"\'\s]+\.\w+)[`"\'][^`"\']*:\s*$')
+
+# Frase que anuncia um arquivo mesmo sem terminar com ":" (vale para o próximo bloco na linguagem
+# do arquivo, desde que a última linha antes dele termine com ":"): Crie o arquivo `caminho/arquivo.php` com
+# (ver announced_path; a expressão só procura a palavra que introduz o caminho)
+ANNOUNCE_RE = re.compile(r'Para|Arquivo|No arquivo|Crie o arquivo|Vamos criar|Código para')
+
+# Aspas e crases que delimitam um caminho numa frase
+QUOTE_RE = re.compile(r'[`"\']')
+
+
+# Linguagens equivalentes a uma extensão de arquivo (```javascript para arquivo.js)
+LANGUAGE_ALIASES = {"javascript": "js", "typescript": "ts", "python": "py", "bash": "sh", "shell": "sh",
+                    "zsh": "sh", "yaml": "yml", "markdown": "md"}
+
+# Blocos de comandos ou de saída: não recebem o caminho de uma frase que anuncia um arquivo
+# (a menos que o caminho tenha a mesma extensão, como install.sh num bloco ```bash)
+NON_FILE_LANGUAGES = {"sh", "console", "text", "txt", "plaintext", "output"}
+
+
+def language_matches(path, language):
+    """Indica se um bloco na linguagem informada pode ser o conteúdo do arquivo anunciado."""
+    if not language:
+        return True
+    language = LANGUAGE_ALIASES.get(language.lower(), language.lower())
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    return LANGUAGE_ALIASES.get(extension, extension) == language or language not in NON_FILE_LANGUAGES
+
+
+def _is_path_token(text):
+    """Indica se o texto entre aspas é um caminho de arquivo: sem espaços e com extensão (nome.ext)."""
+    name, dot, extension = text.rpartition(".")
+    return bool(name and dot and extension) and not any(c.isspace() for c in text) \
+        and all(c.isalnum() or c == "_" for c in extension)
+
+
+def announced_path(line):
+    """
+    Retorna o caminho anunciado por uma frase como "Crie o arquivo `caminho/arquivo.php` com": o
+    primeiro trecho entre aspas que é um caminho e vem logo depois (sem outras aspas no meio)
+    de uma palavra como Para, Arquivo ou Crie o arquivo. A linha é dividida uma vez nas aspas
+    e cada trecho é examinado uma vez, então o custo é linear mesmo em linhas longas.
+    """
+    parts = QUOTE_RE.split(line)
+    # parts[i + 1] está entre aspas quando há um parts[i + 2] depois dele
+    for i in range(len(parts) - 2):
+        if _is_path_token(parts[i + 1]) and ANNOUNCE_RE.search(parts[i]):
+            return parts[i + 1]
+    return None
+
+
+def path_from_header_line(line):
+    """Retorna o caminho de arquivo anunciado por uma linha fora de bloco de código, se houver."""
+    match = HEADING_PATH_RE.match(line)
+    if match:
+        return match.group(1)
+    match = QUOTED_PATH_RE.search(line)
+    if match:
+        return match.group(1)
+    return None
+
+
+class ExtractionResult(list):
+    """
+    Lista dos arquivos extraídos de uma resposta, com os contadores da gravação: arquivos
+    gravados (written), ignorados por já estarem iguais no disco (skipped), com erro
+    (failed) e bytes gravados (bytes_written). edit_errors guarda, por caminho, o motivo das
+    edições (ver code_edits) que não puderam ser aplicadas.
+    """
+
+    def __init__(self, files=()):
+        super().__init__(files)
+        self.written = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.edit_errors = {}
+
+    def record(self, path, status, size=0):
+        """
+        Registra o resultado da gravação de um arquivo.
+
+        Args:
+            path: Caminho do arquivo (entra na lista se foi gravado ou já estava igual)
+            status: "written", "skipped" ou "failed"
+            size: Bytes gravados (só para "written")
+        """
+        if status == "written":
+            self.written += 1
+            self.bytes_written += size
+        elif status == "skipped":
+            self.skipped += 1
+        else:
+            self.failed += 1
+            return
+        if path not in self:
+            self.append(path)
+
+    def merge(self, other):
+        """Acrescenta os arquivos e soma os contadores de outro resultado."""
+        self.extend(path for path in other if path not in self)
+        self.written += other.written
+        self.skipped += other.skipped
+        self.failed += other.failed
+        self.bytes_written += other.bytes_written
+        self.edit_errors.update(other.edit_errors)
+        return self
+
+    def summary(self):
+        return (f"{self.written} gravados ({self.bytes_written} bytes), {self.skipped} inalterados"
+                + (f", {self.failed} com erro" if self.failed else ""))
+
+
+def extract_all_code_blocks(text):
+    """
+    Extrai todos os blocos com caminho de uma resposta completa, num único percurso pelo texto.
+
+    Returns:
+        Lista de tuplas (caminho, código) na ordem da resposta, inclusive os caminhos
+        repetidos (necessários para aplicar várias edições ao mesmo arquivo, ver code_edits)
+    """
+    blocks = []
+    extractor = IncrementalCodeExtractor(lambda path, code: blocks.append((path, code)))
+    extractor.feed(text)
+    extractor.finish()
+    return blocks
+
+
+def extract_code_blocks(text):
+    """
+    Extrai os arquivos de uma resposta completa num único percurso pelo texto.
+
+    Returns:
+        Lista de tuplas (caminho, código), uma por caminho, na ordem em que os caminhos
+        aparecem; se um caminho aparece mais de uma vez, vale o último bloco
+    """
+    return list(dict(extract_all_code_blocks(text)).items())
+
+
+class IncrementalCodeExtractor:
+    """
+    Extrai arquivos de uma resposta à medida que o texto chega (por exemplo, via streaming).
+    Cada arquivo é entregue ao callback assim que o bloco de código que o contém é fechado.
+    """
+
+    def __init__(self, on_file):
+        """
+        Args:
+            on_file: Função chamada com (file_path, code) para cada arquivo completo;
+                se retornar um valor, é ele que fica registrado em files (ex.: o caminho final)
+        """
+        self.on_file = on_file
+        self.files = []
+        self._seen_files = set()
+        self._pending = ""
+        self._in_fence = False
+        self._header_path = None
+        self._announced_path = None
+        self._ends_with_colon = False
+        self._fence_path = None
+        self._fence_lines = []
+        # Indica se o texto terminou dentro de um bloco de código (resposta truncada)
+        self.truncated = False
+
+    def feed(self, text):
+        """Processa um trecho de texto; linhas incompletas ficam guardadas até o próximo trecho."""
+        self._pending += text
+        if "\n" not in text:
+            return
+        lines = self._pending.split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._process_line(line)
+
+    def finish(self):
+        """
+        Processa o restante do texto e encerra a extração.
+
+        Returns:
+            Lista de arquivos entregues ao callback, na ordem em que foram encontrados
+        """
+        if self._pending:
+            self._process_line(self._pending)
+            self._pending = ""
+        # Um bloco ainda aberto aqui foi truncado e não é gravado
+        self.truncated = self._in_fence
+        self._in_fence = False
+        self._fence_lines = []
+        return self.files
+
+    def _process_line(self, line):
+        line = line.rstrip("\r")
+        fence = FENCE_RE.match(line) if "```" in line else None
+
+        if self._in_fence:
+            if fence and not fence.group(1):
+                self._close_fence()
+                return
+            if self._fence_path is None and not self._fence_lines:
+                match = FILE_COMMENT_RE.match(line)
+                if match:
+                    self._fence_path = match.group(1)
+                    return
+            self._fence_lines.append(line)
+            return
+
+        if fence:
+            self._open_fence(fence.group(1))
+            return
+
+        if not line.strip():
+            return
+
+        inline_fence = INLINE_FENCE_RE.match(line) if "```" in line else None
+        if inline_fence:
+            line = inline_fence.group(1)
+
+        # Só a última linha não vazia antes do bloco pode anunciar o arquivo (convenções 3 e 5)
+        self._header_path = path_from_header_line(line)
+        self._ends_with_colon = line.rstrip().endswith(":")
+        # Uma frase como "Crie o arquivo `x.php`" vale para o próximo bloco de código (convenção 2)
+        announced = announced_path(line)
+        if announced:
+            self._announced_path = announced
+        elif line.lstrip().startswith("#"):
+            self._announced_path = None
+
+        if inline_fence:
+            self._open_fence(inline_fence.group(2))
+
+    def _open_fence(self, language):
+        announced = self._announced_path
+        if announced is not None and language_matches(announced, language):
+            # A frase vale para um único bloco; blocos de comandos entre ela e o arquivo não a consomem
+            self._announced_path = None
+            if self._header_path is None and self._ends_with_colon:
+                self._header_path = announced
+        self._in_fence = True
+        self._fence_path = None
+        self._fence_lines = []
+
+    def _close_fence(self):
+        path = self._fence_path or self._header_path
+        code = "\n".join(self._fence_lines)
+        self._in_fence = False
+        self._header_path = None
+        self._ends_with_colon = False
+        self._fence_path = None
+        self._fence_lines = []
+
+        if path:
+            result = self.on_file(path, code + "\n")
+            result = result if result is not None else path
+            # Um arquivo repetido na resposta é regravado, mas registrado uma vez só
+            if result not in self._seen_files:
+                self._seen_files.add(result)
+                self.files.append(result)
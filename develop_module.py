@@ -1,4 +1,4 @@
-from claude_manager import ClaudeProjectManager
+from claude_manager import ClaudeProjectManager, REQUIREMENTS_PLACEHOLDER
 import argparse
 import os
 import sys
@@ -23,11 +23,27 @@ def main():
     parser.add_argument('--prompt', help='Prompt direto para o módulo (evita entrada interativa)')
     parser.add_argument('--prompt-file', help='Arquivo contendo o prompt para o módulo')
     parser.add_argument('--api-key', help='Chave API do Claude (tem precedência sobre api.txt)')
+    output_group = parser.add_mutually_exclusive_group()
+    output_group.add_argument('--stream', action='store_true', help='Usar streaming e gravar cada arquivo assim que ele chega')
+    output_group.add_argument('--structured', action='store_true', help='Pedir os arquivos pela ferramenta write_file em vez de blocos de código')
+    output_group.add_argument('--edit', action='store_true', help='Pedir só as alterações (SEARCH/REPLACE) nos arquivos já criados do módulo')
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument('--cache', action='store_true', help='Usar o cache local de respostas mesmo se desativado na configuração')
+    cache_group.add_argument('--no-cache', action='store_true', help='Não usar o cache local de respostas')
+    cache_group.add_argument('--refresh', action='store_true', help='Ignorar respostas em cache e gravar a resposta nova')
     args = parser.parse_args()
 
     # Inicializa o gerenciador
     manager = ClaudeProjectManager()
     
+    # Cache local de respostas
+    if args.cache:
+        manager.set_response_cache_mode("use")
+    elif args.no_cache:
+        manager.set_response_cache_mode("off")
+    elif args.refresh:
+        manager.set_response_cache_mode("refresh")
+    
     # Define a API key (prioridade para o argumento de linha de comando)
     if args.api_key:
         print(f"Usando API key fornecida via argumento --api-key")
@@ -46,13 +62,7 @@ def main():
 
     # Define o módulo atual
     try:
-        module_exists = False
-        for module in manager.config["project"]["modules"]:
-            if module["name"] == args.module:
-                module_exists = True
-                break
-        
-        if not module_exists:
+        if manager.get_module(args.module) is None:
             print(f"Erro: Módulo '{args.module}' não encontrado.")
             print("Módulos disponíveis:")
             for module in manager.config["project"]["modules"]:
@@ -74,8 +84,11 @@ def main():
         print(f"Módulo '{args.module}' marcado como concluído!")
         return
 
-    # Gera um prompt base para o módulo
-    base_prompt = manager.generate_module_prompt()
+    # Gera um prompt base para o módulo; com o cache de prompt, o contexto do projeto
+    # vai num bloco separado para ser reaproveitado entre execuções
+    use_cache = manager.use_prompt_caching()
+    base_prompt = manager.generate_module_prompt(include_context=not use_cache)
+    context_text = manager._load_project_context() if use_cache else None
     
     # Obtém os requisitos específicos do usuário (de diferentes fontes conforme a prioridade)
     user_requirements = None
@@ -101,10 +114,7 @@ def main():
     
     # Substitui a seção de requisitos no prompt base
     if user_requirements:
-        prompt = base_prompt.replace(
-            "[Descreva aqui os requisitos específicos para esta etapa do desenvolvimento]",
-            user_requirements
-        )
+        prompt = base_prompt.replace(REQUIREMENTS_PLACEHOLDER, user_requirements)
     else:
         prompt = base_prompt
     
@@ -127,35 +137,62 @@ def main():
     
     # Envia para o Claude
     print("\nEnviando prompt para o Claude...")
-    response_json, response_text = manager.send_prompt_to_claude(prompt)
-    
-    if response_json:
-        print("\nResposta recebida com sucesso!")
-        
-        # Salva a resposta em um arquivo temporário para referência
-        with open(f"temp_response_{args.module}.txt", "w", encoding="utf-8") as f:
-            f.write(response_text)
-        
-        # Extrai e salva código
-        print("\nExtraindo e salvando código...")
-        created_files = manager.extract_and_save_all_code(response_text)
-        
-        if created_files:
-            print(f"\nArquivos criados ({len(created_files)}):")
-            for file in created_files:
-                print(f" - {file}")
+    # Sessão, arquivos do módulo e progresso são gravados numa única escrita ao final
+    with manager.transaction():
+        extractor = None
+        created_files = None
+        if args.structured:
+            # Os arquivos chegam como chamadas à ferramenta write_file e já são gravados aqui
+            response_json, response_text, created_files = manager.send_structured_prompt(
+                prompt, module_name=args.module, context_text=context_text
+            )
+        elif args.edit:
+            # O conteúdo atual dos arquivos vai no prompt e a resposta traz só as alterações
+            response_json, response_text, created_files = manager.send_edit_prompt(
+                prompt, module_name=args.module, context_text=context_text
+            )
+        elif args.stream:
+            # Cada arquivo é gravado assim que o bloco de código correspondente termina
+            extractor = manager.create_incremental_extractor()
+            response_json, response_text = manager.send_prompt_to_claude(
+                prompt, stream=True, on_text=extractor.feed, module_name=args.module, context_text=context_text
+            )
         else:
-            print("\nNenhum arquivo foi criado a partir da resposta.")
+            response_json, response_text = manager.send_prompt_to_claude(
+                prompt, module_name=args.module, context_text=context_text
+            )
         
-        # Pergunta sobre o progresso (exceto se foi usado --prompt ou --prompt-file)
-        if not args.prompt and not args.prompt_file:
-            progress = input("\nAtualizar progresso do módulo? (0-100, Enter para pular): ")
-            if progress and progress.isdigit():
-                manager.update_module_progress(args.module, int(progress))
-        
-        print("\nDesenvolvimento do módulo concluído com sucesso!")
-    else:
-        print(f"\nErro ao obter resposta: {response_text}")
+        if response_json:
+            print("\nResposta recebida com sucesso!")
+            
+            # Salva a resposta em um arquivo temporário para referência
+            manager.save_temp_response(args.module, response_text)
+            
+            # Extrai e salva código
+            if extractor:
+                created_files = manager.finish_incremental_extraction(extractor, args.module)
+            elif created_files is None:
+                print("\nExtraindo e salvando código...")
+                created_files = manager.extract_and_save_all_code(response_text, module_name=args.module)
+            
+            if created_files:
+                print(f"\nArquivos criados ({len(created_files)}):")
+                for file in created_files:
+                    print(f" - {file}")
+                print(f"Gravação: {created_files.summary()}")
+            else:
+                print("\nNenhum arquivo foi criado a partir da resposta.")
+            
+            # Pergunta sobre o progresso (exceto se foi usado --prompt ou --prompt-file)
+            if not args.prompt and not args.prompt_file:
+                progress = input("\nAtualizar progresso do módulo? (0-100, Enter para pular): ")
+                if progress and progress.isdigit():
+                    manager.update_module_progress(args.module, int(progress))
+            
+            print("\nDesenvolvimento do módulo concluído com sucesso!")
+        else:
+            print(f"\nErro ao obter resposta: {response_text}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,50 @@
+from async_claude_manager import AsyncClaudeProjectManager
+import argparse
+import asyncio
+import os
+
+def load_requirements(args, module_names):
+    """Monta o dicionário {módulo: requisitos} a partir dos argumentos."""
+    requirements = {}
+    for module_name in module_names:
+        text = args.prompt
+        if args.prompt_dir:
+            prompt_file = os.path.join(args.prompt_dir, f"{module_name}.txt")
+            if os.path.exists(prompt_file):
+                with open(prompt_file, 'r', encoding='utf-8') as f:
+                    text = f.read()
+        requirements[module_name] = text
+    return requirements
+
+def main():
+    parser = argparse.ArgumentParser(description='Desenvolver vários módulos do projeto SaaS Restaurante em paralelo')
+    parser.add_argument('modules', nargs='*', help='Módulos a desenvolver (padrão: todos os não concluídos)')
+    parser.add_argument('--prompt', help='Requisitos usados para todos os módulos')
+    parser.add_argument('--prompt-dir', help='Diretório com um arquivo <módulo>.txt de requisitos por módulo')
+    parser.add_argument('--concurrency', type=int, default=3, help='Número máximo de prompts simultâneos')
+    args = parser.parse_args()
+
+    manager = AsyncClaudeProjectManager(max_concurrency=args.concurrency)
+
+    available = {m["name"]: m for m in manager.config["project"]["modules"]}
+    module_names = args.modules or [
+        name for name, module in available.items() if module["status"] != "completed"
+    ]
+    unknown = [name for name in module_names if name not in available]
+    if unknown:
+        print(f"Erro: Módulos não encontrados: {', '.join(unknown)}")
+        return
+
+    print(f"\nDesenvolvendo {len(module_names)} módulos (até {args.concurrency} ao mesmo tempo)...")
+    results = asyncio.run(manager.develop_modules(load_requirements(args, module_names)))
+
+    for result in results:
+        if result["error"]:
+            print(f"\n{result['module']}: erro ao obter resposta: {result['error']}")
+        else:
+            print(f"\n{result['module']}: {len(result['files'])} arquivos criados")
+            for file in result["files"]:
+                print(f" - {file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Extrai os arquivos de código de respostas salvas: arquivos de sessão (sessions/**/*.json),
+respostas em texto (temp_response_*.txt) ou diretórios inteiros com eles.
+
+A leitura e a análise das respostas são distribuídas entre processos; os resultados são
+ordenados pela data das sessões (a versão mais recente de cada arquivo prevalece) e gravados
+de uma vez, como em extract_and_save_all_code. As sessões já extraídas (mesma resposta, mesma
+versão do extrator e arquivos intactos, segundo o registro de extrações) são puladas.
+
+Uso:
+    python extract_sessions.py                              # todas as sessões em sessions/
+    python extract_sessions.py sessions/core temp_response_core.txt --output .
+    python extract_sessions.py sessions --module core --dry-run
+    python extract_sessions.py --force                      # ignora o registro de extrações
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from blob_store import BlobStore
+from code_edits import apply_edits, is_edit_block, parse_edits
+from code_extractor import EXTRACTOR_VERSION, ExtractionResult, extract_all_code_blocks
+from extraction_ledger import file_fingerprint, is_current
+
+# Extensões lidas quando um diretório é informado
+SOURCE_EXTENSIONS = (".json", ".txt")
+
+# Estado de cada processo de análise: armazenamento dos textos e extrações já registradas
+_blob_store = None
+_storage_config = {}
+_ledger_entries = {}
+
+
+def _init_worker(storage_config, ledger_entries):
+    global _storage_config, _ledger_entries
+    _storage_config = storage_config
+    _ledger_entries = ledger_entries
+
+
+def iter_sources(paths):
+    """Expande diretórios (recursivamente) em arquivos de sessão e de resposta."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(SOURCE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def _module_from_text_file(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return name[len("temp_response_"):] if name.startswith("temp_response_") else None
+
+
+def _response_text(session):
+    global _blob_store
+    if session.get("response") is not None:
+        return session["response"]
+    if session.get("response_ref"):
+        if _blob_store is None:
+            _blob_store = BlobStore.from_config(_storage_config)
+        return _blob_store.get(session["response_ref"])
+    return None
+
+
+def parse_source(path):
+    """
+    Lê uma sessão (JSON) ou resposta (texto) e extrai os arquivos dela, a menos que o
+    registro de extrações indique que ela já foi aplicada.
+
+    Args:
+        path: Caminho do arquivo
+
+    Returns:
+        Dicionário com "source", "key" (ID da sessão ou caminho do arquivo), "timestamp",
+        "module", "response_hash", "files" (lista de (caminho, código), inclusive os blocos de
+        edição), "skipped", "error" e "edit_errors" (preenchido em build_write_plan)
+    """
+    item = {"source": path, "key": "file:" + os.path.abspath(path), "timestamp": "", "module": None,
+            "response_hash": None, "files": [], "skipped": False, "error": None, "edit_errors": {}}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        item["timestamp"] = datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+    except (OSError, UnicodeDecodeError) as e:
+        item["error"] = str(e)
+        return item
+    item["module"] = _module_from_text_file(path)
+
+    text = content
+    tool_files = []
+    if path.endswith(".json") or content.lstrip().startswith("{"):
+        try:
+            session = json.loads(content)
+        except ValueError as e:
+            item["error"] = f"JSON inválido: {str(e)}"
+            return item
+        if not isinstance(session, dict):
+            item["error"] = "não é um arquivo de sessão"
+            return item
+        item["key"] = session.get("id") or item["key"]
+        item["timestamp"] = session.get("timestamp") or item["timestamp"]
+        item["module"] = session.get("module") or item["module"]
+        # Sessões do modo estruturado guardam os arquivos das chamadas a write_file
+        tool_files = [
+            (tool_input["path"], tool_input["content"]) for tool_input in session.get("files", [])
+            if isinstance(tool_input, dict) and tool_input.get("path") and isinstance(tool_input.get("content"), str)
+        ]
+        # O response_ref já é o sha256 da resposta: dá para comparar sem ler o texto
+        item["response_hash"] = session.get("response_ref")
+        if item["response_hash"] is None and session.get("response") is not None:
+            item["response_hash"] = BlobStore.ref_for(session["response"])
+        if tool_files:
+            digest = hashlib.sha256(json.dumps(tool_files, ensure_ascii=False).encode("utf-8")).hexdigest()
+            item["response_hash"] = f"{item['response_hash']}+{digest}"
+        if is_current(_ledger_entries.get(item["key"]), item["response_hash"], EXTRACTOR_VERSION):
+            item["skipped"] = True
+            return item
+        try:
+            text = _response_text(session)
+        except KeyError:
+            item["error"] = "texto da resposta não encontrado no BlobStore"
+            return item
+        if text is None and not tool_files:
+            item["error"] = "sessão sem resposta"
+            return item
+    else:
+        item["response_hash"] = BlobStore.ref_for(content)
+        if is_current(_ledger_entries.get(item["key"]), item["response_hash"], EXTRACTOR_VERSION):
+            item["skipped"] = True
+            return item
+
+    item["files"] = tool_files + (extract_all_code_blocks(text) if text else [])
+    return item
+
+
+def build_write_plan(parsed, manager, base_dir, owners=None):
+    """
+    Junta os arquivos extraídos num único plano de gravação, na ordem das sessões: quando um
+    arquivo aparece em várias sessões, vale o da mais recente. Os blocos de edição são
+    aplicados sobre a versão anterior do arquivo no plano (ou no disco); os que falham ficam
+    em item["edit_errors"].
+
+    Args:
+        parsed: Resultados de parse_source
+        manager: ClaudeProjectManager (normalização dos caminhos)
+        base_dir: Diretório do projeto dentro da saída
+        owners: Caminho final -> data da sessão pulada que o gerou; uma sessão mais antiga
+            não sobrescreve esse arquivo
+
+    Returns:
+        Tupla (plano caminho -> código, caminho -> resultado de parse_source de origem)
+    """
+    owners = owners or {}
+    plan = {}
+    origins = {}
+    for item in sorted(parsed, key=lambda item: (item["timestamp"], item["source"])):
+        for file_path, code in item["files"]:
+            full_path = manager._normalize_file_path(file_path, base_dir)
+            if owners.get(manager._resolve_code_path(full_path), "") > item["timestamp"]:
+                continue
+            if is_edit_block(code):
+                try:
+                    current = plan[full_path] if full_path in plan else manager._read_code_file(full_path)
+                    if current is None:
+                        raise ValueError("o arquivo não existe")
+                    code = apply_edits(current, parse_edits(code))
+                except ValueError as e:
+                    item["edit_errors"][full_path] = str(e)
+                    continue
+            # Reinsere para que a ordem do plano siga a última sessão que gerou o arquivo
+            plan.pop(full_path, None)
+            plan[full_path] = code
+            origins[full_path] = item
+    return plan, origins
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extrair os arquivos de código de sessões e respostas salvas')
+    parser.add_argument('inputs', nargs='*', default=['sessions'],
+                        help='Arquivos de sessão (.json), respostas (.txt) ou diretórios (padrão: sessions)')
+    parser.add_argument('--config', default='claude_project_config.json', help='Arquivo de configuração')
+    parser.add_argument('--output', help='Diretório raiz de saída (padrão: base_path do gerenciador)')
+    parser.add_argument('--base-dir', default='restaurante-sistema', help='Diretório do projeto dentro da saída')
+    parser.add_argument('--module', help='Só as sessões deste módulo')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='Processos de análise')
+    parser.add_argument('--register', action='store_true', help='Registra os arquivos nos módulos das sessões')
+    parser.add_argument('--force', action='store_true', help='Refaz também as extrações já registradas')
+    parser.add_argument('--dry-run', action='store_true', help='Só mostra o plano de gravação')
+    args = parser.parse_args(argv)
+
+    sources = list(iter_sources(args.inputs))
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        for path in missing:
+            print(f"ERRO: Arquivo '{path}' não encontrado!")
+        sys.exit(1)
+    if not sources:
+        print("Nenhum arquivo de sessão ou resposta encontrado.")
+        return
+
+    from claude_manager import ClaudeProjectManager
+    manager = ClaudeProjectManager(args.config)
+    if args.output:
+        manager.base_path = os.path.abspath(args.output)
+
+    ledger = manager.extraction_ledger
+    ledger_entries = {} if args.force else ledger.entries(manager.base_path)
+    init_args = (manager.config.get("storage", {}), ledger_entries)
+    if args.jobs > 1 and len(sources) > 1:
+        chunksize = max(1, len(sources) // (args.jobs * 4))
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=init_args) as pool:
+            parsed = list(pool.map(parse_source, sources, chunksize=chunksize))
+    else:
+        _init_worker(*init_args)
+        parsed = [parse_source(path) for path in sources]
+
+    for item in parsed:
+        if item["error"]:
+            print(f"AVISO: '{item['source']}' ignorado: {item['error']}")
+    if args.module:
+        parsed = [item for item in parsed if item["module"] == args.module]
+    skipped = [item for item in parsed if item["skipped"]]
+    pending = [item for item in parsed if not item["skipped"] and not item["error"]]
+
+    # Arquivos das sessões puladas: uma sessão mais antiga refeita não os sobrescreve
+    owners = {}
+    for item in skipped:
+        for path in ledger_entries[item["key"]]["files"]:
+            owners[path] = max(owners.get(path, ""), item["timestamp"])
+
+    plan, origins = build_write_plan(pending, manager, args.base_dir, owners)
+    for item in pending:
+        for full_path, error in item["edit_errors"].items():
+            print(f"AVISO: edições de '{item['source']}' não aplicadas em '{full_path}': {error}")
+    print(f"{len(sources)} arquivos lidos, {len(skipped)} já extraídos, "
+          f"{sum(len(item['files']) for item in pending)} blocos encontrados, "
+          f"{len(plan)} arquivos no plano de gravação (saída: {manager.base_path})")
+
+    if args.dry_run:
+        for full_path, item in origins.items():
+            print(f" - {full_path}  <- {item['source']}" + (f" [{item['module']}]" if item["module"] else ""))
+        return
+
+    result = ExtractionResult()
+    manager._save_code_files(plan, result)
+
+    # Registra as extrações aplicadas; uma origem com erro de gravação ou com edições não
+    # aplicadas fica para a próxima vez
+    failed = result.failed > 0
+    records = {}
+    for item in pending:
+        if item["edit_errors"]:
+            continue
+        records[item["key"]] = {
+            "response_hash": item["response_hash"],
+            "extractor_version": EXTRACTOR_VERSION,
+            "timestamp": item["timestamp"],
+            "files": {}
+        }
+    for full_path, item in origins.items():
+        target = manager._resolve_code_path(full_path)
+        if item["key"] in records and os.path.exists(target):
+            records[item["key"]]["files"][target] = file_fingerprint(target, plan[full_path].encode("utf-8"))
+    if not failed:
+        ledger.record(manager.base_path, records)
+
+    if args.register:
+        by_module = {}
+        for full_path in result:
+            module_name = origins[full_path]["module"]
+            if module_name:
+                by_module.setdefault(module_name, []).append(full_path)
+        with manager.transaction():
+            for module_name, files in by_module.items():
+                manager._register_module_files(files, module_name)
+
+    print("\n" + "=" * 50)
+    print("RESUMO DA EXTRAÇÃO:")
+    edit_failures = sum(1 for item in pending if item["edit_errors"])
+    print(f"Sessões: {len(pending) - edit_failures} extraídas, {len(skipped)} já extraídas"
+          + (f", {edit_failures} com edições não aplicadas" if edit_failures else ""))
+    print(f"Arquivos: {result.summary()}")
+    print("=" * 50)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Registro das extrações já aplicadas, para que extrações repetidas só refaçam o que mudou.
+
+Para cada diretório de saída, cada origem (uma sessão, pelo ID, ou um arquivo de resposta,
+pelo caminho) guarda o hash da resposta, a versão do extrator e os arquivos que ela gerou e
+que ainda são dela (com sha256, tamanho e mtime). Uma origem é pulada quando a resposta, a
+versão do extrator e esses arquivos continuam iguais.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from fs_utils import FileLock, atomic_write_json
+
+# Arquivo padrão do registro, no mesmo diretório do arquivo de configuração
+DEFAULT_LEDGER_FILE = "claude_project_extractions.json"
+
+
+def file_fingerprint(path, data=None):
+    """
+    Impressão digital de um arquivo gravado: sha256, tamanho e mtime.
+
+    Args:
+        path: Caminho do arquivo
+        data: Conteúdo gravado (bytes); se None, o arquivo é lido
+    """
+    if data is None:
+        with open(path, 'rb') as f:
+            data = f.read()
+    stat = os.stat(path)
+    return {"sha256": hashlib.sha256(data).hexdigest(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def file_unchanged(path, fingerprint):
+    """Indica se o arquivo ainda tem o conteúdo registrado (o sha256 só é calculado se o mtime mudou)."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    if stat.st_size != fingerprint["size"]:
+        return False
+    if stat.st_mtime_ns == fingerprint["mtime_ns"]:
+        return True
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest() == fingerprint["sha256"]
+
+
+def is_current(entry, response_hash, extractor_version):
+    """Indica se uma origem já foi extraída com esta resposta e esta versão e se os arquivos dela estão intactos."""
+    if entry is None or entry.get("response_hash") != response_hash \
+            or entry.get("extractor_version") != extractor_version:
+        return False
+    return all(file_unchanged(path, fingerprint) for path, fingerprint in entry.get("files", {}).items())
+
+
+class ExtractionLedger:
+    """
+    Registro das extrações num arquivo JSON:
+    {"roots": {diretório de saída: {origem: {"response_hash", "extractor_version",
+    "timestamp", "extracted_at", "files": {caminho: impressão digital}}}}}
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Caminho do arquivo do registro (criado na primeira gravação)
+        """
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"roots": {}}
+
+    def entries(self, root):
+        """Retorna as origens registradas para um diretório de saída."""
+        return self._load()["roots"].get(os.path.abspath(root), {})
+
+    def record(self, root, records):
+        """
+        Registra extrações aplicadas. Os arquivos de cada origem passam a ser dela: saem dos
+        registros das outras origens do mesmo diretório de saída.
+
+        Args:
+            root: Diretório de saída
+            records: Dicionário origem -> {"response_hash", "extractor_version", "timestamp",
+                "files": {caminho: impressão digital}}
+        """
+        if not records:
+            return
+        root = os.path.abspath(root)
+        with self.lock:
+            ledger = self._load()
+            entries = ledger["roots"].setdefault(root, {})
+            claimed = {path for record in records.values() for path in record["files"]}
+            for key, entry in entries.items():
+                if key not in records:
+                    entry["files"] = {path: fp for path, fp in entry["files"].items() if path not in claimed}
+            extracted_at = datetime.now().isoformat()
+            for key, record in records.items():
+                entries[key] = dict(record, extracted_at=extracted_at)
+            atomic_write_json(self.path, ledger)
+
+    def forget(self, keys):
+        """
+        Remove origens do registro, em todos os diretórios de saída (por exemplo, as sessões
+        removidas do histórico pela retenção).
+
+        Args:
+            keys: Origens a remover
+
+        Returns:
+            Número de registros removidos
+        """
+        keys = set(keys)
+        if not keys:
+            return 0
+        with self.lock:
+            ledger = self._load()
+            removed = 0
+            for entries in ledger["roots"].values():
+                for key in keys & set(entries):
+                    del entries[key]
+                    removed += 1
+            if removed:
+                atomic_write_json(self.path, ledger)
+        return removed
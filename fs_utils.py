@@ -0,0 +1,260 @@
+import errno
+import json
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Threads usadas por materialize_files para escrever os arquivos de uma resposta
+DEFAULT_WRITE_WORKERS = 8
+
+# Diretório dos temporários de materialize_files, no mesmo diretório do arquivo de configuração
+# (fora da árvore servida pelo servidor web)
+DEFAULT_STAGING_DIR = "staging"
+
+
+class MaterializeError(OSError):
+    """
+    Falha de materialize_files ao renomear um arquivo para o destino. statuses traz o
+    resultado ("written" ou "skipped") dos arquivos concluídos antes da falha; os demais
+    ficaram como estavam no disco.
+    """
+
+    def __init__(self, message, statuses):
+        super().__init__(message)
+        self.statuses = statuses
+
+
+class FileLock:
+    """
+    Lock consultivo entre processos baseado em um arquivo auxiliar.
+    Também serializa as threads do próprio processo que usam a mesma instância.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Caminho do arquivo de lock (criado se não existir)
+        """
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    def acquire(self):
+        """Bloqueia até obter o lock."""
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth > 1:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def release(self):
+        """Libera o lock."""
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+def _current_umask():
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _current_umask()
+
+
+def _file_mode(path):
+    """Permissões para gravar path: as do arquivo existente ou as de um arquivo novo (umask)."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except OSError:
+        return 0o666 & ~_UMASK
+
+
+def _write_synced(f, data, mode):
+    f.write(data)
+    f.flush()
+    # mkstemp cria o temporário com 0600; o servidor web precisa ler os arquivos gerados
+    if hasattr(os, "fchmod"):
+        os.fchmod(f.fileno(), mode)
+    os.fsync(f.fileno())
+
+
+def _fsync_directory(directory):
+    """Garante que as renomeações feitas no diretório chegaram ao disco."""
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def _same_content(path, data):
+    try:
+        # Tamanhos diferentes dispensam a leitura do arquivo
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def atomic_write(path, data, encoding='utf-8'):
+    """
+    Grava um arquivo de forma atômica: escreve num temporário no mesmo diretório, faz fsync
+    e o renomeia por cima do destino. Leitores veem o conteúdo antigo ou o novo, nunca um
+    arquivo pela metade, mesmo se o processo morrer no meio da gravação. O arquivo mantém as
+    permissões do destino anterior (ou as de um arquivo novo, segundo a umask).
+
+    Args:
+        path: Caminho do arquivo de destino
+        data: Conteúdo (str ou bytes)
+        encoding: Codificação usada quando data é str
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    mode = _file_mode(path)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            _write_synced(f, data, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(directory)
+
+
+def atomic_write_json(path, obj, indent=4):
+    """Serializa obj em JSON e grava com atomic_write."""
+    atomic_write(path, json.dumps(obj, indent=indent))
+
+
+def write_if_changed(path, data, encoding='utf-8'):
+    """
+    Grava o arquivo com atomic_write só se o conteúdo for diferente do que já está no disco.
+    Um arquivo igual não é tocado (o mtime é preservado).
+
+    Returns:
+        True se o arquivo foi gravado, False se o conteúdo já era o mesmo
+    """
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    if _same_content(path, data):
+        return False
+    atomic_write(path, data)
+    return True
+
+
+def materialize_files(files, max_workers=DEFAULT_WRITE_WORKERS, staging_dir=None):
+    """
+    Grava um conjunto de arquivos de uma vez. Os arquivos alterados são escritos em paralelo
+    (até max_workers threads) num diretório temporário no mesmo sistema de arquivos e, só
+    depois que todos foram escritos, são renomeados para os destinos em sequência. Se algum
+    falhar na escrita, nenhum destino é alterado; quem lê os destinos (o servidor web) nunca
+    vê um arquivo pela metade nem um conjunto interrompido no meio da escrita. Arquivos com
+    o mesmo conteúdo que já está no disco não são tocados.
+
+    Args:
+        files: Dicionário caminho de destino -> conteúdo (str ou bytes)
+        max_workers: Número máximo de threads de escrita
+        staging_dir: Diretório em que o temporário é criado, fora da árvore servida e no mesmo
+            sistema de arquivos dos destinos (em outro, cada arquivo é gravado sozinho com
+            atomic_write); se None, usa o diretório comum aos destinos
+
+    Returns:
+        Dicionário caminho -> "written" ou "skipped", na ordem de files
+
+    Raises:
+        MaterializeError: Se uma renomeação falhar (com os arquivos já concluídos)
+    """
+    files = {
+        os.path.abspath(path): data.encode('utf-8') if isinstance(data, str) else data
+        for path, data in files.items()
+    }
+    if not files:
+        return {}
+    # O temporário fica no mesmo sistema de arquivos dos destinos, para a renomeação não cruzá-los
+    staging_dir = staging_dir or os.path.commonpath([os.path.dirname(path) for path in files])
+    os.makedirs(staging_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=staging_dir, prefix=".staging-")
+
+    def stage(item):
+        index, (path, data) = item
+        if _same_content(path, data):
+            return None
+        staged_path = os.path.join(staging, str(index))
+        with open(staged_path, 'wb') as f:
+            _write_synced(f, data, _file_mode(path))
+        return staged_path
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(files)))) as pool:
+            staged = list(pool.map(stage, enumerate(files.items())))
+
+        directories = {os.path.dirname(path) for path, staged_path in zip(files, staged) if staged_path}
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+
+        statuses = {}
+        for (path, data), staged_path in zip(files.items(), staged):
+            if staged_path is None:
+                statuses[path] = "skipped"
+                continue
+            try:
+                try:
+                    os.replace(staged_path, path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    # Destino montado em outro sistema de arquivos: grava esse arquivo sozinho
+                    atomic_write(path, data)
+            except OSError as e:
+                raise MaterializeError(f"erro ao renomear '{path}': {e}", statuses) from e
+            statuses[path] = "written"
+
+        for directory in directories:
+            _fsync_directory(directory)
+        return statuses
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,149 @@
+import json
+import os
+from itertools import islice
+
+from fs_utils import FileLock, atomic_write
+
+# Nome padrão do log de sessões, gravado no mesmo diretório do arquivo de configuração
+DEFAULT_HISTORY_LOG = "claude_project_history.jsonl"
+
+# Tamanho dos blocos lidos do fim do arquivo ao percorrer o log de trás para frente
+REVERSE_READ_BLOCK = 64 * 1024
+
+
+class SessionLog:
+    """
+    Histórico de sessões num arquivo JSONL só de acréscimo: uma sessão por linha.
+    Gravar uma sessão custa o tamanho dela, e não o do histórico inteiro; as leituras
+    percorrem o arquivo linha a linha sem carregá-lo todo na memória, e as mais recentes
+    (tail, page) leem só o fim do arquivo.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Caminho do arquivo JSONL (criado no primeiro acréscimo)
+        """
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+
+    def append(self, session):
+        """Acrescenta uma sessão ao fim do log."""
+        line = json.dumps(session, ensure_ascii=False) + "\n"
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def extend(self, sessions):
+        """
+        Acrescenta várias sessões de uma vez, ignorando as que já estão no log.
+
+        Returns:
+            Número de sessões acrescentadas
+        """
+        with self.lock:
+            existing_ids = {session.get("id") for session in self}
+            new_sessions = [s for s in sessions if s.get("id") not in existing_ids]
+            if new_sessions:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    for session in new_sessions:
+                        f.write(json.dumps(session, ensure_ascii=False) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+        return len(new_sessions)
+
+    def __iter__(self):
+        """Percorre as sessões da mais antiga para a mais recente."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Linha incompleta de uma gravação interrompida
+                    continue
+
+    def iter_reverse(self):
+        """Percorre as sessões da mais recente para a mais antiga, lendo o arquivo a partir do fim."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            position = f.seek(0, os.SEEK_END)
+            remainder = b""
+            while position > 0:
+                size = min(REVERSE_READ_BLOCK, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + remainder).split(b"\n")
+                # A primeira linha do bloco pode continuar no bloco anterior
+                remainder = lines.pop(0)
+                for line in reversed(lines):
+                    session = self._decode(line)
+                    if session is not None:
+                        yield session
+            session = self._decode(remainder)
+            if session is not None:
+                yield session
+
+    @staticmethod
+    def _decode(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    def find(self, session_id):
+        """Retorna a sessão com o ID informado, ou None (as mais recentes são verificadas primeiro)."""
+        for session in self.iter_reverse():
+            if session.get("id") == session_id:
+                return session
+        return None
+
+    def tail(self, count):
+        """Retorna as últimas sessões do log, da mais antiga para a mais recente."""
+        return list(reversed(list(islice(self.iter_reverse(), count))))
+
+    def page(self, page=0, page_size=20):
+        """Retorna uma página do histórico, da sessão mais recente para a mais antiga."""
+        start = page * page_size
+        return list(islice(self.iter_reverse(), start, start + page_size))
+
+    def evict(self, select, on_evict=None):
+        """
+        Remove sessões do log, reescrevendo-o de forma atômica. Tudo acontece com o lock do
+        log, então sessões acrescentadas por outros processos durante a escolha não se perdem.
+
+        Args:
+            select: Função que recebe a lista de sessões e retorna os IDs a remover
+            on_evict: Função chamada com as sessões removidas depois que o log foi reescrito
+                (se a reescrita falhar, ela não é chamada e as sessões continuam no log)
+
+        Returns:
+            Lista das sessões removidas
+        """
+        with self.lock:
+            sessions = list(self)
+            evicted_ids = select(sessions)
+            evicted = [session for session in sessions if session.get("id") in evicted_ids]
+            if not evicted:
+                return []
+            atomic_write(self.path, "".join(
+                json.dumps(session, ensure_ascii=False) + "\n"
+                for session in sessions if session.get("id") not in evicted_ids
+            ))
+            if on_evict:
+                on_evict(evicted)
+        return evicted
+
+    def count(self):
+        """Conta as sessões do log."""
+        return sum(1 for _ in self)
@@ -0,0 +1,547 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita a Messages API do Claude, para testar o gerenciador sem API key.
+
+Responde POST /v1/messages (JSON e streaming SSE) e a Message Batches API reproduzindo as
+sessões gravadas em sessions/, com latência, erros e 429 configuráveis. Com --upstream,
+prompts sem gravação são repassados à API real e gravados para as próximas execuções.
+
+Uso:
+    python mock_claude_server.py --port 8765 --latency 0.5 --rate-limit-rate 0.1
+e, em claude_project_config.json, "api_endpoint": "http://127.0.0.1:8765/v1/messages"
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from blob_store import BlobStore, LazySession, DEFAULT_BLOB_DIR
+from claude_manager import STRUCTURED_OUTPUT_INSTRUCTION
+from code_extractor import IncrementalCodeExtractor
+
+# Resposta usada quando não há nenhuma sessão gravada
+DEFAULT_RESPONSE = """Resposta simulada pelo servidor local.
+
+```php
+// File: core/Example.php
+<?php
+
+class Example
+{
+}
+```
+"""
+
+
+def _prompt_hash(prompt_text):
+    return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+
+def _recorded_prompt(prompt_text):
+    """Prompt como o gerenciador o grava na sessão: sem a instrução acrescentada no modo estruturado."""
+    suffix = f"\n\n{STRUCTURED_OUTPUT_INSTRUCTION}"
+    return prompt_text[:-len(suffix)] if prompt_text.endswith(suffix) else prompt_text
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+def _upstream_error(error):
+    """Status, corpo (JSON de erro da API) e cabeçalhos a repassar de uma resposta de erro da API real."""
+    body = error.read()
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict) or not isinstance(payload.get("error"), dict):
+        payload = {"type": "error", "error": {"type": "api_error", "message": body.decode("utf-8", "replace")}}
+    headers = {name: value for name, value in (error.headers or {}).items()
+               if name.lower() == "retry-after" or name.lower().startswith("anthropic-ratelimit-")}
+    return error.code, payload, headers
+
+
+def _has_tool_results(message):
+    content = message.get("content")
+    return isinstance(content, list) and any(block.get("type") == "tool_result" for block in content)
+
+
+def _tool_use_content(response_text):
+    """
+    Converte os arquivos em blocos de código de uma resposta gravada em chamadas a write_file,
+    como o modelo responderia a um pedido com a ferramenta (modo estruturado do gerenciador).
+    """
+    content = [{"type": "text", "text": "Seguem os arquivos."}]
+
+    def on_file(path, code):
+        content.append({
+            "type": "tool_use",
+            "id": "toolu_" + hashlib.md5(f"{path}{len(content)}".encode()).hexdigest()[:24],
+            "name": "write_file",
+            "input": {"path": path, "language": os.path.splitext(path)[1].lstrip("."), "content": code}
+        })
+
+    extractor = IncrementalCodeExtractor(on_file)
+    extractor.feed(response_text)
+    extractor.finish()
+    return content
+
+
+class ReplayStore:
+    """Respostas gravadas, indexadas pelo hash do prompt."""
+
+    def __init__(self, sessions_dir, blob_dir=DEFAULT_BLOB_DIR):
+        self.sessions_dir = Path(sessions_dir)
+        self.blob_store = BlobStore(blob_dir)
+        self.responses = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Lê todos os arquivos de sessão (sessions/<módulo>/<id>.json)."""
+        if not self.sessions_dir.exists():
+            return
+        for path in sorted(self.sessions_dir.rglob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(session, dict):
+                continue
+            if "prompt_ref" in session:
+                # Sessão com os textos no BlobStore do gerenciador
+                try:
+                    session = LazySession(session, self.blob_store).resolved()
+                except KeyError:
+                    continue
+            if "prompt" in session and "response" in session:
+                self.responses[_prompt_hash(session["prompt"])] = session["response"]
+
+    def lookup(self, prompt_text, fallback="any"):
+        """
+        Retorna a resposta gravada para o prompt.
+        Sem gravação exata, fallback="any" escolhe uma sessão gravada de forma determinística
+        e fallback="default" usa a resposta padrão; fallback="none" retorna None.
+        """
+        with self.lock:
+            response = self.responses.get(_prompt_hash(prompt_text))
+            if response is not None or fallback == "none":
+                return response
+            if fallback == "any" and self.responses:
+                keys = sorted(self.responses)
+                index = int(_prompt_hash(prompt_text), 16) % len(keys)
+                return self.responses[keys[index]]
+        return DEFAULT_RESPONSE
+
+    def record(self, prompt_text, response_text, usage):
+        """Grava uma resposta obtida da API real no mesmo formato das sessões do gerenciador."""
+        session_id = hashlib.md5(f"{prompt_text}_{datetime.now().isoformat()}".encode()).hexdigest()
+        session = {
+            "id": session_id,
+            "timestamp": datetime.now().isoformat(),
+            "module": "recorded",
+            "prompt": prompt_text,
+            "response": response_text,
+            "tokens_used": usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        }
+        module_dir = self.sessions_dir / "recorded"
+        module_dir.mkdir(parents=True, exist_ok=True)
+        with open(module_dir / f"{session_id}.json", 'w', encoding='utf-8') as f:
+            json.dump(session, f, indent=4)
+        with self.lock:
+            self.responses[_prompt_hash(prompt_text)] = response_text
+
+
+class MockClaudeServer(ThreadingHTTPServer):
+    """Servidor HTTP com o estado compartilhado entre as requisições."""
+
+    daemon_threads = True
+
+    def __init__(self, address, options):
+        super().__init__(address, MockClaudeHandler)
+        self.options = options
+        self.store = ReplayStore(options.sessions, options.blobs)
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.cached_contexts = set()
+        self.batches = {}
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def check_rate_limit(self):
+        """
+        Aplica o limite simulado de requisições por minuto.
+
+        Returns:
+            Tupla (permitido, cabeçalhos anthropic-ratelimit-*, segundos até liberar)
+        """
+        rpm = self.options.rpm
+        if not rpm:
+            return True, {}, 0
+        with self.lock:
+            now = time.time()
+            while self.request_times and now - self.request_times[0] >= 60:
+                self.request_times.popleft()
+            allowed = len(self.request_times) < rpm
+            if allowed:
+                self.request_times.append(now)
+            reset_in = 60 - (now - self.request_times[0]) if self.request_times else 0
+            reset_at = datetime.now(timezone.utc) + timedelta(seconds=reset_in)
+            headers = {
+                "anthropic-ratelimit-requests-limit": str(rpm),
+                "anthropic-ratelimit-requests-remaining": str(rpm - len(self.request_times)),
+                "anthropic-ratelimit-requests-reset": reset_at.isoformat().replace("+00:00", "Z")
+            }
+        return allowed, headers, reset_in
+
+    def build_message(self, params):
+        """
+        Gera a mensagem de resposta para os parâmetros de uma requisição da Messages API.
+        Trata prefill (continuação), max_tokens e os contadores do cache de prompt.
+        """
+        messages = params.get("messages", [])
+        user_content = messages[0]["content"] if messages else ""
+        context_tokens = 0
+        cache_key = None
+        if isinstance(user_content, list):
+            text_blocks = [block for block in user_content if block.get("type") == "text"]
+            prompt_text = text_blocks[-1]["text"] if text_blocks else ""
+            for block in text_blocks[:-1]:
+                if block.get("cache_control"):
+                    context_tokens += _estimate_tokens(block["text"])
+                    cache_key = _prompt_hash(block["text"])
+        else:
+            prompt_text = user_content
+
+        tool_names = [tool.get("name") for tool in params.get("tools", [])]
+        if "write_file" in tool_names and len(messages) > 1 and _has_tool_results(messages[-1]):
+            # Arquivos já entregues pelas chamadas da rodada anterior
+            return self._message(params, prompt_text, [{"type": "text", "text": "Arquivos gravados."}], "end_turn")
+
+        # Os dois modos do gerenciador reproduzem (e gravam) as mesmas sessões
+        recorded_prompt = _recorded_prompt(prompt_text)
+        response_text = self.store.lookup(recorded_prompt, self.options.fallback)
+        if response_text is None and self.options.upstream:
+            response_text = self.fetch_upstream(params, recorded_prompt)
+        if response_text is None:
+            return None
+
+        # Continuação: o texto já gerado vem como prefill do assistente
+        if len(messages) > 1 and messages[-1]["role"] == "assistant":
+            prefill = messages[-1]["content"]
+            if isinstance(prefill, list):
+                prefill = "".join(block.get("text", "") for block in prefill)
+            if response_text.startswith(prefill):
+                response_text = response_text[len(prefill):]
+
+        if "write_file" in tool_names:
+            return self._message(params, prompt_text, _tool_use_content(response_text), "tool_use",
+                                 context_tokens, cache_key)
+
+        stop_reason = "end_turn"
+        max_chars = int(params.get("max_tokens", 4096)) * 4
+        if len(response_text) > max_chars:
+            response_text = response_text[:max_chars]
+            stop_reason = "max_tokens"
+
+        return self._message(params, prompt_text, [{"type": "text", "text": response_text}], stop_reason,
+                             context_tokens, cache_key)
+
+    def _message(self, params, prompt_text, content, stop_reason, context_tokens=0, cache_key=None):
+        """Monta a mensagem de resposta, com o uso estimado de tokens."""
+        output = "".join(block.get("text", "") or json.dumps(block.get("input", "")) for block in content)
+        usage = {
+            "input_tokens": _estimate_tokens(prompt_text),
+            "output_tokens": _estimate_tokens(output),
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0
+        }
+        if cache_key:
+            with self.lock:
+                cached = cache_key in self.cached_contexts
+                self.cached_contexts.add(cache_key)
+            usage["cache_read_input_tokens" if cached else "cache_creation_input_tokens"] = context_tokens
+
+        message_id = "msg_" + hashlib.md5(f"{prompt_text}{time.time()}".encode()).hexdigest()[:24]
+        return {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": params.get("model", "mock"),
+            "content": content,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage
+        }
+
+    def fetch_upstream(self, params, prompt_text):
+        """
+        Repassa a requisição à API real e grava a resposta com o prompt informado (modo --upstream).
+        Uma resposta de erro da API real (urllib.error.HTTPError) é propagada para ser repassada ao cliente.
+        """
+        upstream_params = dict(params)
+        upstream_params.pop("stream", None)
+        request = urllib.request.Request(
+            self.options.upstream,
+            data=json.dumps(upstream_params).encode("utf-8"),
+            headers={
+                "x-api-key": self.options.upstream_key or os.environ.get("CLAUDE_API_KEY", ""),
+                "anthropic-version": "2023-06-01",
+                "content-type": "application/json"
+            },
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=600) as response:
+            message = json.loads(response.read())
+        parts = []
+        for block in message.get("content", []):
+            if block.get("type") == "text":
+                parts.append(block["text"])
+            elif block.get("type") == "tool_use" and block.get("name") == "write_file":
+                # Grava os arquivos do modo estruturado como blocos de código, o formato das sessões
+                tool_input = block.get("input", {})
+                parts.append(f"\n```{tool_input.get('language', '')}\n// File: {tool_input.get('path')}\n"
+                             f"{tool_input.get('content', '')}```\n")
+        text = "".join(parts)
+        self.store.record(prompt_text, text, message.get("usage", {}))
+        return text
+
+
+class MockClaudeHandler(BaseHTTPRequestHandler):
+    """Trata as rotas da Messages API e da Message Batches API."""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if not self.server.options.quiet:
+            super().log_message(format, *args)
+
+    def _read_json(self):
+        length = int(self.headers.get("content-length", 0))
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _send_json(self, status, payload, extra_headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, error_type, message, extra_headers=None):
+        self._send_json(status, {"type": "error", "error": {"type": error_type, "message": message}}, extra_headers)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_event(self, payload):
+        self._write_chunk(f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+
+    def do_POST(self):
+        path = self.path.rstrip("/")
+        if path.endswith("/messages/batches"):
+            return self.create_batch()
+        if path.endswith("/messages"):
+            return self.create_message()
+        self._send_error(404, "not_found_error", f"Rota desconhecida: {self.path}")
+
+    def do_GET(self):
+        parts = self.path.rstrip("/").split("/")
+        if "batches" in parts:
+            batch_id = parts[parts.index("batches") + 1] if len(parts) > parts.index("batches") + 1 else None
+            if batch_id and parts[-1] == "results":
+                return self.batch_results(batch_id)
+            if batch_id:
+                return self.get_batch(batch_id)
+        self._send_error(404, "not_found_error", f"Rota desconhecida: {self.path}")
+
+    def create_message(self):
+        options = self.server.options
+        params = self._read_json()
+        with self.server.lock:
+            self.server.stats["requests"] += 1
+
+        allowed, rate_headers, reset_in = self.server.check_rate_limit()
+        if not allowed or random.random() < options.rate_limit_rate:
+            with self.server.lock:
+                self.server.stats["rate_limited"] += 1
+            retry_after = max(1, int(reset_in)) if not allowed else options.retry_after
+            rate_headers["retry-after"] = str(retry_after)
+            return self._send_error(429, "rate_limit_error", "Limite de requisições simulado", rate_headers)
+
+        if random.random() < options.error_rate:
+            with self.server.lock:
+                self.server.stats["errors"] += 1
+            status = random.choice([500, 529])
+            error_type = "overloaded_error" if status == 529 else "api_error"
+            return self._send_error(status, error_type, "Erro simulado")
+
+        if options.latency:
+            time.sleep(options.latency + random.uniform(0, options.jitter))
+
+        try:
+            message = self.server.build_message(params)
+        except urllib.error.HTTPError as e:
+            # Repassa o erro da API real (429, 4xx, 5xx) em vez de derrubar a conexão
+            status, payload, headers = _upstream_error(e)
+            return self._send_json(status, payload, headers)
+        if message is None:
+            return self._send_error(404, "not_found_error", "Nenhuma resposta gravada para este prompt")
+
+        if params.get("stream"):
+            return self.stream_message(message, rate_headers)
+        self._send_json(200, message, rate_headers)
+
+    def stream_message(self, message, extra_headers):
+        """Envia a mensagem como eventos SSE, em trechos de --chunk-size caracteres."""
+        options = self.server.options
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        start = dict(message, content=[], stop_reason=None)
+        start["usage"] = dict(message["usage"], output_tokens=1)
+        self._send_event({"type": "message_start", "message": start})
+        for index, block in enumerate(message["content"]):
+            if block["type"] == "tool_use":
+                self._send_event({"type": "content_block_start", "index": index,
+                                  "content_block": dict(block, input={})})
+                text = json.dumps(block["input"])
+                delta = {"type": "input_json_delta", "partial_json": ""}
+                field = "partial_json"
+            else:
+                self._send_event({"type": "content_block_start", "index": index,
+                                  "content_block": {"type": "text", "text": ""}})
+                text = block["text"]
+                delta = {"type": "text_delta", "text": ""}
+                field = "text"
+            for offset in range(0, len(text), options.chunk_size):
+                if options.token_delay:
+                    time.sleep(options.token_delay)
+                self._send_event({
+                    "type": "content_block_delta",
+                    "index": index,
+                    "delta": dict(delta, **{field: text[offset:offset + options.chunk_size]})
+                })
+            self._send_event({"type": "content_block_stop", "index": index})
+        self._send_event({
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]}
+        })
+        self._send_event({"type": "message_stop"})
+        self._write_chunk(b"")
+
+    def create_batch(self):
+        payload = self._read_json()
+        batch_id = "msgbatch_" + hashlib.md5(f"{time.time()}{random.random()}".encode()).hexdigest()[:24]
+        results = []
+        for request in payload.get("requests", []):
+            error = {"type": "not_found_error", "message": "Sem gravação"}
+            try:
+                message = self.server.build_message(request["params"])
+            except urllib.error.HTTPError as e:
+                message, error = None, _upstream_error(e)[1]["error"]
+            if message is None:
+                result = {"type": "errored", "error": error}
+            else:
+                result = {"type": "succeeded", "message": message}
+            results.append({"custom_id": request["custom_id"], "result": result})
+        with self.server.lock:
+            self.server.batches[batch_id] = {"created": time.time(), "results": results}
+        self._send_json(200, self._batch_status(batch_id))
+
+    def _batch_status(self, batch_id):
+        batch = self.server.batches[batch_id]
+        ended = time.time() - batch["created"] >= self.server.options.batch_delay
+        total = len(batch["results"])
+        succeeded = sum(1 for r in batch["results"] if r["result"]["type"] == "succeeded")
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": succeeded if ended else 0,
+                "errored": total - succeeded if ended else 0,
+                "canceled": 0,
+                "expired": 0
+            },
+            "results_url": f"{self.server.base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def get_batch(self, batch_id):
+        if batch_id not in self.server.batches:
+            return self._send_error(404, "not_found_error", f"Lote '{batch_id}' não encontrado")
+        self._send_json(200, self._batch_status(batch_id))
+
+    def batch_results(self, batch_id):
+        if batch_id not in self.server.batches:
+            return self._send_error(404, "not_found_error", f"Lote '{batch_id}' não encontrado")
+        body = "\n".join(json.dumps(r) for r in self.server.batches[batch_id]["results"]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "application/x-jsonl")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Servidor local que imita a API do Claude (gravação/reprodução)')
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta')
+    parser.add_argument('--port', type=int, default=8765, help='Porta de escuta')
+    parser.add_argument('--sessions', default='sessions', help='Diretório com as sessões gravadas')
+    parser.add_argument('--blobs', default=DEFAULT_BLOB_DIR, help='Diretório dos textos das sessões (BlobStore)')
+    parser.add_argument('--fallback', choices=['any', 'default', 'none'], default='any',
+                        help='O que responder quando o prompt não tem gravação')
+    parser.add_argument('--upstream', help='Endpoint real para onde repassar (e gravar) prompts sem gravação')
+    parser.add_argument('--upstream-key', help='API key usada com --upstream (padrão: $CLAUDE_API_KEY)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Atraso antes dos cabeçalhos (segundos)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Atraso aleatório extra (segundos)')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='Atraso entre trechos do streaming (segundos)')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Caracteres por trecho do streaming')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fração de respostas 500/529')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fração de respostas 429 aleatórias')
+    parser.add_argument('--retry-after', type=int, default=1, help='Valor de retry-after nas respostas 429 aleatórias')
+    parser.add_argument('--rpm', type=int, default=0, help='Limite simulado de requisições por minuto (0 = sem limite)')
+    parser.add_argument('--batch-delay', type=float, default=0.0, help='Tempo até um lote ficar pronto (segundos)')
+    parser.add_argument('--quiet', action='store_true', help='Não registrar cada requisição no console')
+    return parser
+
+
+def main():
+    options = build_parser().parse_args()
+    server = MockClaudeServer((options.host, options.port), options)
+    print(f"Servidor simulado em {server.base_url}/v1/messages "
+          f"({len(server.store.responses)} respostas gravadas em '{options.sessions}')")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nEstatísticas: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -49,12 +49,18 @@ def main():
         # Estatísticas de uso da API
         print("\nESTATÍSTICAS DE USO DA API:")
         print(f"  Total de tokens utilizados: {manager.config['history']['total_tokens_used']}")
-        print(f"  Total de sessões: {len(manager.config['history']['sessions'])}")
+        print(f"  Total de sessões: {manager.config['history'].get('total_sessions', 0)}")
+        
+        # Uso por módulo (inclui as sessões já removidas pela retenção)
+        print("\nUSO POR MÓDULO:")
+        for module_name, usage in manager.get_usage_statistics().items():
+            print(f"  {module_name or '-'}: {usage['sessions']} sessões, {usage['tokens']} tokens, "
+                  f"tempo médio de resposta {usage['avg_response_time']}s")
         
         # Últimas sessões
         print("\nÚLTIMAS SESSÕES:")
-        sessions = manager.config['history']['sessions']
-        for i, session in enumerate(sessions[-5:], 1):
+        sessions = manager.get_recent_sessions(5)
+        for i, session in enumerate(sessions, 1):
             timestamp = datetime.fromisoformat(session['timestamp']).strftime('%d/%m/%Y %H:%M')
             print(f"  {i}. {timestamp} - Módulo: {session['module']} - Tokens: {session['tokens_used']}")
     
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from fs_utils import FileLock
+
+# Valores padrão usados quando a chave não existe em config["api"] (0 desativa o limite)
+DEFAULT_REQUESTS_PER_MINUTE = 50
+DEFAULT_TOKENS_PER_MINUTE = 80000
+
+
+def _parse_reset(value, now):
+    """Converte um cabeçalho *-reset (data RFC 3339) em segundos a partir de agora."""
+    try:
+        reset_at = datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, ValueError):
+        return None
+    return max(0.0, reset_at - now)
+
+
+def retry_delay_from_headers(headers):
+    """
+    Calcula quanto esperar antes de repetir uma requisição recusada.
+
+    Returns:
+        Segundos indicados por retry-after ou pelos cabeçalhos anthropic-ratelimit-*-reset, ou None
+    """
+    retry_after = headers.get("retry-after")
+    if retry_after is not None:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+    now = time.time()
+    delays = []
+    for name in ("requests", "tokens", "input-tokens", "output-tokens"):
+        if headers.get(f"anthropic-ratelimit-{name}-remaining") == "0":
+            reset = _parse_reset(headers.get(f"anthropic-ratelimit-{name}-reset"), now)
+            if reset is not None:
+                delays.append(reset)
+    return max(delays) if delays else None
+
+
+class SharedRateLimiter:
+    """
+    Token bucket de requisições por minuto e tokens por minuto compartilhado entre
+    processos da mesma máquina. O estado fica num arquivo JSON protegido por FileLock,
+    de modo que execuções paralelas dividem a mesma cota.
+    """
+
+    def __init__(self, state_file, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        """
+        Args:
+            state_file: Arquivo com o estado compartilhado dos buckets
+            requests_per_minute: Capacidade do bucket de requisições (0 desativa)
+            tokens_per_minute: Capacidade do bucket de tokens (0 desativa)
+        """
+        self.state_file = state_file
+        self.lock = FileLock(state_file + ".lock")
+        self.limits = {
+            "requests": requests_per_minute,
+            "tokens": tokens_per_minute
+        }
+
+    @classmethod
+    def from_config(cls, api_config):
+        """Cria o limitador a partir da seção "api" da configuração."""
+        state_file = api_config.get("rate_limit_file")
+        if not state_file:
+            # Um arquivo por API key: processos com a mesma chave dividem a mesma cota
+            key_hash = hashlib.sha256(api_config.get("claude_api_key", "").encode()).hexdigest()[:12]
+            state_file = os.path.join(tempfile.gettempdir(), f"claude_rate_limit_{key_hash}.json")
+        return cls(
+            state_file,
+            requests_per_minute=int(api_config.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=int(api_config.get("tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE)),
+        )
+
+    def _load_state(self, now):
+        state = {}
+        if os.path.exists(self.state_file):
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+        for name, limit in self.limits.items():
+            bucket = state.setdefault(name, {"level": limit, "updated": now})
+            # O limite informado pela API tem precedência sobre o configurado
+            capacity = bucket.get("capacity", limit)
+            if capacity:
+                elapsed = max(0.0, now - bucket["updated"])
+                bucket["level"] = min(capacity, bucket["level"] + elapsed * capacity / 60.0)
+            bucket["updated"] = now
+        state.setdefault("blocked_until", 0)
+        return state
+
+    def _save_state(self, state):
+        tmp_file = self.state_file + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _capacity(self, state, name):
+        return state[name].get("capacity", self.limits[name])
+
+    def acquire(self, tokens=0):
+        """
+        Bloqueia até haver cota para uma requisição com o custo estimado em tokens.
+
+        Returns:
+            Tempo total (em segundos) que a chamada esperou
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+                state = self._load_state(now)
+                wait = max(0.0, state["blocked_until"] - now)
+                costs = {"requests": 1, "tokens": tokens}
+                for name, cost in costs.items():
+                    capacity = self._capacity(state, name)
+                    if not capacity or not cost:
+                        continue
+                    # Um pedido maior que o bucket espera o bucket encher e deixa saldo negativo
+                    needed = min(cost, capacity) - state[name]["level"]
+                    if needed > 0:
+                        wait = max(wait, needed * 60.0 / capacity)
+                if wait <= 0:
+                    for name, cost in costs.items():
+                        if self._capacity(state, name):
+                            state[name]["level"] -= cost
+                    self._save_state(state)
+                    return waited
+                self._save_state(state)
+            time.sleep(wait)
+            waited += wait
+
+    def adjust(self, tokens):
+        """Debita (ou devolve, se negativo) tokens após conhecer o uso real da requisição."""
+        if not tokens:
+            return
+        with self.lock:
+            state = self._load_state(time.time())
+            if self._capacity(state, "tokens"):
+                capacity = self._capacity(state, "tokens")
+                state["tokens"]["level"] = min(capacity, state["tokens"]["level"] - tokens)
+                self._save_state(state)
+
+    def block_for(self, seconds):
+        """Suspende todas as requisições (de todos os processos) pelo tempo indicado."""
+        with self.lock:
+            now = time.time()
+            state = self._load_state(now)
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            self._save_state(state)
+
+    def update_from_headers(self, headers):
+        """Sincroniza os buckets com os cabeçalhos anthropic-ratelimit-* da resposta."""
+        with self.lock:
+            now = time.time()
+            state = self._load_state(now)
+            changed = False
+            for name in ("requests", "tokens"):
+                limit = headers.get(f"anthropic-ratelimit-{name}-limit")
+                remaining = headers.get(f"anthropic-ratelimit-{name}-remaining")
+                if limit is not None and self.limits[name]:
+                    state[name]["capacity"] = int(limit)
+                    changed = True
+                if remaining is not None and self._capacity(state, name):
+                    state[name]["level"] = min(state[name]["level"], int(remaining))
+                    changed = True
+                if remaining is not None and int(remaining) == 0:
+                    reset = _parse_reset(headers.get(f"anthropic-ratelimit-{name}-reset"), now)
+                    if reset:
+                        state["blocked_until"] = max(state["blocked_until"], now + reset)
+                        changed = True
+            if changed:
+                self._save_state(state)
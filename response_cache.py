@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import time
+
+# Valores padrão usados quando a chave não existe em config["cache"]
+DEFAULT_CACHE_DIR = "cache/responses"
+DEFAULT_MAX_SIZE_MB = 500
+DEFAULT_MAX_AGE_DAYS = 30
+
+
+class ResponseCache:
+    """
+    Cache local de respostas da API endereçado pelo conteúdo da requisição.
+    A chave é o hash de (model, max_tokens, messages, tools); cada resposta fica num arquivo JSON.
+    A remoção é LRU: o mtime de um arquivo é atualizado a cada acerto, e as entradas mais
+    antigas saem primeiro quando o cache passa do tamanho ou da idade máxima.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_SIZE_MB,
+                 max_age_days=DEFAULT_MAX_AGE_DAYS):
+        """
+        Args:
+            cache_dir: Diretório onde as respostas são guardadas
+            max_size_mb: Tamanho máximo do cache em MB (0 = sem limite)
+            max_age_days: Idade máxima de uma entrada sem uso, em dias (0 = sem limite)
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+
+    @classmethod
+    def from_config(cls, cache_config):
+        """Cria o cache a partir da seção "cache" da configuração."""
+        return cls(
+            cache_dir=cache_config.get("dir", DEFAULT_CACHE_DIR),
+            max_size_mb=float(cache_config.get("max_size_mb", DEFAULT_MAX_SIZE_MB)),
+            max_age_days=float(cache_config.get("max_age_days", DEFAULT_MAX_AGE_DAYS)),
+        )
+
+    @staticmethod
+    def make_key(data):
+        """Calcula a chave de cache de uma requisição da Messages API."""
+        key_data = {
+            "model": data.get("model"),
+            "max_tokens": data.get("max_tokens"),
+            "messages": data.get("messages")
+        }
+        # Só entra na chave quando existe, para não invalidar as entradas sem ferramentas
+        if data.get("tools"):
+            key_data["tools"] = data["tools"]
+        serialized = json.dumps(key_data, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """
+        Retorna a resposta guardada para a chave, ou None se não houver (ou se expirou).
+        """
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+
+        if self.max_age and time.time() - mtime > self.max_age:
+            self._remove(path)
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                response_json = json.load(f)
+        except (OSError, ValueError):
+            self._remove(path)
+            return None
+
+        # Marca a entrada como usada recentemente
+        os.utime(path, None)
+        return response_json
+
+    def put(self, key, response_json):
+        """Guarda uma resposta e aplica a política de remoção."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(response_json, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove entradas expiradas e, se o cache passar do tamanho máximo, as usadas há mais tempo.
+
+        Returns:
+            Número de entradas removidas
+        """
+        entries = list(self._iter_entries())
+        now = time.time()
+        removed = 0
+        remaining = []
+        for path, size, mtime in entries:
+            if self.max_age and now - mtime > self.max_age:
+                self._remove(path)
+                removed += 1
+            else:
+                remaining.append((path, size, mtime))
+
+        total_size = sum(size for _, size, _ in remaining)
+        if self.max_bytes and total_size > self.max_bytes:
+            remaining.sort(key=lambda entry: entry[2])
+            for path, size, _ in remaining:
+                if total_size <= self.max_bytes:
+                    break
+                self._remove(path)
+                total_size -= size
+                removed += 1
+
+        return removed
+
+    def stats(self):
+        """Retorna o número de entradas e o tamanho total do cache em bytes."""
+        entries = list(self._iter_entries())
+        return {
+            "entries": len(entries),
+            "size_bytes": sum(size for _, size, _ in entries)
+        }
+
+    def _iter_entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
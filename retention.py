@@ -0,0 +1,241 @@
+"""
+Retenção e compactação do histórico de sessões.
+
+A política (config["retention"]) define quais sessões antigas saem do histórico: por idade,
+por quantidade por módulo ou pelo tamanho total. Ao sair, cada sessão é somada aos
+agregados por módulo e por dia (sessões, tokens, tempo de resposta), gravados à parte, então
+os relatórios e as estatísticas de uso continuam exatos depois da compactação.
+
+Uso:
+    python retention.py             # aplica a política configurada
+    python retention.py --dry-run   # só mostra o que seria removido
+    python retention.py --max-age-days 90 --max-sessions-per-module 50
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from fs_utils import FileLock, atomic_write_json
+
+# Valores padrão usados quando a chave não existe em config["retention"] (0 = sem limite)
+DEFAULT_MAX_AGE_DAYS = 0
+DEFAULT_MAX_SESSIONS_PER_MODULE = 0
+DEFAULT_MAX_SIZE_MB = 0
+DEFAULT_LOGS_MAX_AGE_DAYS = 0
+
+# Arquivo padrão dos agregados, no mesmo diretório do arquivo de configuração
+DEFAULT_ROLLUPS_FILE = "claude_project_rollups.json"
+
+# Campos numéricos das sessões somados nos agregados (nome no agregado -> campo da sessão)
+ROLLUP_FIELDS = {
+    "tokens": "tokens_used",
+    "response_time": "response_time",
+    "cache_creation_input_tokens": "cache_creation_input_tokens",
+    "cache_read_input_tokens": "cache_read_input_tokens",
+}
+
+
+class RetentionPolicy:
+    """
+    Escolhe as sessões a remover do histórico. Os critérios se somam: sai a sessão mais
+    antiga que max_age_days, a que passa das max_sessions_per_module mais recentes do seu
+    módulo e, enquanto o total passar de max_size_mb, as mais antigas das restantes.
+    """
+
+    def __init__(self, max_age_days=DEFAULT_MAX_AGE_DAYS, max_sessions_per_module=DEFAULT_MAX_SESSIONS_PER_MODULE,
+                 max_size_mb=DEFAULT_MAX_SIZE_MB, logs_max_age_days=DEFAULT_LOGS_MAX_AGE_DAYS):
+        """
+        Args:
+            max_age_days: Idade máxima de uma sessão, em dias (0 = sem limite); também vale
+                para os arquivos responses/temp_response_*.txt
+            max_sessions_per_module: Sessões mantidas por módulo (0 = sem limite)
+            max_size_mb: Tamanho máximo das sessões mantidas, somando prompt e resposta (0 = sem limite)
+            logs_max_age_days: Idade máxima dos arquivos de log em logs/ (0 = sem limite)
+        """
+        self.max_age_days = max_age_days
+        self.max_sessions_per_module = int(max_sessions_per_module)
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+        self.logs_max_age_days = logs_max_age_days
+
+    @classmethod
+    def from_config(cls, retention_config):
+        """Cria a política a partir da seção "retention" da configuração."""
+        return cls(
+            max_age_days=float(retention_config.get("max_age_days", DEFAULT_MAX_AGE_DAYS)),
+            max_sessions_per_module=int(retention_config.get("max_sessions_per_module",
+                                                             DEFAULT_MAX_SESSIONS_PER_MODULE)),
+            max_size_mb=float(retention_config.get("max_size_mb", DEFAULT_MAX_SIZE_MB)),
+            logs_max_age_days=float(retention_config.get("logs_max_age_days", DEFAULT_LOGS_MAX_AGE_DAYS)),
+        )
+
+    def is_active(self):
+        """Indica se algum limite das sessões está configurado."""
+        return bool(self.max_age_days or self.max_sessions_per_module or self.max_bytes)
+
+    def select(self, sessions, size_of, now=None):
+        """
+        Escolhe as sessões a remover.
+
+        Args:
+            sessions: Lista de sessões do histórico
+            size_of: Função que retorna o tamanho de uma sessão em bytes (usada com max_size_mb)
+            now: Momento de referência (padrão: agora)
+
+        Returns:
+            Conjunto com os IDs das sessões a remover
+        """
+        now = now or datetime.now()
+        ordered = sorted(sessions, key=lambda session: session.get("timestamp") or "")
+        evicted = set()
+
+        if self.max_age_days:
+            cutoff = (now - timedelta(days=self.max_age_days)).isoformat()
+            evicted.update(s["id"] for s in ordered if (s.get("timestamp") or "") < cutoff)
+
+        if self.max_sessions_per_module:
+            kept = {}
+            for session in reversed(ordered):
+                if session["id"] in evicted:
+                    continue
+                module_name = session.get("module") or ""
+                kept[module_name] = kept.get(module_name, 0) + 1
+                if kept[module_name] > self.max_sessions_per_module:
+                    evicted.add(session["id"])
+
+        if self.max_bytes:
+            remaining = [(session, size_of(session)) for session in ordered if session["id"] not in evicted]
+            total = sum(size for _, size in remaining)
+            for session, size in remaining:
+                if total <= self.max_bytes:
+                    break
+                evicted.add(session["id"])
+                total -= size
+
+        return evicted
+
+
+class UsageRollups:
+    """
+    Agregados de uso das sessões removidas do histórico, por módulo e por dia, num arquivo
+    JSON. Somados às sessões ainda no histórico (add_sessions), dão as estatísticas exatas
+    de todas as sessões já registradas.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Caminho do arquivo dos agregados (criado na primeira compactação)
+        """
+        self.path = path
+        self.lock = FileLock(path + ".lock")
+
+    @staticmethod
+    def empty():
+        return {"sessions": 0, "modules": {}}
+
+    @staticmethod
+    def add_sessions(rollups, sessions):
+        """Soma as sessões aos agregados (alterando rollups) e os retorna."""
+        for session in sessions:
+            day = (session.get("timestamp") or "")[:10] or "unknown"
+            module_name = session.get("module") or ""
+            bucket = rollups["modules"].setdefault(module_name, {}).setdefault(day, {"sessions": 0})
+            bucket["sessions"] += 1
+            for field, session_field in ROLLUP_FIELDS.items():
+                bucket[field] = round(bucket.get(field, 0) + (session.get(session_field) or 0), 4)
+            if session.get("response_cache") == "hit":
+                bucket["response_cache_hits"] = bucket.get("response_cache_hits", 0) + 1
+            rollups["sessions"] += 1
+        return rollups
+
+    def load(self):
+        """Lê os agregados gravados (vazios se ainda não houve compactação)."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return self.empty()
+
+    def archive(self, sessions):
+        """Soma as sessões removidas aos agregados gravados."""
+        with self.lock:
+            atomic_write_json(self.path, self.add_sessions(self.load(), sessions))
+
+    @staticmethod
+    def summarize(rollups, module_name=None):
+        """
+        Totais por módulo a partir dos agregados diários.
+
+        Returns:
+            Dicionário módulo -> {"sessions", "tokens", "response_time", "avg_response_time", ...}
+        """
+        summary = {}
+        for name, days in rollups["modules"].items():
+            if module_name is not None and name != module_name:
+                continue
+            totals = {}
+            for bucket in days.values():
+                for field, value in bucket.items():
+                    totals[field] = round(totals.get(field, 0) + value, 4)
+            totals["avg_response_time"] = round(totals["response_time"] / totals["sessions"], 2) \
+                if totals.get("sessions") else 0
+            summary[name] = totals
+        return summary
+
+
+def remove_old_files(directory, pattern_prefix, pattern_suffix, max_age_days, now=None, dry_run=False):
+    """
+    Remove os arquivos de um diretório (sem recursão) com o prefixo e o sufixo informados
+    e mais antigos que max_age_days. Com dry_run=True, só os conta.
+
+    Returns:
+        Tupla (arquivos removidos, bytes liberados)
+    """
+    if not max_age_days or not os.path.isdir(directory):
+        return 0, 0
+    cutoff = (now or time.time()) - max_age_days * 86400
+    removed = freed = 0
+    for entry in os.scandir(directory):
+        if not (entry.is_file() and entry.name.startswith(pattern_prefix) and entry.name.endswith(pattern_suffix)):
+            continue
+        stat = entry.stat()
+        if stat.st_mtime >= cutoff:
+            continue
+        try:
+            if not dry_run:
+                os.remove(entry.path)
+        except OSError:
+            continue
+        removed += 1
+        freed += stat.st_size
+    return removed, freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aplicar a política de retenção ao histórico de sessões')
+    parser.add_argument('--config', default='claude_project_config.json', help='Arquivo de configuração')
+    parser.add_argument('--dry-run', action='store_true', help='Só mostra o que seria removido')
+    parser.add_argument('--max-age-days', type=float, help='Idade máxima das sessões (sobrepõe a configuração)')
+    parser.add_argument('--max-sessions-per-module', type=int, help='Sessões mantidas por módulo')
+    parser.add_argument('--max-size-mb', type=float, help='Tamanho máximo das sessões mantidas')
+    parser.add_argument('--logs-max-age-days', type=float, help='Idade máxima dos arquivos de log')
+    args = parser.parse_args()
+
+    from claude_manager import ClaudeProjectManager
+    manager = ClaudeProjectManager(args.config)
+    retention_config = dict(manager.config.get("retention", {}))
+    for key in ("max_age_days", "max_sessions_per_module", "max_size_mb", "logs_max_age_days"):
+        if getattr(args, key) is not None:
+            retention_config[key] = getattr(args, key)
+
+    result = manager.compact_history(RetentionPolicy.from_config(retention_config), dry_run=args.dry_run)
+    prefix = "Seriam removidos" if args.dry_run else "Removidos"
+    print(f"{prefix}: {result['sessions']} sessões, {result['session_files']} arquivos de sessão, "
+          f"{result['blobs']} textos/blocos, {result['logs']} logs, {result['temp_files']} respostas temporárias "
+          f"({result['bytes'] / (1024 * 1024):.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
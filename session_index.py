@@ -0,0 +1,316 @@
+"""
+Índice compacto das sessões salvas em sessions/<módulo>/<id>.json.
+
+Cada sessão salva acrescenta uma linha a sessions/index.jsonl com os campos usados nas
+buscas (módulo, data, tokens, latência, status, referências dos textos e arquivos gerados),
+então achar a última sessão de um módulo, as sessões de um período ou a sessão que gerou um
+arquivo é uma leitura do índice, e não uma varredura do diretório.
+
+Uso:
+    python session_index.py rebuild   # reconstrói o índice a partir dos arquivos das sessões
+    python session_index.py latest core
+    python session_index.py range 2025-03-01 2025-04-01 [--module core]
+    python session_index.py file restaurante-sistema/core/Database.php
+"""
+import argparse
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from fs_utils import FileLock, atomic_write
+
+# Diretório padrão das sessões (relativo ao diretório de trabalho, como em _save_session_to_file)
+DEFAULT_SESSIONS_DIR = "sessions"
+
+# Nome do arquivo do índice dentro do diretório das sessões
+INDEX_FILE = "index.jsonl"
+
+# Campos da sessão copiados para o índice quando existem (referências dos textos no BlobStore)
+REF_FIELDS = ("prompt_ref", "response_ref", "context_hash")
+
+
+def _file_paths(files):
+    """
+    Caminhos dos arquivos gerados por uma sessão. Sessões do modo estruturado guardam as
+    entradas das chamadas a write_file ({"path", "language", "content"}); só o caminho entra no índice.
+    """
+    paths = []
+    for item in files or []:
+        if isinstance(item, dict):
+            item = item.get("path")
+        if isinstance(item, str) and item not in paths:
+            paths.append(item)
+    return paths
+
+
+def _as_timestamp(value, end=False):
+    """Converte datetime, date ou texto ISO para o formato dos timestamps das sessões."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return (value + timedelta(days=1) if end else value).isoformat()
+    raise TypeError(f"Data inválida: {value!r}")
+
+
+class SessionIndex:
+    """
+    Índice das sessões num arquivo JSONL só de acréscimo. Uma linha com "path" descreve uma
+    sessão; uma linha só com "id" e "files" acrescenta arquivos gerados a uma sessão já
+    indexada. As entradas ficam em memória e, a cada consulta, só as linhas acrescentadas
+    desde a última leitura (inclusive por outros processos) são lidas.
+    """
+
+    def __init__(self, sessions_dir=DEFAULT_SESSIONS_DIR):
+        """
+        Args:
+            sessions_dir: Diretório das sessões; o índice fica em <sessions_dir>/index.jsonl
+        """
+        self.sessions_dir = sessions_dir
+        self.path = os.path.join(sessions_dir, INDEX_FILE)
+        self.lock = FileLock(self.path + ".lock")
+        self._entries = {}
+        self._by_file = {}
+        self._offset = 0
+        self._inode = None
+        self._mutex = threading.Lock()
+
+    @staticmethod
+    def entry_for(session, path, status=None):
+        """
+        Monta a entrada do índice de uma sessão.
+
+        Args:
+            session: Sessão como gravada no arquivo
+            path: Caminho do arquivo da sessão, relativo ao diretório das sessões
+            status: Motivo de parada da resposta (end_turn, max_tokens, tool_use...) ou "cached";
+                se None, vem da própria sessão ("response_cache" e "stop_reason")
+
+        Returns:
+            Dicionário da entrada
+        """
+        entry = {
+            "id": session["id"],
+            "module": session.get("module") or "",
+            "timestamp": session.get("timestamp"),
+            "tokens": session.get("tokens_used", 0),
+            "latency": session.get("response_time", 0),
+            "status": status or ("cached" if session.get("response_cache") == "hit" else session.get("stop_reason")),
+            "path": path.replace(os.sep, "/"),
+            "files": _file_paths(session.get("files")),
+        }
+        for field in REF_FIELDS:
+            if field in session:
+                entry[field] = session[field]
+        return entry
+
+    def _append_lines(self, records):
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def add(self, entry):
+        """Acrescenta a entrada de uma sessão ao índice."""
+        self._append_lines([entry])
+
+    def add_files(self, session_id, files):
+        """Registra arquivos gerados a partir de uma sessão já indexada (os já registrados são ignorados)."""
+        self._refresh()
+        entry = self._entries.get(session_id)
+        known = set(entry["files"]) if entry else set()
+        new_files = [path for path in files if path not in known]
+        if new_files:
+            self._append_lines([{"id": session_id, "files": new_files}])
+
+    def remove(self, session_ids):
+        """Remove do índice as sessões informadas, reescrevendo-o de forma atômica."""
+        session_ids = set(session_ids)
+        if not session_ids or not os.path.exists(self.path):
+            return
+        with self.lock:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = [line for line in f if line.strip()]
+            kept = []
+            for line in lines:
+                try:
+                    if json.loads(line)["id"] in session_ids:
+                        continue
+                except (ValueError, KeyError, TypeError):
+                    continue
+                kept.append(line if line.endswith("\n") else line + "\n")
+            atomic_write(self.path, "".join(kept))
+
+    def _apply(self, record):
+        if not isinstance(record, dict) or not isinstance(record.get("id"), str):
+            return
+        entry = self._entries.get(record["id"])
+        # Linhas gravadas por versões antigas podem trazer as entradas de write_file em "files"
+        new_files = _file_paths(record.get("files"))
+        if "path" in record:
+            files = entry["files"] if entry else []
+            entry = dict(record)
+            entry["files"] = files + [path for path in new_files if path not in files]
+            self._entries[record["id"]] = entry
+        elif entry is not None:
+            entry["files"].extend(path for path in new_files if path not in entry["files"])
+        else:
+            return
+        for path in entry["files"]:
+            self._by_file[os.path.normpath(path)] = record["id"]
+
+    def _refresh(self):
+        """Lê as linhas acrescentadas ao índice desde a última leitura."""
+        with self._mutex:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                if self._offset == 0 and self._has_session_files():
+                    # Sessões salvas antes do índice existir
+                    self.rebuild()
+                    self._inode = os.stat(self.path).st_ino
+                    return self._refresh_locked()
+                self._entries, self._by_file, self._offset = {}, {}, 0
+                return
+            if stat.st_ino != self._inode or stat.st_size < self._offset:
+                # O índice foi reconstruído (arquivo novo): lê de novo desde o início
+                self._entries, self._by_file, self._offset = {}, {}, 0
+                self._inode = stat.st_ino
+            if stat.st_size > self._offset:
+                self._refresh_locked()
+
+    def _refresh_locked(self):
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Uma linha sem "\n" ainda está sendo gravada por outro processo
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError, TypeError):
+                continue
+        self._offset += len(complete)
+
+    def _has_session_files(self):
+        if not os.path.isdir(self.sessions_dir):
+            return False
+        return any(True for _ in self._walk_session_files())
+
+    def _walk_session_files(self):
+        for root, _dirs, files in os.walk(self.sessions_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    yield os.path.join(root, name)
+
+    def rebuild(self):
+        """
+        Reconstrói o índice lendo todos os arquivos de sessão do diretório.
+
+        Returns:
+            Número de sessões indexadas
+        """
+        entries = []
+        for file_path in self._walk_session_files():
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    session = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(session, dict) or "id" not in session:
+                continue
+            entries.append(self.entry_for(session, os.path.relpath(file_path, self.sessions_dir)))
+        entries.sort(key=lambda entry: entry["timestamp"] or "")
+
+        with self.lock:
+            atomic_write(self.path, "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries))
+        self._entries, self._by_file, self._offset = {}, {}, 0
+        return len(entries)
+
+    def entries(self):
+        """Retorna as entradas do índice, da sessão mais antiga para a mais recente."""
+        self._refresh()
+        return sorted(self._entries.values(), key=lambda entry: entry["timestamp"] or "")
+
+    def get(self, session_id):
+        """Retorna a entrada da sessão com o ID informado, ou None."""
+        self._refresh()
+        return self._entries.get(session_id)
+
+    def latest_for_module(self, module_name):
+        """Retorna a entrada da sessão mais recente do módulo, ou None."""
+        self._refresh()
+        candidates = [entry for entry in self._entries.values() if entry["module"] == module_name]
+        return max(candidates, key=lambda entry: entry["timestamp"] or "", default=None)
+
+    def in_range(self, start=None, end=None, module_name=None):
+        """
+        Retorna as entradas das sessões de um período, da mais antiga para a mais recente.
+
+        Args:
+            start: Início do período, inclusivo (datetime, date ou texto ISO)
+            end: Fim do período, exclusivo; uma date inclui o dia inteiro
+            module_name: Se informado, só as sessões desse módulo
+        """
+        start = _as_timestamp(start)
+        end = _as_timestamp(end, end=True)
+        return [
+            entry for entry in self.entries()
+            if (start is None or (entry["timestamp"] or "") >= start)
+            and (end is None or (entry["timestamp"] or "") < end)
+            and (module_name is None or entry["module"] == module_name)
+        ]
+
+    def for_file(self, file_path):
+        """Retorna a entrada da sessão mais recente que gerou o arquivo, ou None."""
+        self._refresh()
+        session_id = self._by_file.get(os.path.normpath(file_path))
+        return self._entries.get(session_id) if session_id else None
+
+    def load(self, entry):
+        """Lê o arquivo completo da sessão de uma entrada do índice."""
+        with open(os.path.join(self.sessions_dir, entry["path"]), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Índice das sessões salvas em sessions/')
+    parser.add_argument('--sessions-dir', default=DEFAULT_SESSIONS_DIR, help='Diretório das sessões')
+    subparsers = parser.add_subparsers(dest='action', required=True)
+    subparsers.add_parser('rebuild', help='Reconstrói o índice a partir dos arquivos das sessões')
+    latest = subparsers.add_parser('latest', help='Última sessão de um módulo')
+    latest.add_argument('module')
+    period = subparsers.add_parser('range', help='Sessões de um período (fim exclusivo)')
+    period.add_argument('start')
+    period.add_argument('end', nargs='?')
+    period.add_argument('--module')
+    produced = subparsers.add_parser('file', help='Sessão que gerou um arquivo')
+    produced.add_argument('path')
+    args = parser.parse_args()
+
+    index = SessionIndex(args.sessions_dir)
+    if args.action == 'rebuild':
+        print(f"{index.rebuild()} sessões indexadas em '{index.path}'")
+        return
+    if args.action == 'latest':
+        entries = [index.latest_for_module(args.module)]
+    elif args.action == 'range':
+        entries = index.in_range(args.start, args.end, args.module)
+    else:
+        entries = [index.for_file(args.path)]
+
+    entries = [entry for entry in entries if entry is not None]
+    if not entries:
+        print("Nenhuma sessão encontrada.")
+    for entry in entries:
+        print(f"{entry['timestamp']}  {entry['id']}  {entry['module'] or '-':<15} "
+              f"{entry['tokens']:>7} tokens  {entry['latency']:>7}s  {entry['status'] or '-':<10} {entry['path']}")
+
+
+if __name__ == "__main__":
+    main()
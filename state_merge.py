@@ -0,0 +1,137 @@
+"""
+Mescla de três vias da configuração do projeto.
+
+Quando outro processo gravou a configuração depois que ela foi lida, as alterações deste
+processo (ours) são aplicadas sobre a versão gravada (theirs) usando a versão lida
+originalmente (base) como referência, em vez de a última gravação sobrescrever a outra.
+"""
+
+# Ordem dos status de um módulo: na mescla, prevalece o mais avançado
+STATUS_RANK = {"pending": 0, "in_progress": 1, "completed": 2}
+
+
+def _changed(key, base, ours):
+    return ours.get(key) != base.get(key)
+
+
+def _merge_settings(base, ours, theirs):
+    """Seções de ajustes: cada chave alterada aqui prevalece; as demais vêm de theirs."""
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if key not in base or value != base[key]:
+            merged[key] = value
+    return merged
+
+
+def _merge_counters(base, ours, theirs):
+    """Contadores numéricos somam as diferenças; sessões antigas em lista são unidas por ID."""
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            if key == "sessions" and isinstance(value, list):
+                known = {session.get("id") for session in theirs.get("sessions", [])}
+                merged["sessions"] = theirs.get("sessions", []) + [
+                    session for session in value if session.get("id") not in known
+                ]
+            elif _changed(key, base, ours):
+                merged[key] = value
+            continue
+        delta = value - base.get(key, 0)
+        merged[key] = theirs.get(key, 0) + delta
+    return merged
+
+
+def _union(first, second):
+    return first + [item for item in second if item not in first]
+
+
+def _merge_module(base, ours, theirs):
+    if base is None:
+        base = {}
+    if ours == base:
+        return theirs
+    if theirs == base:
+        return ours
+
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if _changed(key, base, ours):
+            merged[key] = value
+    merged["files"] = _union(theirs.get("files", []), ours.get("files", []))
+    merged["progress"] = max(theirs.get("progress", 0), ours.get("progress", 0))
+    statuses = [theirs.get("status", "pending"), ours.get("status", "pending")]
+    merged["status"] = max(statuses, key=lambda status: STATUS_RANK.get(status, 0))
+    merged["completed_at"] = theirs.get("completed_at") or ours.get("completed_at")
+    return merged
+
+
+def _project_progress(modules):
+    """Mesmo cálculo de ClaudeProjectManager._recalculate_project_progress."""
+    if not modules:
+        return 0
+    total = sum(100 if m["status"] == "completed" else m["progress"] if m["status"] == "in_progress" else 0
+                for m in modules)
+    return round(total / len(modules), 2)
+
+
+def merge_config(base, ours, theirs):
+    """
+    Mescla as alterações de ours (feitas a partir de base) com a versão theirs gravada por
+    outro processo.
+
+    - contadores de history: soma das diferenças dos dois lados
+    - módulos: unidos por nome; arquivos unidos, status e progresso mais avançados
+    - listas de módulos concluídos/em andamento: unidas (concluído sai de em andamento)
+    - demais valores: os alterados por este processo prevalecem
+
+    Returns:
+        Nova configuração mesclada
+    """
+    merged = {}
+    for key in set(theirs) | set(ours):
+        if key not in ours:
+            merged[key] = theirs[key]
+        elif key not in theirs:
+            merged[key] = ours[key]
+        elif key in ("project", "context", "history"):
+            continue
+        elif isinstance(ours[key], dict) and isinstance(theirs[key], dict):
+            merged[key] = _merge_settings(base.get(key, {}), ours[key], theirs[key])
+        else:
+            merged[key] = ours[key] if _changed(key, base, ours) else theirs[key]
+
+    if "history" in ours and "history" in theirs:
+        merged["history"] = _merge_counters(base.get("history", {}), ours["history"], theirs["history"])
+
+    if "project" in ours and "project" in theirs:
+        base_modules = {m["name"]: m for m in base.get("project", {}).get("modules", [])}
+        our_modules = {m["name"]: m for m in ours["project"]["modules"]}
+        modules = []
+        for module in theirs["project"]["modules"]:
+            name = module["name"]
+            if name in our_modules:
+                modules.append(_merge_module(base_modules.get(name), our_modules[name], module))
+            else:
+                modules.append(module)
+        their_names = {m["name"] for m in theirs["project"]["modules"]}
+        modules.extend(m for m in ours["project"]["modules"] if m["name"] not in their_names)
+
+        project = _merge_settings(
+            {k: v for k, v in base.get("project", {}).items() if k != "modules"},
+            {k: v for k, v in ours["project"].items() if k != "modules"},
+            {k: v for k, v in theirs["project"].items() if k != "modules"}
+        )
+        project["modules"] = modules
+        project["progress"] = _project_progress(modules)
+        merged["project"] = project
+
+    if "context" in ours and "context" in theirs:
+        context = _merge_settings(base.get("context", {}), ours["context"], theirs["context"])
+        completed = _union(theirs["context"].get("completed_modules", []), ours["context"].get("completed_modules", []))
+        in_progress = _union(theirs["context"].get("in_progress_modules", []),
+                             ours["context"].get("in_progress_modules", []))
+        context["completed_modules"] = completed
+        context["in_progress_modules"] = [name for name in in_progress if name not in completed]
+        merged["context"] = context
+
+    return merged
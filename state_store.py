@@ -0,0 +1,292 @@
+"""
+Armazenamento opcional do estado do projeto em SQLite.
+
+Com config["storage"]["backend"] = "sqlite", as seções "project", "context" e "history" e as
+sessões ficam num banco SQLite (modo WAL) em vez do arquivo de configuração e do log JSONL;
+o arquivo de configuração guarda só as seções de ajustes (api, cache, storage).
+
+Uso:
+    python state_store.py import   # copia o estado JSON para o banco e passa a usar SQLite
+    python state_store.py export   # grava o estado do banco de volta em JSON
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+
+# Arquivo padrão do banco, no mesmo diretório do arquivo de configuração
+DEFAULT_SQLITE_PATH = "claude_project.db"
+
+# Seções da configuração guardadas no banco quando o backend é SQLite
+STATE_SECTIONS = ("project", "context", "history")
+
+# Campos de um módulo que viram colunas; o restante vai em "extra" (JSON)
+MODULE_COLUMNS = ("name", "description", "status", "priority", "progress", "created_at", "completed_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS modules (
+    name TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    description TEXT,
+    status TEXT,
+    priority INTEGER,
+    progress NUMERIC,
+    created_at TEXT,
+    completed_at TEXT,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS module_files (
+    module TEXT NOT NULL REFERENCES modules(name) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (module, path)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    module TEXT,
+    tokens_used INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_timestamp ON sessions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_sessions_module_timestamp ON sessions(module, timestamp);
+"""
+
+
+class SQLiteStateStore:
+    """
+    Estado do projeto (módulos, arquivos dos módulos, contadores) e sessões num banco SQLite.
+    Cada thread usa sua própria conexão; o modo WAL permite leitores simultâneos, inclusive
+    de outros processos, enquanto uma escrita está em andamento. As sessões expõem a mesma
+    interface do SessionLog (append, extend, find, tail, count, iteração).
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Caminho do arquivo do banco (criado se não existir)
+        """
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_config(cls, config, config_file):
+        """Abre o banco indicado em config["storage"], relativo ao arquivo de configuração."""
+        path = config.get("storage", {}).get("sqlite_path", DEFAULT_SQLITE_PATH)
+        if not os.path.isabs(path):
+            path = os.path.join(os.path.dirname(os.path.abspath(config_file)), path)
+        return cls(path)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Fecha a conexão da thread atual."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def backup(self, dest_path):
+        """Copia o banco para outro arquivo de forma consistente, mesmo com escritas em andamento."""
+        dest = sqlite3.connect(dest_path)
+        try:
+            self._connection().backup(dest)
+        finally:
+            dest.close()
+
+    def is_empty(self):
+        """Indica se o banco ainda não recebeu nenhum estado."""
+        row = self._connection().execute("SELECT COUNT(*) FROM meta").fetchone()
+        return row[0] == 0
+
+    def load_state(self):
+        """
+        Lê as seções de estado do banco.
+
+        Returns:
+            Dicionário com as seções "project", "context" e "history"
+        """
+        conn = self._connection()
+        state = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+        files = {}
+        for module_name, path in conn.execute("SELECT module, path FROM module_files ORDER BY module, position"):
+            files.setdefault(module_name, []).append(path)
+
+        modules = []
+        rows = conn.execute(f"SELECT {', '.join(MODULE_COLUMNS)}, extra FROM modules ORDER BY position")
+        for row in rows:
+            module = dict(zip(MODULE_COLUMNS, row[:-1]))
+            module.update(json.loads(row[-1]))
+            module["files"] = files.get(module["name"], [])
+            modules.append(module)
+
+        project = state.get("project", {})
+        project["modules"] = modules
+        return {
+            "project": project,
+            "context": state.get("context", {}),
+            "history": state.get("history", {})
+        }
+
+    def save_state(self, config):
+        """Grava as seções de estado da configuração numa única transação."""
+        project = {key: value for key, value in config["project"].items() if key != "modules"}
+        # Sessões no formato antigo (dentro da configuração) vão para a tabela sessions, não para meta
+        history = {key: value for key, value in config["history"].items() if key != "sessions"}
+        modules = config["project"]["modules"]
+        with self._connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("project", json.dumps(project, ensure_ascii=False)),
+                    ("context", json.dumps(config["context"], ensure_ascii=False)),
+                    ("history", json.dumps(history, ensure_ascii=False))
+                ]
+            )
+            names = [module["name"] for module in modules]
+            conn.execute(
+                f"DELETE FROM modules WHERE name NOT IN ({', '.join('?' * len(names))})", names
+            )
+            for position, module in enumerate(modules):
+                extra = {k: v for k, v in module.items() if k not in MODULE_COLUMNS and k != "files"}
+                conn.execute(
+                    f"INSERT INTO modules ({', '.join(MODULE_COLUMNS)}, position, extra) "
+                    f"VALUES ({', '.join('?' * (len(MODULE_COLUMNS) + 2))}) "
+                    f"ON CONFLICT(name) DO UPDATE SET "
+                    + ", ".join(f"{column} = excluded.{column}" for column in MODULE_COLUMNS[1:] + ("position", "extra")),
+                    [module.get(column) for column in MODULE_COLUMNS] + [position, json.dumps(extra, ensure_ascii=False)]
+                )
+                conn.execute("DELETE FROM module_files WHERE module = ?", (module["name"],))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO module_files (module, path, position) VALUES (?, ?, ?)",
+                    [(module["name"], path, index) for index, path in enumerate(module.get("files", []))]
+                )
+
+    # Sessões (mesma interface de history_log.SessionLog)
+
+    def _session_row(self, session):
+        return (
+            session.get("id"),
+            session.get("timestamp"),
+            session.get("module"),
+            session.get("tokens_used"),
+            json.dumps(session, ensure_ascii=False)
+        )
+
+    def append(self, session):
+        """Grava uma sessão."""
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)", self._session_row(session))
+
+    def extend(self, sessions):
+        """
+        Grava várias sessões numa transação, ignorando as que já existem.
+
+        Returns:
+            Número de sessões acrescentadas
+        """
+        with self._connection() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?, ?)",
+                (self._session_row(session) for session in sessions)
+            )
+            return conn.total_changes - before
+
+    def __iter__(self):
+        """Percorre as sessões na ordem em que foram gravadas."""
+        for (data,) in self._connection().execute("SELECT data FROM sessions ORDER BY rowid"):
+            yield json.loads(data)
+
+    def find(self, session_id):
+        """Retorna a sessão com o ID informado, ou None."""
+        row = self._connection().execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def tail(self, count):
+        """Retorna as últimas sessões gravadas, da mais antiga para a mais recente."""
+        rows = self._connection().execute(
+            "SELECT data FROM sessions ORDER BY rowid DESC LIMIT ?", (count,)
+        ).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def page(self, page=0, page_size=20):
+        """Retorna uma página do histórico, da sessão mais recente para a mais antiga."""
+        rows = self._connection().execute(
+            "SELECT data FROM sessions ORDER BY rowid DESC LIMIT ? OFFSET ?", (page_size, page * page_size)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+    def evict(self, select, on_evict=None):
+        """
+        Remove sessões numa única transação (mesma interface de SessionLog.evict).
+
+        Args:
+            select: Função que recebe a lista de sessões e retorna os IDs a remover
+            on_evict: Função chamada com as sessões removidas, dentro da transação e depois da
+                remoção (se ela falhar, a remoção é desfeita)
+
+        Returns:
+            Lista das sessões removidas
+        """
+        conn = self._connection()
+        with conn:
+            # Bloqueia outras escritas enquanto as sessões são escolhidas
+            conn.execute("BEGIN IMMEDIATE")
+            sessions = [json.loads(data) for (data,) in conn.execute("SELECT data FROM sessions ORDER BY rowid")]
+            evicted_ids = select(sessions)
+            evicted = [session for session in sessions if session.get("id") in evicted_ids]
+            if evicted:
+                conn.executemany("DELETE FROM sessions WHERE id = ?", [(session["id"],) for session in evicted])
+                if on_evict:
+                    on_evict(evicted)
+        return evicted
+
+    def count(self):
+        """Conta as sessões gravadas."""
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def sessions_for_module(self, module_name, limit=None):
+        """Retorna as sessões de um módulo, da mais recente para a mais antiga."""
+        rows = self._connection().execute(
+            "SELECT data FROM sessions WHERE module = ? ORDER BY timestamp DESC LIMIT ?",
+            (module_name, -1 if limit is None else limit)
+        )
+        return [json.loads(data) for (data,) in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Importar/exportar o estado do projeto entre JSON e SQLite')
+    parser.add_argument('action', choices=['import', 'export'],
+                        help='import: JSON -> SQLite (passa a usar SQLite); export: SQLite -> JSON')
+    parser.add_argument('--config', default='claude_project_config.json', help='Arquivo de configuração')
+    args = parser.parse_args()
+
+    from claude_manager import ClaudeProjectManager
+    manager = ClaudeProjectManager(args.config)
+    backend = "sqlite" if args.action == "import" else "json"
+    if manager.config.get("storage", {}).get("backend", "json") == backend:
+        print(f"O projeto já usa o armazenamento '{backend}'.")
+        return
+    manager.switch_storage_backend(backend)
+    print(f"Estado do projeto copiado; armazenamento atual: '{backend}' "
+          f"({manager.config['history'].get('total_sessions', 0)} sessões)")
+
+
+if __name__ == "__main__":
+    main()
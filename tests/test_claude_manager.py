@@ -0,0 +1,143 @@
+import logging
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fs_utils  # noqa: E402
+import history_log  # noqa: E402
+from blob_store import BlobStore  # noqa: E402
+from claude_manager import ClaudeProjectManager, OFFLINE_TIMINGS  # noqa: E402
+from retention import RetentionPolicy  # noqa: E402
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    logging.disable(logging.WARNING)
+    manager = ClaudeProjectManager(str(tmp_path / "claude_project_config.json"))
+    manager.base_path = str(tmp_path / "out")
+    manager.create_module("core", "Núcleo")
+    manager.set_current_module("core")
+    yield manager
+    manager.close()
+    logging.disable(logging.NOTSET)
+
+
+def respond(manager, text, save_history=True):
+    """Registra uma resposta como send_prompt_to_claude (servida pelo cache, sem requisição)."""
+    response_json = {"content": [{"type": "text", "text": text}], "stop_reason": "end_turn", "usage": {}}
+    manager._record_response("prompt", response_json, text, 0, OFFLINE_TIMINGS, save_history,
+                              module_name="core", from_cache=True)
+
+
+def file_response(name, body):
+    return f"Para o arquivo `core/{name}`:\n\n```php\n{body}\n```\n"
+
+
+def test_extraction_on_another_thread_is_recorded_for_its_session(manager):
+    first = file_response("A.php", "<?php // a")
+    respond(manager, first)
+    session_id = manager.get_latest_module_session("core")["id"]
+
+    thread = threading.Thread(target=manager.extract_and_save_all_code, args=(first,))
+    thread.start()
+    thread.join()
+
+    entry = manager.extraction_ledger.entries(manager.base_path)[session_id]
+    assert entry["response_hash"] == BlobStore.ref_for(first)
+    assert list(entry["files"]) == [os.path.join(manager.base_path, "restaurante-sistema/core/A.php")]
+    assert manager.get_session_for_file("restaurante-sistema/core/A.php")["id"] == session_id
+
+
+def test_response_without_session_does_not_overwrite_previous_entry(manager):
+    first = file_response("A.php", "<?php // a")
+    respond(manager, first)
+    manager.extract_and_save_all_code(first)
+    session_id = manager.get_latest_module_session("core")["id"]
+
+    second = file_response("B.php", "<?php // b")
+    respond(manager, second, save_history=False)
+    manager.extract_and_save_all_code(second)
+
+    entries = manager.extraction_ledger.entries(manager.base_path)
+    assert list(entries) == [session_id]
+    assert entries[session_id]["response_hash"] == BlobStore.ref_for(first)
+    assert manager.get_session_for_file("restaurante-sistema/core/B.php") is None
+
+
+def test_failed_rename_records_files_already_written(manager, monkeypatch):
+    replace = os.replace
+
+    def failing_replace(source, target):
+        if target.endswith("B.php"):
+            raise PermissionError(13, "Permission denied")
+        replace(source, target)
+
+    monkeypatch.setattr(fs_utils.os, "replace", failing_replace)
+    result = manager.extract_and_save_all_code(file_response("A.php", "<?php // a") + file_response("B.php", "<?php // b"))
+    assert (result.written, result.failed) == (1, 1)
+    assert list(result) == ["restaurante-sistema/core/A.php"]
+    assert manager.get_module("core")["files"] == ["restaurante-sistema/core/A.php"]
+
+
+def test_compaction_forgets_extractions_of_evicted_sessions(manager):
+    first = file_response("A.php", "<?php // a")
+    respond(manager, first)
+    manager.extract_and_save_all_code(first)
+    session_id = manager.get_latest_module_session("core")["id"]
+    session_file = os.path.join(manager.session_index.sessions_dir, "core", f"{session_id}.json")
+    assert os.path.exists(session_file)
+
+    result = manager.compact_history(RetentionPolicy(max_age_days=-1))
+    assert (result["sessions"], result["session_files"]) == (1, 1)
+    assert not os.path.exists(session_file)
+    assert manager.extraction_ledger.entries(manager.base_path) == {}
+
+
+def test_failed_log_rewrite_does_not_archive_sessions(manager, monkeypatch):
+    respond(manager, file_response("A.php", "<?php // a"))
+
+    def failing_write(path, data, encoding='utf-8'):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(history_log, "atomic_write", failing_write)
+    with pytest.raises(OSError):
+        manager.compact_history(RetentionPolicy(max_age_days=-1))
+    assert manager.session_log.count() == 1
+    assert manager.usage_rollups.load()["sessions"] == 0
+
+
+def test_staging_dir_is_outside_the_served_tree(manager, tmp_path, monkeypatch):
+    manager.base_path = str(tmp_path / "htdocs" / "restaurante_sistema")
+    staging_dirs = []
+    mkdtemp = fs_utils.tempfile.mkdtemp
+
+    def record_mkdtemp(**kwargs):
+        staging_dirs.append(kwargs["dir"])
+        return mkdtemp(**kwargs)
+
+    monkeypatch.setattr(fs_utils.tempfile, "mkdtemp", record_mkdtemp)
+    result = manager.extract_and_save_all_code(file_response("A.php", "<?php // a"))
+    assert result.written == 1
+    served_root = os.path.dirname(manager.base_path)
+    assert staging_dirs == [str(tmp_path / "staging")]
+    assert os.path.commonpath([staging_dirs[0], served_root]) != served_root
+    assert os.listdir(served_root) == ["restaurante_sistema"]
+
+
+def test_compaction_removes_only_saved_responses(manager, tmp_path):
+    fixture = tmp_path / "temp_response_core.txt"
+    fixture.write_text("resposta de exemplo", encoding="utf-8")
+    saved = manager.save_temp_response("core", "resposta")
+    old = os.path.getmtime(saved) - 86400
+    for path in (fixture, saved):
+        os.utime(path, (old, old))
+
+    result = manager.compact_history(RetentionPolicy(max_age_days=0.5))
+    assert result["temp_files"] == 1
+    assert not os.path.exists(saved)
+    assert fixture.exists()
@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claude_transport import ClaudeTransport  # noqa: E402
+
+TIMINGS = {"connect_time": 0, "ttfb": 0, "connection_reused": True}
+
+
+class CountingLimiter:
+    """Limitador que só soma os tokens reservados e devolvidos."""
+
+    def __init__(self):
+        self.reserved = 0
+
+    def acquire(self, tokens=0):
+        self.reserved += tokens
+        return 0.0
+
+    def adjust(self, tokens):
+        self.reserved += tokens
+
+    def update_from_headers(self, headers):
+        pass
+
+    def block_for(self, seconds):
+        pass
+
+
+def make_response(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b"{}"
+    return response
+
+
+@pytest.fixture
+def transport():
+    transport = ClaudeTransport(max_retries=2, backoff_base=0, backoff_max=0, rate_limiter=CountingLimiter())
+    yield transport
+    transport.close()
+
+
+def test_reservation_is_refunded_when_connection_retries_run_out(transport, monkeypatch):
+    def failing_send(*args):
+        raise requests.ConnectionError("recusada")
+
+    monkeypatch.setattr(transport, "_send", failing_send)
+    with pytest.raises(requests.ConnectionError):
+        transport.post("http://api", {}, {"prompt": "x" * 400})
+    assert transport.rate_limiter.reserved == 0
+
+
+def test_reservation_is_refunded_on_final_error_response(transport, monkeypatch):
+    monkeypatch.setattr(transport, "_send", lambda *args: (make_response(400), dict(TIMINGS)))
+    response, timings = transport.post("http://api", {}, {"prompt": "x" * 400})
+    assert response.status_code == 400
+    assert transport.rate_limiter.reserved == 0
+    transport.record_usage(timings, 0)
+    assert transport.rate_limiter.reserved == 0
+
+
+def test_reservation_is_corrected_by_usage_on_success(transport, monkeypatch):
+    monkeypatch.setattr(transport, "_send", lambda *args: (make_response(200), dict(TIMINGS)))
+    response, timings = transport.post("http://api", {}, {"prompt": "x" * 400})
+    assert transport.rate_limiter.reserved == timings["estimated_tokens"] > 0
+    transport.record_usage(timings, 30)
+    assert transport.rate_limiter.reserved == 30
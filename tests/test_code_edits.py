@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_edits import apply_blocks, apply_edits, is_edit_block, parse_edits  # noqa: E402
+
+
+def edit_block(*pairs):
+    parts = []
+    for search, replace in pairs:
+        parts.append(f"<<<<<<< SEARCH\n{search}=======\n{replace}>>>>>>> REPLACE\n")
+    return "".join(parts)
+
+
+def test_parse_edits():
+    block = edit_block(("a\n", "b\n"), ("c\nd\n", ""))
+    assert is_edit_block(block)
+    assert parse_edits(block) == [("a\n", "b\n"), ("c\nd\n", "")]
+
+
+def test_parse_edits_rejects_unterminated_block():
+    with pytest.raises(ValueError):
+        parse_edits("<<<<<<< SEARCH\na\n=======\nb\n")
+
+
+def test_replace_line():
+    assert apply_edits("a\nb\nc\n", [("b\n", "B\n")]) == "a\nB\nc\n"
+
+
+def test_delete_line_leaves_no_blank_line():
+    assert apply_edits("a\nb\nc\n", [("b\n", "")]) == "a\nc\n"
+
+
+def test_delete_is_idempotent():
+    edits = [("b\n", "")]
+    once = apply_edits("a\nb\nc\n", edits)
+    assert apply_edits(once, edits) == once
+
+
+def test_replace_is_idempotent():
+    edits = [("    return 1;\n", "    return 2;\n")]
+    once = apply_edits("function f() {\n    return 1;\n}\n", edits)
+    assert apply_edits(once, edits) == once == "function f() {\n    return 2;\n}\n"
+
+
+def test_append_around_search_is_idempotent():
+    edits = [("class A {\n", "class A {\n    private $b;\n")]
+    once = apply_edits("class A {\n}\n", edits)
+    assert once == "class A {\n    private $b;\n}\n"
+    assert apply_edits(once, edits) == once
+
+
+def test_match_is_by_whole_lines():
+    # "b" é parte de "abc", mas não é uma linha do arquivo
+    with pytest.raises(ValueError):
+        apply_edits("abc\n", [("b\n", "x\n")])
+
+
+def test_replacement_found_twice_is_not_treated_as_applied():
+    with pytest.raises(ValueError):
+        apply_edits("}\n}\n", [("return 1;\n", "}\n")])
+
+
+def test_ambiguous_search_fails():
+    with pytest.raises(ValueError):
+        apply_edits("x\ny\nx\n", [("x\n", "z\n")])
+
+
+def test_trailing_whitespace_and_crlf_are_tolerated():
+    assert apply_edits("a  \r\nb\r\n", [("a\n", "A\n")]) == "A\r\nb\r\n"
+
+
+def test_last_line_without_newline():
+    assert apply_edits("a\nb", [("b\n", "c\n")]) == "a\nc"
+
+
+def test_apply_blocks_keeps_file_unchanged_when_one_edit_fails():
+    blocks = [("x.php", edit_block(("a\n", "A\n"), ("nada\n", "B\n"))), ("y.php", "novo\n")]
+    files, errors = apply_blocks(blocks, {"x.php": "a\nb\n"}.get)
+    assert files == {"y.php": "novo\n"}
+    assert list(errors) == ["x.php"]
+
+
+def test_apply_blocks_applies_edits_in_order_over_full_file():
+    blocks = [("x.php", "a\nb\n"), ("x.php", edit_block(("b\n", "c\n"))), ("x.php", edit_block(("a\n", "")))]
+    files, errors = apply_blocks(blocks, lambda path: None)
+    assert files == {"x.php": "c\n"}
+    assert errors == {}
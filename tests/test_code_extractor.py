@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_extractor import IncrementalCodeExtractor, extract_code_blocks  # noqa: E402
+
+PHP = "<?php\n\nclass App {}\n"
+
+
+def test_file_comment_convention():
+    text = f"Segue a classe.\n\n```php\n// File: core/App.php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_lead_in_convention():
+    text = f"Para o arquivo `core/App.php`:\n\n```php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_lead_in_with_lines_before_the_block():
+    text = f"Crie o arquivo `core/App.php` com a classe principal.\n\nEla fica assim:\n```php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_quoted_path_convention():
+    text = f"`core/App.php`:\n```php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_numbered_heading_convention():
+    text = f"## 1. Classe Principal\n\n```php\n// File: core/App.php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_markdown_heading_convention():
+    text = f"### `/core/App.php`\n```php\n{PHP}```\n"
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_shell_block_does_not_take_announced_path():
+    text = (
+        "Crie o arquivo `core/App.php` com a classe principal.\n\n"
+        "Veja como instalar:\n\n```bash\ncomposer install\n```\n\n"
+        f"E aqui o arquivo:\n\n```php\n{PHP}```\n"
+    )
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_announced_path_is_used_once():
+    text = (
+        "Crie o arquivo `core/App.php` com a classe principal:\n\n"
+        f"```php\n{PHP}```\n\n"
+        "Depois, o exemplo de uso:\n\n```php\n$app = new App();\n```\n"
+    )
+    assert extract_code_blocks(text) == [("core/App.php", PHP)]
+
+
+def test_shell_script_keeps_its_path():
+    text = "Crie o arquivo `scripts/install.sh` assim:\n\n```bash\ncomposer install\n```\n"
+    assert extract_code_blocks(text) == [("scripts/install.sh", "composer install\n")]
+
+
+def test_unterminated_block_is_not_extracted():
+    files = []
+    extractor = IncrementalCodeExtractor(lambda path, code: files.append(path))
+    extractor.feed(f"```php\n// File: core/App.php\n{PHP}```\n\n```php\n// File: core/Router.php\n<?php\n")
+    extractor.finish()
+    assert files == ["core/App.php"]
+    assert extractor.truncated
+
+
+def test_long_lines_of_lead_in_words_are_linear():
+    # Muitas palavras que introduzem um caminho e nenhuma aspa (ou aspas sem caminho) numa linha
+    for line in ("Para " * 40000, "Para `x " * 25000, "Arquivo " * 25000 + "`"):
+        start = time.perf_counter()
+        assert extract_code_blocks(f"{line}\n```php\n{PHP}```\n") == []
+        assert time.perf_counter() - start < 1
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fs_utils  # noqa: E402
+from fs_utils import MaterializeError, materialize_files  # noqa: E402
+
+
+def test_unchanged_files_are_skipped(tmp_path):
+    target = tmp_path / "www" / "a.php"
+    assert materialize_files({str(target): "a"}) == {str(target): "written"}
+    assert materialize_files({str(target): "a"}) == {str(target): "skipped"}
+
+
+def test_staging_dir_is_outside_the_targets(tmp_path, monkeypatch):
+    staging_dirs = []
+    mkdtemp = fs_utils.tempfile.mkdtemp
+
+    def record_mkdtemp(**kwargs):
+        staging_dirs.append(kwargs["dir"])
+        return mkdtemp(**kwargs)
+
+    monkeypatch.setattr(fs_utils.tempfile, "mkdtemp", record_mkdtemp)
+    materialize_files({str(tmp_path / "www" / "a.php"): "a"}, staging_dir=str(tmp_path))
+    assert staging_dirs == [str(tmp_path)]
+    assert sorted(os.listdir(tmp_path)) == ["www"]
+
+
+def test_failed_rename_reports_files_already_written(tmp_path, monkeypatch):
+    paths = [str(tmp_path / "www" / name) for name in ("a.php", "b.php", "c.php")]
+    replace = os.replace
+
+    def failing_replace(source, target):
+        if target == paths[1]:
+            raise PermissionError(13, "Permission denied")
+        replace(source, target)
+
+    monkeypatch.setattr(fs_utils.os, "replace", failing_replace)
+    with pytest.raises(MaterializeError) as error:
+        materialize_files({path: "x" for path in paths})
+    assert error.value.statuses == {paths[0]: "written"}
+    assert os.path.exists(paths[0])
+    assert not os.path.exists(paths[1]) and not os.path.exists(paths[2])
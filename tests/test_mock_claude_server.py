@@ -0,0 +1,82 @@
+import json
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from claude_manager import STRUCTURED_OUTPUT_INSTRUCTION, WRITE_FILE_TOOL  # noqa: E402
+from mock_claude_server import MockClaudeServer, build_parser  # noqa: E402
+
+RESPONSE = "Segue o arquivo.\n\n```php\n// File: core/App.php\n<?php\n```\n"
+
+
+def start_server(tmp_path, *args):
+    options = build_parser().parse_args(["--port", "0", "--sessions", str(tmp_path / "sessions"),
+                                         "--blobs", str(tmp_path / "blobs"), "--fallback", "none", "--quiet", *args])
+    return MockClaudeServer((options.host, options.port), options)
+
+
+class RateLimitedUpstream(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("content-length", 0)))
+        body = json.dumps({"type": "error", "error": {"type": "rate_limit_error", "message": "lento"}}).encode()
+        self.send_response(429)
+        self.send_header("content-type", "application/json")
+        self.send_header("retry-after", "7")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    sessions = tmp_path / "sessions" / "core"
+    sessions.mkdir(parents=True)
+    with open(sessions / "s1.json", "w", encoding="utf-8") as f:
+        json.dump({"id": "s1", "prompt": "Crie a classe App", "response": RESPONSE}, f)
+    server = start_server(tmp_path)
+    yield server
+    server.server_close()
+
+
+def test_structured_request_replays_recorded_session(server):
+    params = {"messages": [{"role": "user", "content": f"Crie a classe App\n\n{STRUCTURED_OUTPUT_INSTRUCTION}"}],
+              "tools": [WRITE_FILE_TOOL]}
+    message = server.build_message(params)
+    assert message["stop_reason"] == "tool_use"
+    assert [block["input"]["path"] for block in message["content"] if block["type"] == "tool_use"] == ["core/App.php"]
+
+
+def test_text_request_replays_recorded_session(server):
+    message = server.build_message({"messages": [{"role": "user", "content": "Crie a classe App"}]})
+    assert message["content"][0]["text"] == RESPONSE
+
+
+def test_upstream_error_is_relayed(tmp_path):
+    upstream = ThreadingHTTPServer(("127.0.0.1", 0), RateLimitedUpstream)
+    server = start_server(tmp_path, "--upstream", f"http://127.0.0.1:{upstream.server_address[1]}/v1/messages")
+    for instance in (upstream, server):
+        threading.Thread(target=instance.serve_forever, daemon=True).start()
+    try:
+        request = urllib.request.Request(
+            f"{server.base_url}/v1/messages", method="POST", headers={"content-type": "application/json"},
+            data=json.dumps({"messages": [{"role": "user", "content": "Prompt novo"}]}).encode()
+        )
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(request, timeout=10)
+        assert error.value.code == 429
+        assert error.value.headers["retry-after"] == "7"
+        assert json.loads(error.value.read())["error"]["type"] == "rate_limit_error"
+    finally:
+        for instance in (upstream, server):
+            instance.shutdown()
+            instance.server_close()
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_index import SessionIndex  # noqa: E402
+
+
+def save_session(sessions_dir, session, status=None):
+    """Grava a sessão como _save_session_to_file e a acrescenta ao índice."""
+    index = SessionIndex(str(sessions_dir))
+    module_dir = sessions_dir / session["module"]
+    module_dir.mkdir(parents=True, exist_ok=True)
+    path = module_dir / f"{session['id']}.json"
+    path.write_text(json.dumps(session), encoding="utf-8")
+    index.add(SessionIndex.entry_for(session, os.path.relpath(path, sessions_dir), status))
+    return index
+
+
+def test_structured_session_indexes_only_paths(tmp_path):
+    session = {
+        "id": "s1", "module": "core", "timestamp": "2026-01-01T10:00:00", "stop_reason": "end_turn",
+        "structured": True,
+        "files": [{"path": "core/App.php", "language": "php", "content": "<?php\n"}],
+    }
+    index = save_session(tmp_path, session, "end_turn")
+    index.add_files("s1", ["restaurante-sistema/core/App.php"])
+
+    entry = index.latest_for_module("core")
+    assert entry["files"] == ["core/App.php", "restaurante-sistema/core/App.php"]
+    assert index.for_file("restaurante-sistema/core/App.php")["id"] == "s1"
+    # Uma nova instância relê o arquivo do índice do início
+    assert SessionIndex(str(tmp_path)).for_file("core/App.php")["id"] == "s1"
+
+
+def test_malformed_index_lines_are_skipped(tmp_path):
+    index = save_session(tmp_path, {"id": "s1", "module": "core", "timestamp": "2026-01-01T10:00:00"})
+    with open(index.path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "s1", "files": [{"path": "x.php", "content": ""}, 3]}) + "\n")
+        f.write(json.dumps(["não", "é", "entrada"]) + "\n")
+        f.write(json.dumps({"id": 5, "path": "core/5.json"}) + "\n")
+
+    fresh = SessionIndex(str(tmp_path))
+    assert [entry["id"] for entry in fresh.entries()] == ["s1"]
+    assert fresh.for_file("x.php")["id"] == "s1"
+    fresh.remove(["s1"])
+    assert SessionIndex(str(tmp_path)).entries() == []
+
+
+def test_rebuild_keeps_status(tmp_path):
+    save_session(tmp_path, {"id": "s1", "module": "core", "timestamp": "2026-01-01T10:00:00",
+                            "stop_reason": "end_turn"}, "end_turn")
+    save_session(tmp_path, {"id": "s2", "module": "core", "timestamp": "2026-01-01T09:00:00",
+                            "stop_reason": "max_tokens", "response_cache": "hit"}, "cached")
+
+    index = SessionIndex(str(tmp_path))
+    before = {entry["id"]: entry["status"] for entry in index.entries()}
+    assert index.rebuild() == 2
+    assert {entry["id"]: entry["status"] for entry in index.entries()} == before == {"s1": "end_turn", "s2": "cached"}